@@ -0,0 +1,287 @@
+"""Asyncio facade of db and cache."""
+
+import asyncio
+import inspect
+import threading
+from concurrent.futures import Executor
+from functools import partial
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+from bdc.cache import (
+    Cache,
+    Prefetch,
+    Progress,
+)
+from bdc.changes import (
+    Changeset,
+    ChangesResult,
+)
+from bdc.instrumentation import (
+    Instrumentation,
+    timed,
+)
+from bdc.node import (
+    CNode,
+    NodeParams,
+)
+
+
+class AsyncDB:
+    """Awaitable db calls.
+
+    Any backend with db contract is wrapped. Backend methods may
+    return awaitables, so slow backends yield to event loop.
+    Synchronous backends run in event loop thread, or in executor
+    when offload is set; executor calls are serialized by lock
+    because backends are not thread safe.
+
+    At most max_concurrency calls are running at once,
+    waiting calls are started in arrival order.
+    Big batches are split by BATCH_SIZE so one cache
+    can not hold db for a long time.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(
+        self,
+        db,
+        max_concurrency: int = 8,
+        offload: bool = False,
+        executor: Optional[Executor] = None,
+    ):
+        """Initialization."""
+        self.db = db
+        self.max_concurrency = max_concurrency
+        self.offload = offload
+        self.executor = executor
+        self.lock = threading.Lock()
+        # Created in running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def call(self, method: Callable, *args):
+        """Call backend method with bounded concurrency."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            if self.offload:
+                loop = asyncio.get_running_loop()
+                call_result = await loop.run_in_executor(
+                    self.executor,
+                    partial(self._locked_call, method, *args),
+                )
+            else:
+                call_result = method(*args)
+            if inspect.isawaitable(call_result):
+                call_result = await call_result
+        # let other waiting calls go first
+        await asyncio.sleep(0)
+        return call_result
+
+    async def get_node_params(self, db_id: int) -> NodeParams:
+        """Get node params."""
+        node_params: NodeParams = await self.call(self.db.get_node_params, db_id)
+        return node_params  # NOQA: WPS331
+
+    async def get_nodes_params(self, db_ids: Iterable[int]) -> List[NodeParams]:
+        """Get batch of node params, BATCH_SIZE nodes per call."""
+        db_ids = list(db_ids)
+        nodes_params: List[NodeParams] = []
+        for start in range(0, len(db_ids), self.BATCH_SIZE):
+            nodes_params.extend(await self.call(
+                self.db.get_nodes_params,
+                db_ids[start:start + self.BATCH_SIZE],
+            ))
+        return nodes_params
+
+    async def get_children_ids(
+        self,
+        db_id: int,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """Get children db_ids, first `limit` if set."""
+        children_ids: List[int] = await self.call(
+            self.db.get_children_ids, db_id, limit,
+        )
+        return children_ids  # NOQA: WPS331
+
+    async def get_ancestor_ids(
+        self,
+        db_id: int,
+        levels: Optional[int] = None,
+    ) -> List[int]:
+        """Get ancestors db_ids from parent up."""
+        ancestor_ids: List[int] = await self.call(
+            self.db.get_ancestor_ids, db_id, levels,
+        )
+        return ancestor_ids  # NOQA: WPS331
+
+    async def get_nodes_children_ids(
+        self,
+        db_ids: Iterable[int],
+        limit: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """Get children db_ids by node, BATCH_SIZE nodes per call."""
+        return await self._batched(self.db.get_nodes_children_ids, db_ids, limit)
+
+    async def get_nodes_ancestor_ids(
+        self,
+        db_ids: Iterable[int],
+        levels: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """Get ancestors db_ids by node, BATCH_SIZE nodes per call."""
+        return await self._batched(self.db.get_nodes_ancestor_ids, db_ids, levels)
+
+    async def get_root_ids(self) -> List[int]:
+        """Get root db_ids."""
+        root_ids: List[int] = await self.call(self.db.get_root_ids)
+        return root_ids  # NOQA: WPS331
+
+    async def is_deleted(self, db_id: int) -> bool:
+        """Check that node is deleted."""
+        is_deleted: bool = await self.call(self.db.is_deleted, db_id)
+        return is_deleted  # NOQA: WPS331
+
+    async def descendants_of(
+        self,
+        db_ids: Iterable[int],
+        ancestor_ids: Iterable[int],
+    ) -> List[int]:
+        """Get db_ids which are strict descendants of any ancestor."""
+        descendant_ids: List[int] = await self.call(
+            self.db.descendants_of, list(db_ids), list(ancestor_ids),
+        )
+        return descendant_ids  # NOQA: WPS331
+
+    async def apply_changes(self, changeset: Changeset) -> ChangesResult:
+        """Apply changeset as one call."""
+        changes_result: ChangesResult = await self.call(
+            self.db.apply_changes, changeset,
+        )
+        return changes_result  # NOQA: WPS331
+
+    async def _batched(
+        self,
+        method: Callable,
+        db_ids: Iterable[int],
+        *args,
+    ) -> Dict[int, List[int]]:
+        """Call backend batch method by BATCH_SIZE db_ids, merge results."""
+        db_ids = list(db_ids)
+        by_db_id: Dict[int, List[int]] = {}
+        for start in range(0, len(db_ids), self.BATCH_SIZE):
+            by_db_id.update(await self.call(
+                method,
+                db_ids[start:start + self.BATCH_SIZE],
+                *args,
+            ))
+        return by_db_id
+
+    def _locked_call(self, method: Callable, *args):
+        """Call backend method in executor thread."""
+        with self.lock:
+            return method(*args)
+
+
+class AsyncCache:
+    """Awaitable cache load and save.
+
+    Cache is changed only in event loop thread after db call
+    is finished, operations of one cache run one by one.
+    """
+
+    def __init__(self, cache: Optional[Cache] = None):
+        """Initialization."""
+        self.cache = Cache() if cache is None else cache
+        # Created in running event loop
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def instrumentation(self) -> Optional[Instrumentation]:
+        """Get instrumentation of cache."""
+        return self.cache.instrumentation
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Get cache operations lock."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def load(self, db_id: int, db: AsyncDB):
+        """Load node from db."""
+        await self.load_many([db_id], db)
+
+    async def load_many(self, db_ids: Iterable[int], db: AsyncDB) -> List[CNode]:
+        """Load batch of nodes from db.
+
+        With cache prefetch set, ancestors and children
+        are read and nodes are watched as by Cache.load_many.
+        Return new loaded nodes.
+        """
+        async with self.lock:
+            to_load = self.cache.not_loaded(db_ids)
+            self.cache.watch(to_load)
+            try:
+                nodes_params = await db.get_nodes_params(to_load)
+                if nodes_params and self.cache.prefetch is not None:
+                    nodes_params.extend(await self._prefetch(nodes_params, db, to_load))
+            except Exception:
+                self.cache.unwatch_not_loaded(to_load)
+                raise
+            # nodes could be loaded by cache itself while waiting
+            nodes_params = [
+                node_params
+                for node_params in nodes_params
+                if node_params.db_id not in self.cache.db_nodes
+            ]
+            return self.cache.add_batch(nodes_params)
+
+    async def _prefetch(
+        self,
+        nodes_params: List[NodeParams],
+        db: AsyncDB,
+        to_load: List[int],
+    ) -> List[NodeParams]:
+        """Read not loaded ancestors and children of loading nodes.
+
+        Prefetched db_ids are watched and added to `to_load`.
+        """
+        prefetch: Prefetch = self.cache.prefetch  # type: ignore
+        to_climb, to_list = self.cache.prefetch_reads(nodes_params)
+        ancestors: Dict[int, List[int]] = {}
+        children: Dict[int, List[int]] = {}
+        if to_climb:
+            ancestors = await db.get_nodes_ancestor_ids(to_climb, prefetch.ancestors)
+        if to_list:
+            children = await db.get_nodes_children_ids(to_list, prefetch.children)
+        to_prefetch = self.cache.prefetched_ids(nodes_params, ancestors, children)
+        self.cache.watch(to_prefetch)
+        to_load.extend(to_prefetch)
+        return await db.get_nodes_params(to_prefetch)
+
+    @timed('cache.save')
+    async def save(self, db: AsyncDB, progress: Optional[Progress] = None):
+        """Save changed nodes to db.
+
+        Nodes edited while changeset is applied stay dirty,
+        they are saved by next save. Metrics are recorded
+        to cache instrumentation as by Cache.save.
+        """
+        async with self.lock:
+            changeset = self.cache.changeset(progress)
+            self.cache.observe('cache.save.nodes', len(self.cache.dirty))
+            changes_result = await db.apply_changes(changeset)
+            deleted_orphans = self.cache.deleted_orphans(changes_result)
+            to_check = self.cache.orphans_to_check(changes_result)
+            if to_check:
+                deleted_orphans.extend(await db.descendants_of(
+                    to_check, changes_result.deleted,
+                ))
+            self.cache.saved(changes_result, deleted_orphans, changeset)
@@ -0,0 +1,239 @@
+"""Nested interval index of tree ancestry."""
+
+import bisect
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+# Relabeled range of 2 ** level labels may hold at most
+# (2 * DENSITY) ** level tokens, so denser ranges are split
+# by relabeling wider ranges
+DENSITY = 0.7
+# Label space is at least 2 ** MIN_LEVEL
+MIN_LEVEL = 32
+
+
+class AncestryIndex:
+    """Nested interval labels of tree nodes.
+
+    Every node owns interval (low, high) of integer labels
+    and intervals of its descendants are nested in it,
+    so descendant check is O(1). Node depth is stored too.
+
+    Labels are kept as an ordered list of tokens: low and high
+    of every node in Euler tour order. New leaf takes labels
+    in the gap before its parent high. When the gap is used up,
+    the smallest aligned label range around it which is sparse enough
+    is relabeled evenly (list labeling of Bender et al.), which costs
+    O(log n) amortized relabels per leaf for any tree shape.
+    Whole tree is relabeled only when label space is too dense,
+    label space is doubled then.
+
+    Token of node is `db_id * 2` for low and `db_id * 2 + 1` for high.
+    """
+
+    def __init__(
+        self,
+        get_children: Callable[[int], List[int]],
+        root_ids: Iterable[int] = (),
+    ):
+        """Initialization.
+
+        `get_children` returns children db_ids of node.
+        """
+        self.get_children = get_children
+        self.root_ids: List[int] = []
+        self.low: Dict[int, int] = {}
+        self.high: Dict[int, int] = {}
+        self.depths: Dict[int, int] = {}
+        # Tree links of Euler tour, roots are siblings
+        self.parents: Dict[int, Optional[int]] = {}
+        self.first_child: Dict[int, int] = {}
+        self.last_child: Dict[int, int] = {}
+        self.next_sibling: Dict[int, int] = {}
+        self.prev_sibling: Dict[int, int] = {}
+        # Labels are in [0, 2 ** level)
+        self.level = MIN_LEVEL
+        self.rebuilds = 0
+        # Tokens relabeled by local relabels
+        self.relabeled = 0
+        for root_id in root_ids:
+            self._link(root_id, None)
+            self.depths[root_id] = 0
+        self._link_children(list(root_ids))
+        self.rebuild()
+
+    def add(self, db_id: int, parent_id: Optional[int]):
+        """Label new leaf node."""
+        self._link(db_id, parent_id)
+        self.depths[db_id] = 0 if parent_id is None else self.depths[parent_id] + 1
+        low_token = db_id * 2
+        prev_token = self._prev_token(low_token)
+        next_token = self._next_token(low_token + 1)
+        prev_label = -1 if prev_token is None else self._label(prev_token)
+        next_label = 2 ** self.level if next_token is None else self._label(next_token)
+        gap = next_label - prev_label
+        if gap >= 3:
+            self.low[db_id] = prev_label + gap // 3
+            self.high[db_id] = prev_label + gap * 2 // 3
+            return
+        self._relabel_around(low_token, max(prev_label, 0))
+
+    def is_descendant(self, db_id: int, ancestor_id: int) -> bool:
+        """Check that node is strict descendant of ancestor."""
+        low = self.low[db_id]
+        return self.low[ancestor_id] < low < self.high[ancestor_id]
+
+    def descendants_of(
+        self,
+        db_ids: Iterable[int],
+        ancestor_ids: Iterable[int],
+    ) -> List[int]:
+        """Get db_ids which are strict descendants of any ancestor.
+
+        Nested ancestor intervals are dropped, so every node
+        is checked against one interval found by bisect.
+        """
+        lows: List[int] = []
+        highs: List[int] = []
+        for low, high in sorted(
+            (self.low[ancestor_id], self.high[ancestor_id])
+            for ancestor_id in ancestor_ids
+        ):
+            if highs and low < highs[-1]:
+                continue
+            lows.append(low)
+            highs.append(high)
+        found = []
+        for db_id in db_ids:
+            low = self.low[db_id]
+            index = bisect.bisect_left(lows, low) - 1
+            if index >= 0 and low < highs[index]:
+                found.append(db_id)
+        return found
+
+    def depth(self, db_id: int) -> int:
+        """Get node depth, roots have depth 0."""
+        return self.depths[db_id]
+
+    def rebuild(self):
+        """Spread labels of all nodes evenly over label space.
+
+        Label space is grown until it is sparse enough
+        for all tokens and as many new ones.
+        """
+        tokens = list(self._iter_tokens())
+        while (2 * DENSITY) ** self.level < 2 * len(tokens):
+            self.level += 1
+        self._spread(tokens, 0, 2 ** self.level)
+        self.rebuilds += 1
+
+    def _relabel_around(self, low_token: int, anchor: int):
+        """Relabel smallest sparse enough range around new node tokens.
+
+        `anchor` is a label next to new tokens, ranges are aligned
+        blocks of 2 ** level labels containing it.
+        """
+        before: List[int] = []
+        after: List[int] = []
+        prev_token = self._prev_token(low_token)
+        next_token = self._next_token(low_token + 1)
+        for level in range(1, self.level + 1):
+            start = anchor >> level << level
+            end = start + 2 ** level
+            while prev_token is not None and self._label(prev_token) >= start:
+                before.append(prev_token)
+                prev_token = self._prev_token(prev_token)
+            while next_token is not None and self._label(next_token) < end:
+                after.append(next_token)
+                next_token = self._next_token(next_token)
+            count = len(before) + len(after) + 2
+            if count <= (2 * DENSITY) ** level:
+                before.reverse()
+                before.extend((low_token, low_token + 1))
+                before.extend(after)
+                self._spread(before, start, end)
+                self.relabeled += count
+                return
+        self.level += 1
+        self.rebuild()
+
+    def _spread(self, tokens: List[int], start: int, end: int):
+        """Label tokens evenly in [start, end)."""
+        step = (end - start) // (len(tokens) + 1)
+        label = start + step
+        for token in tokens:
+            if token % 2:
+                self.high[token // 2] = label
+            else:
+                self.low[token // 2] = label
+            label += step
+
+    def _iter_tokens(self) -> Iterator[int]:
+        """Iterate over all tokens in Euler tour order."""
+        if not self.root_ids:
+            return
+        token: Optional[int] = self.root_ids[0] * 2
+        while token is not None:
+            yield token
+            token = self._next_token(token)
+
+    def _label(self, token: int) -> int:
+        """Get token label."""
+        if token % 2:
+            return self.high[token // 2]
+        return self.low[token // 2]
+
+    def _next_token(self, token: int) -> Optional[int]:
+        """Get token after token in Euler tour."""
+        db_id = token // 2
+        if token % 2 == 0:
+            child_id = self.first_child.get(db_id)
+            return token + 1 if child_id is None else child_id * 2
+        sibling_id = self.next_sibling.get(db_id)
+        if sibling_id is not None:
+            return sibling_id * 2
+        parent_id = self.parents[db_id]
+        return None if parent_id is None else parent_id * 2 + 1
+
+    def _prev_token(self, token: int) -> Optional[int]:
+        """Get token before token in Euler tour."""
+        db_id = token // 2
+        if token % 2:
+            child_id = self.last_child.get(db_id)
+            return token - 1 if child_id is None else child_id * 2 + 1
+        sibling_id = self.prev_sibling.get(db_id)
+        if sibling_id is not None:
+            return sibling_id * 2 + 1
+        parent_id = self.parents[db_id]
+        return None if parent_id is None else parent_id * 2
+
+    def _link_children(self, to_link: List[int]):
+        """Link subtrees of nodes read by `get_children`."""
+        while to_link:
+            parent_id = to_link.pop()
+            children = self.get_children(parent_id)
+            for child_id in children:
+                self._link(child_id, parent_id)
+                self.depths[child_id] = self.depths[parent_id] + 1
+            to_link.extend(children)
+
+    def _link(self, db_id: int, parent_id: Optional[int]):
+        """Append node to children of parent or to roots."""
+        self.parents[db_id] = parent_id
+        if parent_id is None:
+            last_id = self.root_ids[-1] if self.root_ids else None
+            self.root_ids.append(db_id)
+        else:
+            last_id = self.last_child.get(parent_id)
+            self.last_child[parent_id] = db_id
+            if last_id is None:
+                self.first_child[parent_id] = db_id
+        if last_id is not None:
+            self.next_sibling[last_id] = db_id
+            self.prev_sibling[db_id] = last_id
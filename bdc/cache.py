@@ -1,32 +1,155 @@
 """Cache of db implementation."""
 
+from dataclasses import dataclass
+from typing import (
+    AbstractSet,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from bdc.changes import (
+    CONFLICT,
+    DELETE,
+    INSERT,
+    RENAME,
+    Changeset,
+    ChangesResult,
+    NodeChange,
+    NodeInsert,
+)
 from bdc.db import DB
+from bdc.events import (
+    ADDED,
+    DELETED,
+    EVICTED,
+    RENAMED,
+    REPARENTED,
+    EventEmitter,
+    Listener,
+)
+from bdc.eviction import (
+    CacheStats,
+    EvictionPolicy,
+    LRUPolicy,
+)
+from bdc.feed import (
+    ChangeFeed,
+    Subscription,
+)
+from bdc.instrumentation import (
+    Instrumented,
+    timed,
+)
 from bdc.node import (
     CNode,
+    Node,
     NodeParams,
 )
 
+# Progress callback gets done and total (0 if unknown) counts,
+# it may raise OperationCancelled to stop operation
+# before cache or db are changed.
+Progress = Callable[[int, int], None]
+
+# Nodes processed between progress calls
+PROGRESS_STEP = 1000
+
+
+class OperationCancelled(Exception):
+    """Operation is cancelled by progress callback."""
+
+
+@dataclass
+class Prefetch:
+    """Nodes loaded together with requested nodes."""
+
+    # Levels of not loaded ancestors
+    ancestors: int = 0
+    # Count of first children of requested nodes
+    # and of their not loaded parents (siblings)
+    children: int = 0
+
+
+class Cache(EventEmitter, Instrumented):
+    """DB cache.
 
-class Cache:
-    """DB cache."""
+    Changes of cache structure are sent to listeners as node events.
 
-    def __init__(self):
+    With capacity set clean loaded leaves are evicted by policy
+    (LRU by default) when cache has more nodes than capacity.
+    Dirty and new nodes are never evicted, so cache can
+    grow over capacity until they are saved.
+    Policy tracks clean leaves only: node stops being tracked
+    when it gets a child and is tracked again when it is a leaf,
+    dirty nodes are tracked again when they are saved.
+
+    With prefetch set, load also reads ancestors and first children
+    of requested nodes, saving round trips of next loads.
+
+    With instrumentation set, latencies of load, save, delete
+    and add_node, loaded and saved nodes counts, deleted subtree sizes
+    and orphans count are recorded.
+
+    Following db change feed, cache watches its loaded nodes
+    and refresh applies db renames and deletes to clean nodes.
+    """
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        policy: Optional[EvictionPolicy] = None,
+        prefetch: Optional[Prefetch] = None,
+    ):
         """Initialization."""
         # Nodes  db index
-        self.db_nodes = {}
+        self.db_nodes: Dict[int, CNode] = {}
         # Without parent node db_ids
-        self.orphans = set()
+        self.orphans: Set[int] = set()
+        # Orphan db_ids waiting for their parent, indexed by parent db_id
+        self.orphans_by_parent: Dict[int, List[int]] = {}
         # Nodes  cache  index
-        self.cache_nodes = {}
+        self.cache_nodes: Dict[int, CNode] = {}
+        # Created, edited or deleted since last save node cache_ids
+        self.dirty: Set[int] = set()
         self._cache_index = 0
+        self.listeners: List[Listener] = []
+        # Max count of nodes, None for not bounded cache
+        self.capacity = capacity
+        if policy is None and capacity is not None:
+            policy = LRUPolicy()
+        self.policy = policy
+        self.stats = CacheStats()
+        self.prefetch = prefetch
+        # Parent db_id of orphans waiting in orphans_by_parent
+        self._orphan_parents: Dict[int, int] = {}
+        # Db changes of loaded nodes, set by follow
+        self.subscription: Optional[Subscription] = None
 
+    @timed('cache.delete')
     def delete(self, cache_id: int):
         """Delete nodes from cache."""
         node = self.cache_nodes[cache_id]
-        node.delete()
+        deleted = node.delete()
+        self.observe('cache.delete.cascade', deleted + 1)
+        self._touch(cache_id)
+        self.emit(DELETED, node)
+
+    def rename(self, cache_id: int, value: str):
+        """Change node value."""
+        node = self.cache_nodes[cache_id]
+        node.value = value
+        self._touch(cache_id)
+        self.emit(RENAMED, node)
 
     default_name = 'New Node'
 
+    @timed('cache.add_node')
     def add_node(self, parent_cache_id: int) -> CNode:
         """Add new node to parent."""
         parent = self.cache_nodes[parent_cache_id]
@@ -42,86 +165,747 @@ class Cache:
         new_node = CNode(
             cache_id=cache_id,
             node_params=new_node_params,
+            changes=self.dirty,
         )
         parent.append_child(new_node)
         self.cache_nodes[cache_id] = new_node
+        self.dirty.add(cache_id)
+        self._untrack(parent)
+        self.emit(ADDED, new_node)
         return new_node
 
-    def load(self, db_id: int, db: DB):
+    def load(
+        self,
+        db_id: int,
+        db: DB,
+        progress: Optional[Progress] = None,
+    ):
         """Load node from db."""
-        # node already loaded
-        if db_id in self.db_nodes:
-            return
+        self.load_many([db_id], db, progress)
 
-        # create node copy
-        new_node_params = db.get_node_params(db_id)
-        cache_id = self._cache_index
-        self._cache_index += 1
-        new_node = CNode(
-            cache_id=cache_id,
-            node_params=new_node_params,
+    @timed('cache.load')
+    def load_many(
+        self,
+        db_ids: Iterable[int],
+        db: DB,
+        progress: Optional[Progress] = None,
+    ) -> List[CNode]:
+        """Load batch of nodes from db.
+
+        Nodes are copied, linked with parents and children
+        and deleted state propagated once per batch.
+        Prefetched nodes are read with second batch.
+        Nodes are watched before they are read, so db changes
+        made after read are not missed, and unwatched if load fails.
+        Progress is reported after nodes are read,
+        before cache is changed.
+        Return new loaded nodes.
+        """
+        to_load = self.not_loaded(db_ids)
+        if not to_load:
+            return []
+        self.watch(to_load)
+        try:
+            nodes_params = db.get_nodes_params(to_load)
+            if self.prefetch is not None:
+                to_prefetch = self.prefetch_ids(nodes_params, db)
+                if to_prefetch:
+                    self.watch(to_prefetch)
+                    to_load.extend(to_prefetch)
+                    nodes_params.extend(db.get_nodes_params(to_prefetch))
+            if progress is not None:
+                progress(len(nodes_params), len(nodes_params))
+        except Exception:
+            self.unwatch_not_loaded(to_load)
+            raise
+        return self.add_batch(nodes_params)
+
+    def prefetch_ids(self, nodes_params: List[NodeParams], db: DB) -> List[int]:
+        """Get not loaded ancestors and children of loading nodes.
+
+        Ancestors and children are read with one batch call each.
+        """
+        prefetch: Prefetch = self.prefetch  # type: ignore
+        to_climb, to_list = self.prefetch_reads(nodes_params)
+        return self.prefetched_ids(
+            nodes_params,
+            db.get_nodes_ancestor_ids(to_climb, prefetch.ancestors) if to_climb else {},
+            db.get_nodes_children_ids(to_list, prefetch.children) if to_list else {},
         )
-        self.db_nodes[new_node_params.db_id] = new_node
-        self.cache_nodes[cache_id] = new_node
 
-        # restore node connections
+    def prefetch_reads(
+        self,
+        nodes_params: List[NodeParams],
+    ) -> Tuple[List[int], List[int]]:
+        """Get db_ids to read ancestors of and to read children of.
+
+        Ancestors are read only for nodes without loaded parent.
+        Children are read for loading nodes and their not loaded parents.
+        """
+        prefetch: Prefetch = self.prefetch  # type: ignore
+        loading = {node_params.db_id for node_params in nodes_params}
+        to_climb: List[int] = []
+        # loading nodes and their not loaded parents
+        to_list: Dict[int, None] = {}
+        for node_params in nodes_params:
+            # nodes read from db have db_id
+            db_id: int = node_params.db_id  # type: ignore
+            parent_id = node_params.parent_id
+            is_parent_new = parent_id is not None and parent_id not in self.db_nodes
+            if prefetch.ancestors and is_parent_new and parent_id not in loading:
+                to_climb.append(db_id)
+            if prefetch.children:
+                to_list[db_id] = None
+                if is_parent_new:
+                    to_list[parent_id] = None  # type: ignore
+        return to_climb, list(to_list)
+
+    def prefetched_ids(
+        self,
+        nodes_params: List[NodeParams],
+        ancestors: Dict[int, List[int]],
+        children: Dict[int, List[int]],
+    ) -> List[int]:
+        """Get not loaded nodes of ancestors and children read for prefetch.
+
+        Ancestors of every node are taken up to first loaded ancestor.
+        """
+        loading = {node_params.db_id for node_params in nodes_params}
+        to_prefetch: Dict[int, None] = {}
+
+        def is_new(db_id: int) -> bool:  # NOQA:WPS430
+            return (
+                db_id not in self.db_nodes and
+                db_id not in loading and
+                db_id not in to_prefetch
+            )
+
+        for ancestor_ids in ancestors.values():
+            for ancestor_id in ancestor_ids:
+                if not is_new(ancestor_id):
+                    break
+                to_prefetch[ancestor_id] = None
+
+        for child_ids in children.values():
+            for child_id in child_ids:
+                if is_new(child_id):
+                    to_prefetch[child_id] = None
+
+        self.stats.prefetched += len(to_prefetch)
+        return list(to_prefetch)
+
+    def not_loaded(self, db_ids: Iterable[int]) -> List[int]:
+        """Skip duplicates and already loaded nodes.
+
+        Loaded nodes are counted as hits, others as misses.
+        """
+        to_load = []
+        for db_id in dict.fromkeys(db_ids):
+            node = self.db_nodes.get(db_id)
+            if node is None:
+                to_load.append(db_id)
+            else:
+                self.stats.hits += 1
+                self._touch(node.cache_id)
+        self.stats.misses += len(to_load)
+        return to_load
+
+    def add_batch(self, nodes_params: Iterable[NodeParams]) -> List[CNode]:
+        """Add batch of nodes read by load and record load metrics.
+
+        Return new loaded nodes.
+        """
+        loaded = self.add_loaded(nodes_params)
+        self.observe('cache.load.nodes', len(loaded))
+        self.set_gauge('cache.orphans', len(self.orphans))
+        return loaded
+
+    def add_loaded(self, nodes_params: Iterable[NodeParams]) -> List[CNode]:
+        """Add nodes read from db to cache.
 
-        adoptees = []
-        for orphan in self.orphans:
-            is_child = db.is_child(orphan, db_id)
-            if is_child:
+        Nodes should be watched before they are read, see watch.
+        Return new loaded nodes.
+        """
+        # create node copies
+        loaded: List[Tuple[CNode, int, Optional[int]]] = []
+        for node_params in nodes_params:
+            cache_id = self._cache_index
+            self._cache_index += 1
+            new_node = CNode(
+                cache_id=cache_id,
+                node_params=node_params,
+                changes=self.dirty,
+            )
+            # nodes read from db have db_id
+            db_id: int = node_params.db_id  # type: ignore
+            self.db_nodes[db_id] = new_node
+            self.cache_nodes[cache_id] = new_node
+            loaded.append((new_node, db_id, node_params.parent_id))
+
+        # restore node connections
+        # only orphans waiting for new nodes are touched
+        for new_node, db_id, _parent_id in loaded:  # NOQA:WPS440
+            for orphan in self.orphans_by_parent.pop(db_id, ()):
                 child = self.db_nodes[orphan]
                 new_node.append_child(child)
-                adoptees.append(orphan)
-        self.orphans -= set(adoptees)
-
-        # restore parent and is_deleted attribute
-        # if parent deleted node should be deleted to
-        parent_id = db.get_parent_id(db_id)
-        if parent_id in self.db_nodes:
-            parent = self.db_nodes[parent_id]
-            parent.append_child(new_node)
-            self.orphans.discard(db_id)
-            if parent.is_deleted:
-                new_node.delete()
-        else:
-            self.orphans.add(db_id)
-
-    def save(self, db: DB):
-        """Save cache to db."""
-        # new created nodes appended to the end of dict
-        # in python >= 3.6 dicts are ordered
-        deleted = []
-        for _cache_id, node in self.cache_nodes.items():
+                self.orphans.discard(orphan)
+                del self._orphan_parents[orphan]  # NOQA:WPS420
+
+        for new_node, db_id, parent_id in loaded:  # NOQA:WPS440
+            parent = None if parent_id is None else self.db_nodes.get(parent_id)
+            if parent is not None:
+                parent.append_child(new_node)
+                self._untrack(parent)
+            else:
+                self.orphans.add(db_id)
+                if parent_id is not None:
+                    self.orphans_by_parent.setdefault(
+                        parent_id, [],
+                    ).append(db_id)
+                    self._orphan_parents[db_id] = parent_id
+
+        new_nodes = [new_node for new_node, _db_id, _parent_id in loaded]
+        self._propagate_deleted(new_nodes)
+        if self.listeners:
+            self._emit_loaded(new_nodes)
+        if self.policy is not None:
+            for new_node in new_nodes:  # NOQA:WPS440
+                self._track(new_node)
+            self.evict(keep={new_node.cache_id for new_node in new_nodes})
+        return new_nodes
+
+    def watch(self, db_ids: Iterable[int]):
+        """Watch db changes of nodes before reading them if cache follows feed."""
+        if self.subscription is not None:
+            self.subscription.watch(db_ids)
+
+    def unwatch_not_loaded(self, db_ids: Iterable[int]):
+        """Stop watching nodes which failed to load."""
+        if self.subscription is not None:
+            self.subscription.unwatch(
+                db_id for db_id in db_ids if db_id not in self.db_nodes
+            )
+
+    @timed('cache.load')
+    def load_subtree(
+        self,
+        db_id: int,
+        db: DB,
+        depth: Optional[int] = None,
+        progress: Optional[Progress] = None,
+    ) -> List[CNode]:
+        """Load node with its subtree from db.
+
+        If depth is set only `depth` levels of children are loaded.
+        Children of every level are read with one batch.
+        Progress is reported after every level of subtree.
+        Nodes are not prefetched.
+        Return new loaded nodes.
+        """
+        db_ids = [db_id]
+        level = [db_id]
+        level_depth = 0
+        while level and (depth is None or level_depth < depth):
+            children = db.get_nodes_children_ids(level)
+            level = [
+                child_id
+                for parent_id in level
+                for child_id in children[parent_id]
+            ]
+            db_ids.extend(level)
+            level_depth += 1
+            if progress is not None:
+                progress(len(db_ids), 0)
+        to_load = self.not_loaded(db_ids)
+        self.watch(to_load)
+        try:
+            nodes_params = db.get_nodes_params(to_load)
+        except Exception:
+            self.unwatch_not_loaded(to_load)
+            raise
+        return self.add_batch(nodes_params)
+
+    def _emit_loaded(self, new_nodes: List[CNode]):
+        """Send events for loaded batch.
+
+        Parents are added before children,
+        adopted orphans are reparented after their new parent is added.
+        """
+        new_set: Set[Node] = set(new_nodes)
+        for new_node in new_nodes:
+            parent = new_node.parent
+            if parent is not None and parent in new_set:
+                continue
+            to_emit: List[Node] = [new_node]
+            while to_emit:
+                node = to_emit.pop()
+                if node not in new_set:
+                    self.emit(REPARENTED, node)
+                    continue
+                self.emit(ADDED, node)
+                to_emit.extend(reversed(node.children))
+
+    def _conflict(
+        self,
+        node_params: NodeParams,
+        value: str,
+        version: int,
+        is_deleted: bool,
+    ) -> Optional[NodeChange]:
+        """Get conflict of dirty node with its db copy if save rejects it."""
+        if node_params.version == version and (
+            is_deleted or not node_params.is_deleted
+        ):
+            return None
+        # read nodes have db_id
+        db_id: int = node_params.db_id  # type: ignore
+        return NodeChange(
+            kind=CONFLICT,
+            db_id=db_id,
+            cache_id=self.db_nodes[db_id].cache_id,
+            value=value,
+            old_value=node_params.value,
+            is_deleted=node_params.is_deleted,
+        )
+
+    def _node_changes(  # NOQA:WPS211
+        self,
+        node_params: NodeParams,
+        value: str,
+        is_deleted: bool,
+        db: DB,
+        deleted: Set[int],
+    ) -> Iterator[NodeChange]:
+        """Compare not conflicting dirty node with its db copy.
+
+        `deleted` are db_ids already reported as deleted.
+        """
+        # read nodes have db_id
+        db_id: int = node_params.db_id  # type: ignore
+        cache_id = self.db_nodes[db_id].cache_id
+        if value != node_params.value:
+            yield NodeChange(
+                kind=RENAME,
+                db_id=db_id,
+                cache_id=cache_id,
+                value=value,
+                old_value=node_params.value,
+            )
+        if is_deleted and not node_params.is_deleted and db_id not in deleted:
+            deleted.add(db_id)
+            yield NodeChange(
+                kind=DELETE,
+                db_id=db_id,
+                cache_id=cache_id,
+                value=value,
+                is_deleted=True,
+            )
+            yield from self._cascade(db_id, db, deleted)
+
+    def _cascade(self, root_id: int, db: DB, deleted: Set[int]) -> Iterator[NodeChange]:
+        """Report deletes of not deleted descendants in db.
+
+        Children of every node are read with one batch.
+        """
+        to_visit = [root_id]
+        while to_visit:
+            child_ids = [
+                child_id
+                for child_id in db.get_children_ids(to_visit.pop())
+                if child_id not in deleted
+            ]
+            if not child_ids:
+                continue
+            for node_params in db.get_nodes_params(child_ids):
+                if node_params.is_deleted:
+                    continue
+                # read nodes have db_id
+                db_id: int = node_params.db_id  # type: ignore
+                deleted.add(db_id)
+                cached = self.db_nodes.get(db_id)
+                yield NodeChange(
+                    kind=DELETE,
+                    db_id=db_id,
+                    cache_id=None if cached is None else cached.cache_id,
+                    value=node_params.value,
+                    is_deleted=True,
+                    deleted_by=root_id,
+                )
+                to_visit.append(db_id)
+
+    def _propagate_deleted(self, new_nodes: List[CNode]):
+        """Restore is_deleted attribute of new nodes.
+
+        If parent deleted node should be deleted too.
+        Every subtree is walked once.
+        """
+        visited: Set[int] = set()
+        for new_node in new_nodes:
+            parent = new_node.parent
+            if parent is None or not parent.is_deleted:
+                continue
+            if new_node.cache_id in visited:
+                continue
+            visited.add(new_node.cache_id)
+            # node is not deleted by set_parent if parent was deleted later
+            if not new_node.is_deleted:
+                new_node.is_deleted = True
+            # visited subtrees are already marked,
+            # descendants of cache node are cache nodes
+            for child in new_node.iter_preorder(
+                prune=lambda node: node.cache_id in visited,  # type: ignore
+            ):
+                child_id: int = child.cache_id  # type: ignore
+                visited.add(child_id)
+                if not child.is_deleted:
+                    child.is_deleted = True
+
+    def changeset(self, progress: Optional[Progress] = None) -> Changeset:
+        """Collect changes of dirty nodes.
+
+        New nodes are referenced by cache_id.
+        Changed nodes are checked by db against loaded versions.
+        Progress is reported every PROGRESS_STEP nodes.
+        """
+        changeset = Changeset()
+        total = len(self.dirty)
+        # new created nodes have greater cache_id than their parents
+        for index, cache_id in enumerate(sorted(self.dirty)):
+            if progress is not None and index % PROGRESS_STEP == 0:
+                progress(index, total)
+            node = self.cache_nodes[cache_id]
             db_id = node.db_id
             if db_id is not None:
-                deleted_children = db.update_node(
-                    db_id,
-                    node.value,
-                    node.is_deleted,
-                )
-                if deleted_children:
-                    deleted.extend(deleted_children)
+                changeset.renames[db_id] = node.value
+                changeset.versions[db_id] = node.version
+                if node.is_deleted:
+                    changeset.deletes.append(db_id)
                 continue
 
-            parent = node.parent
+            # parent of cache node is cache node
+            parent: Optional[CNode] = node.parent  # type: ignore
             if parent is None:
                 raise RuntimeError('In cache all new nodes is subnodes')
 
-            new_node = db.add_to_parent(
-                parent.db_id,
-                node.value,
-                node.is_deleted,
+            insert = NodeInsert(
+                ref=cache_id,
+                value=node.value,
+                is_deleted=node.is_deleted,
+            )
+            if parent.db_id is None:
+                insert.parent_ref = parent.cache_id
+            else:
+                insert.parent_id = parent.db_id
+            changeset.inserts.append(insert)
+        return changeset
+
+    def diff(self, db: DB) -> Iterator[NodeChange]:
+        """Stream changes save would make, db is not changed.
+
+        Only dirty nodes are compared, they are read from db
+        in batches of PROGRESS_STEP. Deleted subtrees are walked
+        in db to report cascade deletes, already deleted
+        descendants are skipped.
+        Save rejects whole changeset if any node conflicts,
+        so then only conflicts are reported, after all
+        dirty nodes are read.
+        """
+        changeset = self.changeset()
+        deletes = set(changeset.deletes)
+        db_ids = list(changeset.renames)
+        nodes_params: List[NodeParams] = []
+        conflicts: List[NodeChange] = []
+        for start in range(0, len(db_ids), PROGRESS_STEP):
+            batch = db.get_nodes_params(db_ids[start:start + PROGRESS_STEP])
+            for node_params in batch:
+                # read nodes have db_id
+                db_id: int = node_params.db_id  # type: ignore
+                conflict = self._conflict(
+                    node_params,
+                    changeset.renames[db_id],
+                    changeset.versions[db_id],
+                    db_id in deletes,
+                )
+                if conflict is not None:
+                    conflicts.append(conflict)
+            nodes_params.extend(batch)
+        if conflicts:
+            yield from conflicts
+            return
+        deleted: Set[int] = set()
+        for node_params in nodes_params:  # NOQA:WPS440
+            db_id = node_params.db_id  # type: ignore
+            yield from self._node_changes(
+                node_params,
+                changeset.renames[db_id],
+                db_id in deletes,
+                db,
+                deleted,
             )
+        for insert in changeset.inserts:
+            yield NodeChange(
+                kind=INSERT,
+                cache_id=insert.ref,
+                value=insert.value,
+                parent_id=insert.parent_id,
+                parent_ref=insert.parent_ref,
+                is_deleted=insert.is_deleted,
+            )
+
+    @timed('cache.save')
+    def save(self, db: DB, progress: Optional[Progress] = None):
+        """Save changed nodes to db.
+
+        Only nodes created, edited or deleted since last save are written.
+        Changes are applied to db as one batch, so cancelling
+        by progress callback leaves cache and db untouched.
+        If changed nodes are changed in db since loading
+        ConflictError is raised and nothing is saved.
+        """
+        self.save_changeset(db, self.changeset(progress))
+
+    def save_changeset(self, db: DB, changeset: Changeset):
+        """Apply changeset of cache to db and update cache.
+
+        Changeset is applied at once and can't be cancelled.
+        """
+        self.observe('cache.save.nodes', len(self.dirty))
+        result = db.apply_changes(changeset)
+        deleted_orphans = self.deleted_orphans(result)
+        to_check = self.orphans_to_check(result)
+        if to_check:
+            deleted_orphans.extend(db.descendants_of(to_check, result.deleted))
+        self.saved(result, deleted_orphans)
+
+    def deleted_orphans(self, result: ChangesResult) -> List[int]:
+        """Get not deleted orphan db_ids listed as deleted by saved changes.
+
+        Case when delete root node.
+        But in cache we have not connection from
+        some subnode to this root.
+        This subnode should be deleted too.
+        Only roots of cache subtrees are taken,
+        deleted state is propagated to their cached subtrees.
+        Deleted db_ids are looked up, orphans are not scanned.
+        """
+        return [
+            db_id
+            for db_id in result.deleted
+            if db_id in self.orphans and not self.db_nodes[db_id].is_deleted
+        ]
+
+    def orphans_to_check(self, result: ChangesResult) -> List[int]:
+        """Get orphan db_ids which could be in lazily deleted subtrees.
+
+        Empty unless result lists deleted subtree roots only,
+        then not deleted orphans are checked against deleted roots
+        with one db query.
+        """
+        if not result.deleted_roots_only or not result.deleted:
+            return []
+        listed = set(result.deleted)
+        return [
+            db_id
+            for db_id in self.orphans
+            if db_id not in listed and not self.db_nodes[db_id].is_deleted
+        ]
+
+    def saved(
+        self,
+        result: ChangesResult,
+        deleted_orphans: Iterable[int],
+        changeset: Optional[Changeset] = None,
+    ):
+        """Update cache after changes are applied to db.
+
+        If applied changeset is passed, nodes changed
+        after it was collected stay dirty.
+        """
+        unsaved = set() if changeset is None else self.unsaved(changeset)
+        for cache_id, db_id in result.inserted.items():
+            node = self.cache_nodes[cache_id]
             # now new node have db_id
-            node.db_id = new_node.db_id
-            self.db_nodes[new_node.db_id] = node
-
-        # Case when delete root node.
-        # But in cache we have not connection from
-        # some subnode to this root.
-        # This subnode should be deleted too.
-        for db_node in deleted:
-            cache_node = self.db_nodes.get(db_node.db_id)
-            if cache_node:
-                cache_node.delete()
+            node.db_id = db_id
+            self.db_nodes[db_id] = node
+        if self.subscription is not None:
+            self.subscription.watch(result.inserted.values())
+
+        for db_id, version in result.versions.items():
+            self.db_nodes[db_id].version = version
+
+        for db_id in deleted_orphans:
+            cache_node = self.db_nodes[db_id]
+            cache_node.delete()
+            self.emit(DELETED, cache_node)
+
+        # cache and db are in sync now
+        saved_ids = self.dirty - unsaved
+        self.dirty.clear()
+        self.dirty.update(unsaved)
+        for cache_id in saved_ids:
+            saved_node = self.cache_nodes.get(cache_id)
+            if saved_node is not None:
+                self._track(saved_node)
+        self.evict()
+        self.set_gauge('cache.orphans', len(self.orphans))
+
+    def unsaved(self, changeset: Changeset) -> Set[int]:
+        """Get dirty cache_ids not saved by changeset.
+
+        Node is not saved if it is not in changeset
+        or its value or deleted state differ from changeset ones.
+        """
+        deletes = set(changeset.deletes)
+        saved_states = {
+            insert.ref: (insert.value, insert.is_deleted)
+            for insert in changeset.inserts
+        }
+        for db_id, saved_value in changeset.renames.items():
+            saved_node = self.db_nodes.get(db_id)
+            if saved_node is not None:
+                saved_states[saved_node.cache_id] = (
+                    saved_value, db_id in deletes,
+                )
+        unsaved: Set[int] = set()
+        for cache_id in self.dirty:
+            node = self.cache_nodes.get(cache_id)
+            if node is None:
+                continue
+            if saved_states.get(cache_id) != (node.value, node.is_deleted):
+                unsaved.add(cache_id)
+        return unsaved
+
+    def follow(self, feed: ChangeFeed):
+        """Watch db changes of loaded nodes.
+
+        Nodes loaded and saved later are watched too,
+        evicted nodes are not watched.
+        """
+        self.unfollow()
+        self.subscription = feed.subscribe(self.db_nodes)
+
+    def unfollow(self):
+        """Stop watching db changes."""
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+
+    def refresh(self) -> List[CNode]:
+        """Apply db changes received since last refresh.
+
+        Values, deleted state and versions of clean nodes are updated
+        without making them dirty and events are sent as for local edits.
+        Dirty nodes keep local changes, save reports them as conflicts.
+        Changes older than node version are skipped, so nodes loaded
+        after change are not rolled back.
+        Return refreshed nodes.
+        """
+        if self.subscription is None:
+            return []
+        refreshed: Dict[int, CNode] = {}
+        for change in self.subscription.drain():
+            # feed changes have db_id
+            db_id: int = change.db_id  # type: ignore
+            node = self.db_nodes.get(db_id)
+            if node is None or node.cache_id in self.dirty:
+                continue
+            if change.version is not None and change.version <= node.version:
+                continue
+            if self._refresh_node(node, change):
+                refreshed[node.cache_id] = node
+        return list(refreshed.values())
+
+    def _refresh_node(self, node: CNode, change: NodeChange) -> bool:
+        """Apply db change to clean node, return if node is changed."""
+        if change.version is not None:
+            node.version = change.version
+        changes, node.changes = node.changes, None
+        try:
+            if change.kind == RENAME and node.value != change.value:
+                node.value = change.value  # type: ignore
+                self.emit(RENAMED, node)
+                return True
+            if change.kind == DELETE and not node.is_deleted:
+                node.is_deleted = True
+                self.emit(DELETED, node)
+                return True
+        finally:
+            node.changes = changes
+        return False
+
+    def evict(self, keep: AbstractSet[int] = frozenset()):
+        """Evict clean leaves until cache fits capacity.
+
+        Dirty and new nodes and nodes of `keep` cache_ids are pinned.
+        Policy tracks clean leaves only, dirty ones met
+        are dropped from it until they are saved.
+        Evicted nodes are detached from parents and orphan indexes,
+        they are loaded again on next load.
+        """
+        if self.policy is None or self.capacity is None:
+            return
+        excess = len(self.cache_nodes) - self.capacity
+        while excess > 0:
+            to_evict: List[CNode] = []
+            pinned: List[int] = []
+            for cache_id in self.policy.candidates():
+                if len(to_evict) == excess:
+                    break
+                if cache_id in keep:
+                    continue
+                if cache_id in self.dirty:
+                    pinned.append(cache_id)
+                    continue
+                to_evict.append(self.cache_nodes[cache_id])
+            for pinned_id in pinned:
+                self.policy.remove(pinned_id)
+            # parents of evicted leaves are tracked for next pass
+            if not to_evict:
+                return
+            for node in to_evict:
+                self._evict_node(node)
+            excess -= len(to_evict)
+
+    def _evict_node(self, node: CNode):
+        """Remove leaf from cache."""
+        # only saved nodes are evicted
+        db_id: int = node.db_id  # type: ignore
+        parent: Optional[CNode] = node.parent  # type: ignore
+        if parent is not None:
+            parent.remove_child(node)
+            self._track(parent)
+        else:
+            self.orphans.discard(db_id)
+            self.set_gauge('cache.orphans', len(self.orphans))
+            parent_id = self._orphan_parents.pop(db_id, None)
+            if parent_id is not None:
+                waiting = self.orphans_by_parent[parent_id]
+                waiting.remove(db_id)
+                if not waiting:
+                    del self.orphans_by_parent[parent_id]  # NOQA:WPS420
+        del self.db_nodes[db_id]  # NOQA:WPS420
+        del self.cache_nodes[node.cache_id]  # NOQA:WPS420
+        if self.subscription is not None:
+            self.subscription.unwatch([db_id])
+        # edits of evicted node are not saved
+        node.changes = None
+        self.policy.remove(node.cache_id)  # type: ignore
+        self.stats.evictions += 1
+        self.emit(EVICTED, node)
+
+    def _touch(self, cache_id: int):
+        """Mark node as used for eviction policy."""
+        if self.policy is not None:
+            self.policy.touch(cache_id)
+
+    def _track(self, node: CNode):
+        """Track node by eviction policy if it is clean leaf."""
+        if self.policy is None or node.children or node.db_id is None:
+            return
+        if node.cache_id not in self.dirty:
+            self.policy.add(node.cache_id)
+
+    def _untrack(self, node: CNode):
+        """Stop tracking node which can't be evicted."""
+        if self.policy is not None:
+            self.policy.remove(node.cache_id)
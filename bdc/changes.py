@@ -0,0 +1,160 @@
+"""Batch of db changes."""
+
+from dataclasses import (
+    dataclass,
+    field,
+)
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+
+@dataclass
+class NodeInsert:
+    """New node.
+
+    `ref` is a caller side key of the node.
+    Parent is an existing db node (`parent_id`) or
+    a node inserted earlier in the same changeset (`parent_ref`).
+    """
+
+    ref: int
+    value: str
+    is_deleted: bool = False
+    parent_id: Optional[int] = None
+    parent_ref: Optional[int] = None
+
+
+@dataclass
+class Changeset:
+    """Batch of inserts, renames and deletes."""
+
+    inserts: List[NodeInsert] = field(default_factory=list)
+    # db_id -> new value
+    renames: Dict[int, str] = field(default_factory=dict)
+    # deleted subtree roots db_ids
+    deletes: List[int] = field(default_factory=list)
+    # db_id -> node version the change is based on,
+    # nodes without version are not checked
+    versions: Dict[int, int] = field(default_factory=dict)
+
+
+@dataclass
+class ChangesResult:
+    """Result of applying changeset."""
+
+    # insert ref -> new db_id
+    inserted: Dict[int, int] = field(default_factory=dict)
+    # db_ids of deleted nodes including cascades
+    deleted: List[int] = field(default_factory=list)
+    # deleted lists subtree roots only, descendants are deleted lazily
+    deleted_roots_only: bool = False
+    # db_id -> node version after applying for checked nodes
+    versions: Dict[int, int] = field(default_factory=dict)
+
+
+# Node change kinds
+INSERT = 'insert'
+RENAME = 'rename'
+DELETE = 'delete'
+# Node is changed in db since it was read, change would be rejected
+CONFLICT = 'conflict'
+
+
+@dataclass
+class NodeChange:
+    """Change of one node which applying changes would make or made."""
+
+    kind: str
+    # None for inserts
+    db_id: Optional[int] = None
+    # None for not cached nodes
+    cache_id: Optional[int] = None
+    # New value of inserts and renames, db value otherwise
+    value: Optional[str] = None
+    # db value of renames and conflicts
+    old_value: Optional[str] = None
+    # Insert parent, db node or inserted node
+    parent_id: Optional[int] = None
+    parent_ref: Optional[int] = None
+    is_deleted: bool = False
+    # Deleted subtree root db_id for deletes of descendants
+    deleted_by: Optional[int] = None
+    # db version after change, None if version is not changed
+    version: Optional[int] = None
+
+
+class ConflictError(ValueError):
+    """Changed nodes are changed in db by someone else."""
+
+    def __init__(self, db_ids: Iterable[int]):
+        """Initialization."""
+        self.db_ids = sorted(db_ids)
+        super().__init__(
+            'Nodes {db_ids} are changed in db'.format(db_ids=self.db_ids),
+        )
+
+
+def validate_changeset(changeset: Changeset, exists: Callable[[int], bool]):
+    """Check changeset before applying.
+
+    `exists` checks that db_id is present in db.
+    Raise ValueError for the first wrong change.
+    """
+    for db_id in list(changeset.renames) + changeset.deletes:
+        if not exists(db_id):
+            raise ValueError('{db_id} not found'.format(db_id=db_id))
+
+    refs: Set[int] = set()
+    for insert in changeset.inserts:
+        if insert.ref in refs:
+            raise ValueError(
+                'Duplicate insert ref {ref}'.format(ref=insert.ref),
+            )
+        if (insert.parent_id is None) == (insert.parent_ref is None):
+            raise ValueError(
+                'Insert {ref} should have exactly one parent'.format(
+                    ref=insert.ref,
+                ),
+            )
+        if insert.parent_ref is not None and insert.parent_ref not in refs:
+            raise ValueError(
+                '{parent_ref} not inserted before {ref}'.format(
+                    parent_ref=insert.parent_ref,
+                    ref=insert.ref,
+                ),
+            )
+        if insert.parent_id is not None and not exists(insert.parent_id):
+            raise ValueError(
+                '{parent_id} not found'.format(parent_id=insert.parent_id),
+            )
+        refs.add(insert.ref)
+
+
+def check_versions(
+    changeset: Changeset,
+    get_version: Callable[[int], int],
+    is_deleted: Callable[[int], bool],
+):
+    """Check that changed nodes are not changed since they were read.
+
+    Node is in conflict if its version is changed or it is
+    deleted in db while changeset expects it alive.
+    Only nodes in `changeset.versions` are checked.
+    Raise ConflictError with all conflicting db_ids.
+    """
+    deletes = set(changeset.deletes)
+    conflicts = [
+        db_id
+        for db_id, version in changeset.versions.items()
+        if get_version(db_id) != version or (
+            db_id not in deletes and is_deleted(db_id)
+        )
+    ]
+    if conflicts:
+        raise ConflictError(conflicts)
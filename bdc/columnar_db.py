@@ -0,0 +1,400 @@
+"""DB of nodes stored in columns."""
+
+from array import array
+from itertools import islice
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from bdc.changes import (
+    Changeset,
+    ChangesResult,
+    check_versions,
+    validate_changeset,
+)
+from bdc.db import add_default_nodes
+from bdc.instrumentation import (
+    Instrumented,
+    timed,
+)
+from bdc.node import (
+    Node,
+    NodeParams,
+)
+
+# Missing parent, child or sibling
+NONE_ID = -1
+# Parent of db_id without node, e.g. reserved by rejected changeset
+MISSING_ID = -2
+
+
+class NodesView(Mapping):
+    """Read only db_id -> node mapping.
+
+    Nodes are created on access.
+    """
+
+    def __init__(self, db: 'ColumnsReader'):
+        """Initialization."""
+        self.db = db
+
+    def __getitem__(self, db_id: int) -> Node:
+        """Create node view."""
+        node = self.db.get(db_id)
+        if node is None:
+            raise KeyError(db_id)
+        return node
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over db_ids with nodes."""
+        if not self.db.missing_count:
+            return iter(range(len(self.db.parents)))
+        return (
+            db_id
+            for db_id, parent_id in enumerate(self.db.parents)
+            if parent_id != MISSING_ID
+        )
+
+    def __len__(self) -> int:
+        """Get nodes count."""
+        return len(self.db.parents) - self.db.missing_count
+
+
+class ColumnsReader:
+    """Read methods of db with node columns indexed by db_id.
+
+    Subclass keeps parents and versions columns,
+    gets node value, deleted flag and children.
+    """
+
+    node_cls = Node
+    # db_ids without node
+    missing_count = 0
+    parents: Sequence[int]
+    versions: Sequence[int]
+
+    def get(self, db_id: int) -> Optional[Node]:
+        """Get node view by db_id."""
+        if not self._exists(db_id):
+            return None
+        return self.node_cls(
+            self._value(db_id),
+            db_id,
+            self._deleted(db_id),
+            self.versions[db_id],
+        )
+
+    def get_node_params(self, db_id: int) -> NodeParams:
+        """Get node simple copy."""
+        if not self._exists(db_id):
+            raise KeyError(db_id)
+        parent_id = self.parents[db_id]
+        return NodeParams(
+            db_id=db_id,
+            value=self._value(db_id),
+            is_deleted=self._deleted(db_id),
+            parent_id=None if parent_id == NONE_ID else parent_id,
+            version=self.versions[db_id],
+        )
+
+    def get_nodes_params(self, db_ids: Iterable[int]) -> List[NodeParams]:
+        """Get simple copies of batch of nodes."""
+        return [self.get_node_params(db_id) for db_id in db_ids]
+
+    def get_parent_id(self, db_id: int) -> Optional[int]:
+        """Get node parent_id."""
+        if not self._exists(db_id):
+            raise KeyError(db_id)
+        parent_id = self.parents[db_id]
+        return None if parent_id == NONE_ID else parent_id
+
+    def get_version(self, db_id: int) -> int:
+        """Get node version."""
+        if not self._exists(db_id):
+            raise KeyError(db_id)
+        return self.versions[db_id]
+
+    def get_root_ids(self) -> List[int]:
+        """Get root db_ids."""
+        return [0] if self._exists(0) else []
+
+    def get_children_ids(self, db_id: int, limit: Optional[int] = None) -> List[int]:
+        """Get node children db_ids, first `limit` if set."""
+        if not self._exists(db_id):
+            raise KeyError(db_id)
+        return list(islice(self._iter_children(db_id), limit))
+
+    def get_ancestor_ids(self, db_id: int, levels: Optional[int] = None) -> List[int]:
+        """Get ancestors db_ids from parent up, `levels` at most if set."""
+        if not self._exists(db_id):
+            raise KeyError(db_id)
+        ancestor_ids: List[int] = []
+        parent_id = self.parents[db_id]
+        while parent_id != NONE_ID and len(ancestor_ids) != levels:
+            ancestor_ids.append(parent_id)
+            parent_id = self.parents[parent_id]
+        return ancestor_ids
+
+    def get_nodes_children_ids(
+        self,
+        db_ids: Iterable[int],
+        limit: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """Get children db_ids of batch of nodes by node db_id."""
+        return {db_id: self.get_children_ids(db_id, limit) for db_id in db_ids}
+
+    def get_nodes_ancestor_ids(
+        self,
+        db_ids: Iterable[int],
+        levels: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """Get ancestors db_ids of batch of nodes by node db_id."""
+        return {db_id: self.get_ancestor_ids(db_id, levels) for db_id in db_ids}
+
+    def is_deleted(self, db_id: int) -> bool:
+        """Check node deleted state."""
+        if not self._exists(db_id):
+            raise KeyError(db_id)
+        return self._deleted(db_id)
+
+    def is_child(self, child_id: int, parent_id: int) -> bool:
+        """Check connection between child and parent."""
+        return self.get_parent_id(child_id) == parent_id
+
+    def _exists(self, db_id: Optional[int]) -> bool:
+        """Check that node exists."""
+        return (
+            db_id is not None and
+            0 <= db_id < len(self.parents) and
+            self.parents[db_id] != MISSING_ID
+        )
+
+    def _value(self, db_id: int) -> str:
+        """Get node value."""
+        raise NotImplementedError
+
+    def _deleted(self, db_id: int) -> bool:
+        """Get node deleted flag."""
+        raise NotImplementedError
+
+    def _iter_children(self, db_id: int) -> Iterator[int]:
+        """Iterate over children db_ids."""
+        raise NotImplementedError
+
+
+class ColumnarDB(ColumnsReader, Instrumented):
+    """DB of nodes stored in columns.
+
+    Node attributes are kept in arrays indexed by db_id:
+    parent ids, deleted flags, versions and children linked lists
+    (first child, last child and next sibling).
+    Values are kept in interned string table.
+    No node objects are kept, node views are created on access
+    and have no parent and children, so no node events are sent.
+    Delete sets deleted flags walking children lists at once,
+    new node takes next column index as db_id.
+
+    Example:
+        db = ColumnarDB()
+        root = db.add_root('root')
+        node1 = db.add_to_parent(root, 'node1')
+
+    """
+
+    parents: 'array[int]'
+    versions: 'array[int]'
+
+    def __init__(self):
+        """DB initialization."""
+        self.parents = array('q')
+        self.deleted = bytearray()
+        self.versions = array('q')
+        self.first_children = array('q')
+        self.last_children = array('q')
+        self.next_siblings = array('q')
+        self.value_ids = array('q')
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self.nodes = NodesView(self)
+
+    @classmethod
+    def default(cls):
+        """Create default db with hierarchy = 4.
+
+        See DB.default.
+        """
+        db = cls()
+        add_default_nodes(db)
+        return db
+
+    def add_root(self, value: str) -> Node:
+        """Add root."""
+        if self.parents:
+            raise RuntimeError('DB already have root node')
+        return self.create_new_node(value, is_deleted=False)
+
+    @timed('db.add_to_parent')
+    def add_to_parent(
+        self,
+        parent: Union[Node, int],
+        value: str,
+        is_deleted: bool = False,
+    ) -> Node:
+        """Add node to parent."""
+        if isinstance(parent, Node):
+            parent_index = parent.db_id
+        else:
+            parent_index = parent
+
+        if parent_index is None or not self._exists(parent_index):
+            raise ValueError(
+                '{parent_index} not found'.format(parent_index=parent_index),
+            )
+        return self.create_new_node(value, is_deleted, parent_index)
+
+    @timed('db.update_node')
+    def update_node(self, db_id: int, value: str, is_deleted: bool) -> Optional[List[Node]]:
+        """Update node.
+
+        If node deleted, all children marked as deleted.
+        If deleting node func return deleted children.
+        """
+        if not self._exists(db_id):
+            raise KeyError(db_id)
+        self._rename(db_id, value)
+        # Undeleted operation not exist
+        if is_deleted:
+            deleted = self._delete_subtrees([db_id])
+            return [self.nodes[child_id] for child_id in deleted[1:]]
+        return None
+
+    @timed('db.apply_changes')
+    def apply_changes(self, changeset: Changeset) -> ChangesResult:
+        """Apply batch of changes.
+
+        Changeset is validated before applying, so either all changes
+        are applied or ValueError is raised and db is untouched.
+        ConflictError is raised if versioned nodes are changed.
+        Deleted subtrees are walked once for the whole batch.
+        """
+        validate_changeset(changeset, self._exists)
+        check_versions(changeset, self.get_version, self.is_deleted)
+
+        for db_id, value in changeset.renames.items():
+            self._rename(db_id, value)
+
+        inserted: Dict[int, int] = {}
+        for insert in changeset.inserts:
+            if insert.parent_ref is None:
+                # validated changeset inserts have parent
+                parent_id: int = insert.parent_id  # type: ignore
+            else:
+                parent_id = inserted[insert.parent_ref]
+            new_node = self.create_new_node(
+                insert.value,
+                insert.is_deleted,
+                parent_id,
+            )
+            new_id: int = new_node.db_id  # type: ignore
+            inserted[insert.ref] = new_id
+
+        deleted = self._delete_subtrees(changeset.deletes)
+        return ChangesResult(
+            inserted=inserted,
+            deleted=deleted,
+            versions={
+                db_id: self.versions[db_id]
+                for db_id in changeset.versions
+            },
+        )
+
+    def create_new_node(
+        self,
+        value: str,
+        is_deleted: bool,
+        parent_id: int = NONE_ID,
+    ) -> Node:
+        """Append node columns and link it to parent."""
+        db_id = len(self.parents)
+        if parent_id != NONE_ID:
+            # If parent already deleted child should be deleted too
+            is_deleted = is_deleted or bool(self.deleted[parent_id])
+            last_child = self.last_children[parent_id]
+            if last_child == NONE_ID:
+                self.first_children[parent_id] = db_id
+            else:
+                self.next_siblings[last_child] = db_id
+            self.last_children[parent_id] = db_id
+
+        self.parents.append(parent_id)
+        self.deleted.append(is_deleted)
+        self.versions.append(0)
+        self.first_children.append(NONE_ID)
+        self.last_children.append(NONE_ID)
+        self.next_siblings.append(NONE_ID)
+        self.value_ids.append(self._intern(value))
+        return self.node_cls(value, db_id, is_deleted)
+
+    def _rename(self, db_id: int, value: str):
+        """Change node value."""
+        value_id = self._intern(value)
+        if self.value_ids[db_id] != value_id:
+            self.value_ids[db_id] = value_id
+            self.versions[db_id] += 1
+
+    def _intern(self, value: str) -> int:
+        """Get value index in string table."""
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+
+    def _value(self, db_id: int) -> str:
+        """Get interned node value."""
+        value: str = self.strings[self.value_ids[db_id]]
+        return value  # NOQA: WPS331
+
+    def _deleted(self, db_id: int) -> bool:
+        """Get node deleted flag."""
+        return bool(self.deleted[db_id])
+
+    def _iter_children(self, db_id: int) -> Iterator[int]:
+        """Iterate over children db_ids."""
+        child_id = self.first_children[db_id]
+        while child_id != NONE_ID:
+            yield child_id
+            child_id = self.next_siblings[child_id]
+
+    def _delete_subtrees(self, db_ids: Iterable[int]) -> List[int]:
+        """Mark subtrees as deleted.
+
+        Return db_ids of all deleted nodes, subtree roots go first.
+        Nested subtrees are walked only once.
+        """
+        deleted = []
+        visited = set()
+        to_delete = list(db_ids)
+        for db_id in set(to_delete):
+            if not self.deleted[db_id]:
+                self.versions[db_id] += 1
+        to_delete.reverse()
+        while to_delete:
+            db_id = to_delete.pop()
+            if db_id in visited:
+                continue
+            visited.add(db_id)
+            self.deleted[db_id] = True
+            deleted.append(db_id)
+            to_delete.extend(self._iter_children(db_id))
+        if deleted:
+            self.observe('db.delete.cascade', len(deleted))
+        return deleted
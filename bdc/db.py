@@ -1,18 +1,53 @@
 """DB of nodes implementation."""
 
+import threading
+import time
+from contextlib import ExitStack
 from typing import (
+    Dict,
+    Iterable,
+    Iterator,
     List,
     Optional,
+    Set,
+    Tuple,
     Union,
 )
 
+from bdc.ancestry import AncestryIndex
+from bdc.changes import (
+    Changeset,
+    ChangesResult,
+    check_versions,
+    validate_changeset,
+)
+from bdc.events import (
+    ADDED,
+    DELETED,
+    RENAMED,
+    EventEmitter,
+    Listener,
+)
+from bdc.instrumentation import (
+    Instrumented,
+    timed,
+)
 from bdc.node import (
     Node,
     NodeParams,
 )
 
+# Count of node locks, node is guarded by lock db_id % LOCK_STRIPES
+LOCK_STRIPES = 64
+
 
-class DB:
+def _db_id(node: Node) -> int:
+    """Get db_id of db node, db nodes always have it."""
+    db_id: int = node.db_id  # type: ignore
+    return db_id  # NOQA: WPS331
+
+
+class DB(EventEmitter, Instrumented):
     """DB of nodes.
 
     It is simple root node with indexing.
@@ -23,14 +58,52 @@ class DB:
         node1 = db.add_to_parent('node1', root)
         node2 = db.add_to_parent('node2', node1)
 
+    With lazy_delete deleting node records a tombstone on it
+    and descendants are resolved as deleted through their ancestors
+    until tombstones are materialized.
+
+    With ancestry_index descendant and depth queries
+    use nested interval labels.
+
+    Added, renamed and deleted nodes are sent to listeners
+    as node events, deleted event is sent for subtree root only.
+
+    Node version is incremented on rename and delete.
+
+    With instrumentation set, latencies of update_node, add_to_parent
+    and apply_changes and deleted subtree sizes are recorded.
+
+    DB is safe to change from many threads. Node value, deleted state
+    and children are changed under node stripe lock, so writes to
+    different nodes run in parallel. Changeset is checked and applied
+    holding stripes of all its nodes, changeset deleting subtrees
+    eagerly holds all stripes. Reads are not locked, readers
+    of all nodes iterate copy of nodes taken under id lock.
+
     """
 
     node_cls = Node
 
-    def __init__(self):
+    def __init__(
+        self,
+        lazy_delete: bool = False,
+        ancestry_index: bool = False,
+    ):
         """DB initialization."""
-        self.nodes = {}
+        self.nodes: Dict[int, Node] = {}
         self._node_index = 0
+        self.lazy_delete = lazy_delete
+        # Deleted subtree roots with not materialized descendants
+        self.tombstones: Set[int] = set()
+        self._to_materialize: List[Node] = []
+        self.ancestry: Optional[AncestryIndex] = None
+        self.listeners: List[Listener] = []
+        self._stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        # Guards node index and nodes registration
+        self._id_lock = threading.RLock()
+        self._ancestry_lock = threading.Lock()
+        if ancestry_index:
+            self.build_ancestry_index()
 
     @classmethod
     def default(cls):
@@ -47,27 +120,22 @@ class DB:
         2   node_1_2
         """
         db = cls()
-        root = db.add_root('root')
-
-        node_1_1 = db.add_to_parent(root, 'node_1_1')
-        db.add_to_parent(root, 'node_1_2')
-
-        node_2_1 = db.add_to_parent(node_1_1, 'node_2_1')
-        db.add_to_parent(node_1_1, 'node_2_2')
-
-        node_3_1 = db.add_to_parent(node_2_1, 'node_3_1')
-        db.add_to_parent(node_2_1, 'node_3_2')
-
-        db.add_to_parent(node_3_1, 'node_4_1')
-        db.add_to_parent(node_3_1, 'node_4_2')
+        add_default_nodes(db)
         return db
 
     def add_root(self, value: str) -> Node:
         """Add root."""
-        if self.nodes or self._node_index != 0:
-            raise RuntimeError('DB already have root node')
-        return self.create_new_node(value, is_deleted=False)
+        with self._id_lock:
+            if self.nodes or self._node_index != 0:
+                raise RuntimeError('DB already have root node')
+            root = self.create_new_node(value, is_deleted=False)
+        if self.ancestry is not None:
+            with self._ancestry_lock:
+                self.ancestry.add(_db_id(root), None)
+        self.emit(ADDED, root)
+        return root
 
+    @timed('db.add_to_parent')
     def add_to_parent(
         self,
         parent: Union[Node, int],
@@ -76,7 +144,7 @@ class DB:
     ) -> Node:
         """Add node to parent."""
         if isinstance(parent, Node):
-            parent_index = parent.db_id
+            parent_index = _db_id(parent)
         else:
             parent_index = parent
 
@@ -86,33 +154,93 @@ class DB:
             raise ValueError(
                 '{parent_index} not found'.format(parent_index=parent_index),
             )
-        new_node = self.create_new_node(value, is_deleted)
-        db_parent.append_child(new_node)
+        with self._stripe(parent_index):
+            new_node = self.create_new_node(value, is_deleted)
+            self._append_child(db_parent, new_node)
         return new_node
 
     def get(self, db_id: int) -> Optional[Node]:
         """Get node by db_id."""
-        node: Optional[None] = self.nodes.get(db_id)
+        node: Optional[Node] = self.nodes.get(db_id)
         return node  # NOQA: WPS331
 
     def get_node_params(self, db_id: int) -> NodeParams:
         """Get node simple copy."""
         node = self.nodes[db_id]
+        parent = node.parent
         return NodeParams(
             db_id=node.db_id,
             value=node.value,
-            is_deleted=node.is_deleted,
+            is_deleted=self.is_deleted(db_id),
+            parent_id=parent.db_id if parent is not None else None,
+            version=node.version,
         )
 
+    def get_nodes_params(self, db_ids: Iterable[int]) -> List[NodeParams]:
+        """Get simple copies of batch of nodes."""
+        return [self.get_node_params(db_id) for db_id in db_ids]
+
     def get_parent_id(self, db_id: int) -> Optional[int]:
         """Get node parent_id."""
         node = self.nodes[db_id]
         parent = node.parent
         if parent:
-            parent_id: int = parent.db_id
-            return parent_id  # NOQA: WPS331
+            return _db_id(parent)
         return None
 
+    def get_version(self, db_id: int) -> int:
+        """Get node version."""
+        version: int = self.nodes[db_id].version
+        return version  # NOQA: WPS331
+
+    def get_root_ids(self) -> List[int]:
+        """Get root db_ids."""
+        return [0] if 0 in self.nodes else []
+
+    def get_children_ids(self, db_id: int, limit: Optional[int] = None) -> List[int]:
+        """Get node children db_ids, first `limit` if set."""
+        node = self.nodes[db_id]
+        return [_db_id(child) for child in node.children[:limit]]
+
+    def get_ancestor_ids(self, db_id: int, levels: Optional[int] = None) -> List[int]:
+        """Get ancestors db_ids from parent up, `levels` at most if set."""
+        ancestor_ids: List[int] = []
+        parent = self.nodes[db_id].parent
+        while parent is not None and len(ancestor_ids) != levels:
+            ancestor_ids.append(_db_id(parent))
+            parent = parent.parent
+        return ancestor_ids
+
+    def get_nodes_children_ids(
+        self,
+        db_ids: Iterable[int],
+        limit: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """Get children db_ids of batch of nodes by node db_id."""
+        return {db_id: self.get_children_ids(db_id, limit) for db_id in db_ids}
+
+    def get_nodes_ancestor_ids(
+        self,
+        db_ids: Iterable[int],
+        levels: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """Get ancestors db_ids of batch of nodes by node db_id."""
+        return {db_id: self.get_ancestor_ids(db_id, levels) for db_id in db_ids}
+
+    def is_deleted(self, db_id: int) -> bool:
+        """Check node deleted state.
+
+        With lazy_delete node is deleted if any ancestor is deleted.
+        """
+        node: Optional[Node] = self.nodes[db_id]
+        if not self.lazy_delete:
+            return node.is_deleted  # type: ignore
+        while node is not None:
+            if node.is_deleted:
+                return True
+            node = node.parent
+        return False
+
     def is_child(self, child_id: int, parent_id: int) -> bool:
         """Check connection between child and parent."""
         child = self.nodes[child_id]
@@ -120,24 +248,367 @@ class DB:
             return True
         return False
 
+    def is_descendant(self, db_id: int, ancestor_id: int) -> bool:
+        """Check that node is in ancestor subtree (ancestor excluded)."""
+        if self.ancestry is not None:
+            with self._ancestry_lock:
+                return self.ancestry.is_descendant(db_id, ancestor_id)
+        ancestor = self.nodes[ancestor_id]
+        parent = self.nodes[db_id].parent
+        while parent is not None:
+            if parent is ancestor:
+                return True
+            parent = parent.parent
+        return False
+
+    def descendants_of(
+        self,
+        db_ids: Iterable[int],
+        ancestor_ids: Iterable[int],
+    ) -> List[int]:
+        """Get db_ids which are in subtrees of ancestors (ancestors excluded).
+
+        With ancestry_index nodes are checked by labels, otherwise
+        parents are walked up to first ancestor already resolved,
+        so shared ancestors are walked once for the batch.
+        """
+        if self.ancestry is not None:
+            with self._ancestry_lock:
+                return self.ancestry.descendants_of(db_ids, ancestor_ids)
+        # visited node -> it is in subtree of ancestors
+        resolved: Dict[Node, bool] = {
+            self.nodes[ancestor_id]: True
+            for ancestor_id in ancestor_ids
+        }
+        found = []
+        for db_id in db_ids:
+            path = []
+            parent = self.nodes[db_id].parent
+            while parent is not None and parent not in resolved:
+                path.append(parent)
+                parent = parent.parent
+            is_found = parent is not None and resolved[parent]
+            for path_node in path:
+                resolved[path_node] = is_found
+            if is_found:
+                found.append(db_id)
+        return found
+
+    def depth(self, db_id: int) -> int:
+        """Get node depth, root has depth 0."""
+        if self.ancestry is not None:
+            with self._ancestry_lock:
+                return self.ancestry.depth(db_id)
+        depth = 0
+        parent = self.nodes[db_id].parent
+        while parent is not None:
+            depth += 1
+            parent = parent.parent
+        return depth
+
+    def subtree_ids(self, db_id: int) -> Iterator[int]:
+        """Iterate over db_ids of node subtree in pre-order."""
+        node = self.nodes[db_id]
+        yield db_id
+        for child in node.iter_preorder():
+            yield _db_id(child)
+
+    def build_ancestry_index(self):
+        """Build nested interval index for ancestry queries.
+
+        Index is updated on adding nodes.
+        """
+        root_ids = [
+            db_id
+            for db_id, node in self._nodes_items()
+            if node.parent is None
+        ]
+        self.ancestry = AncestryIndex(self.get_children_ids, root_ids)
+
+    @timed('db.update_node')
     def update_node(self, db_id: int, value: str, is_deleted: bool) -> Optional[List[Node]]:
         """Update node.
 
         If node deleted, all children marked as deleted.
         If deleting node func return deleted children.
+        With lazy_delete only tombstone is recorded
+        and no children are returned.
         """
         node = self.nodes[db_id]
-        node.value = value
-        # Undeleted operation not exist
-        if is_deleted:
-            deleted_children: List[Node] = node.delete()
-            return deleted_children  # NOQA:WPS331
-        return None
+        with self._stripe(db_id):
+            self._rename(node, value)
+            # Undeleted operation not exist
+            if is_deleted:
+                self._count_deleted([db_id])
+        if not is_deleted:
+            return None
+        if self.lazy_delete:
+            self._add_tombstones([db_id])
+            self.emit(DELETED, node)
+            return []
+        deleted = self._delete_subtrees([db_id])
+        self.emit(DELETED, node)
+        return [
+            self.nodes[child_id]
+            for child_id in deleted
+            if child_id != db_id
+        ]
+
+    @timed('db.apply_changes')
+    def apply_changes(self, changeset: Changeset) -> ChangesResult:
+        """Apply batch of changes.
+
+        Changeset is validated before applying, so either all changes
+        are applied or ValueError is raised and db is untouched.
+        ConflictError is raised if versioned nodes are changed,
+        db_ids of inserts are reserved after versions are checked.
+        Deleted subtrees are walked once for the whole batch.
+        """
+        validate_changeset(changeset, self.nodes.__contains__)
+        locked: Iterable[int]
+        if changeset.deletes and not self.lazy_delete:
+            # deleted subtrees may have nodes of any stripe
+            locked = range(LOCK_STRIPES)
+        else:
+            locked = set(changeset.renames).union(
+                changeset.deletes,
+                changeset.versions,
+                (
+                    insert.parent_id
+                    for insert in changeset.inserts
+                    if insert.parent_id is not None
+                ),
+            )
+        with self._stripes_of(locked):
+            return self._apply_locked(changeset)
+
+    def materialize_deleted(self, budget: Optional[int] = None) -> bool:
+        """Mark descendants of tombstones as deleted.
+
+        At most `budget` nodes are marked per call, so it can be
+        called step by step. Already deleted subtrees are skipped.
+        Return True if all tombstones are materialized.
+        """
+        while self._to_materialize or self.tombstones:
+            if not self._to_materialize:
+                root = self.nodes[self.tombstones.pop()]
+                self._to_materialize.extend(root.children)
+                continue
+            if budget is not None:
+                if budget <= 0:
+                    return False
+                budget -= 1
+            node = self._to_materialize.pop()
+            with self._stripe(_db_id(node)):
+                if node.is_deleted:
+                    continue
+                node.is_deleted = True
+                children = list(node.children)
+            self._to_materialize.extend(children)
+        return True
+
+    def materialize_in_background(self, budget: int = 1000) -> threading.Thread:
+        """Materialize tombstones in daemon thread.
+
+        Thread yields to other threads after every `budget` nodes.
+        """
+        def materialize():  # NOQA:WPS430
+            while not self.materialize_deleted(budget):
+                time.sleep(0)
+
+        thread = threading.Thread(target=materialize, daemon=True)
+        thread.start()
+        return thread
+
+    def _apply_locked(self, changeset: Changeset) -> ChangesResult:
+        """Check versions, rename, insert and delete.
+
+        Stripes of changeset nodes should be held.
+        """
+        check_versions(changeset, self.get_version, self.is_deleted)
+
+        for db_id, value in changeset.renames.items():
+            self._rename(self.nodes[db_id], value)
+
+        inserted = self._insert_new(changeset)
+
+        self._count_deleted(changeset.deletes)
+        if self.lazy_delete:
+            deleted = self._add_tombstones(changeset.deletes)
+        else:
+            deleted = self._delete_subtrees(changeset.deletes)
+        for deleted_id in changeset.deletes:
+            self.emit(DELETED, self.nodes[deleted_id])
+        return ChangesResult(
+            inserted=inserted,
+            deleted=deleted,
+            deleted_roots_only=self.lazy_delete,
+            versions={
+                versioned_id: self.nodes[versioned_id].version
+                for versioned_id in changeset.versions
+            },
+        )
+
+    def _insert_new(self, changeset: Changeset) -> Dict[int, int]:
+        """Create inserted nodes and add them to parents.
+
+        Stripes of new nodes are not held, so new nodes are
+        registered and linked at once under id lock.
+        Return inserted db_ids by insert ref.
+        """
+        first_id = self._reserve_ids(len(changeset.inserts))
+        new_nodes: Dict[int, Node] = {}
+        links: List[Tuple[Node, Node]] = []
+        for db_id, insert in enumerate(changeset.inserts, first_id):
+            if insert.parent_ref is None:
+                # validated insert without parent_ref has parent_id
+                parent_id: int = insert.parent_id  # type: ignore
+                parent = self.nodes[parent_id]
+            else:
+                parent = new_nodes[insert.parent_ref]
+            new_node = self.node_cls(insert.value, db_id, insert.is_deleted)
+            new_nodes[insert.ref] = new_node
+            links.append((parent, new_node))
+
+        with self._id_lock:
+            for _parent, new_node in links:  # NOQA:WPS440
+                self.nodes[_db_id(new_node)] = new_node
+            # parents go first, so deleted state is inherited
+            for parent, new_node in links:  # NOQA:WPS440
+                parent.append_child(new_node)
+        if self.ancestry is not None:
+            with self._ancestry_lock:
+                for parent, new_node in links:  # NOQA:WPS440
+                    self.ancestry.add(_db_id(new_node), _db_id(parent))
+        for _parent, new_node in links:  # NOQA:WPS440
+            self.emit(ADDED, new_node)
+        return {
+            ref: _db_id(new_node)
+            for ref, new_node in new_nodes.items()
+        }
+
+    def _count_deleted(self, db_ids: Iterable[int]):
+        """Increment versions of not deleted yet nodes."""
+        for db_id in set(db_ids):
+            node = self.nodes[db_id]
+            if not node.is_deleted:
+                node.version += 1
+
+    def _add_tombstones(self, db_ids: Iterable[int]) -> List[int]:
+        """Mark subtree roots as deleted without walking subtrees.
+
+        Return db_ids of new tombstones.
+        """
+        deleted = []
+        for db_id in db_ids:
+            node = self.nodes[db_id]
+            with self._stripe(db_id):
+                if node.is_deleted:
+                    continue
+                node.is_deleted = True
+            self.tombstones.add(db_id)
+            deleted.append(db_id)
+        return deleted
 
-    def create_new_node(self, value: str, is_deleted: bool) -> Node:
-        """Create new node and add it to index."""
-        db_id = self._node_index
-        self._node_index += 1
+    def _delete_subtrees(self, db_ids: Iterable[int]) -> List[int]:
+        """Mark subtrees as deleted.
+
+        Return db_ids of all deleted nodes.
+        Nested subtrees are walked only once.
+        """
+        deleted = []
+        visited: Set[int] = set()
+        to_delete = [self.nodes[db_id] for db_id in db_ids]
+        while to_delete:
+            node = to_delete.pop()
+            node_id = _db_id(node)
+            if node_id in visited:
+                continue
+            visited.add(node_id)
+            # children added after unlock inherit deleted state
+            with self._stripe(node_id):
+                node.is_deleted = True
+                children = list(node.children)
+            deleted.append(node_id)
+            to_delete.extend(children)
+        if deleted:
+            self.observe('db.delete.cascade', len(deleted))
+        return deleted
+
+    def _append_child(self, parent: Node, child: Node):
+        """Append child to parent and label it in ancestry index."""
+        parent.append_child(child)
+        if self.ancestry is not None:
+            with self._ancestry_lock:
+                self.ancestry.add(_db_id(child), _db_id(parent))
+        self.emit(ADDED, child)
+
+    def _rename(self, node: Node, value: str):
+        """Change node value."""
+        if node.value != value:
+            node.value = value
+            node.version += 1
+            self.emit(RENAMED, node)
+
+    def _stripe(self, db_id: int) -> threading.RLock:
+        """Get node lock."""
+        return self._stripes[db_id % LOCK_STRIPES]
+
+    def _stripes_of(self, db_ids: Iterable[int]) -> ExitStack:
+        """Hold locks of nodes.
+
+        Locks are taken in one order to avoid deadlocks.
+        """
+        stack = ExitStack()
+        for stripe in sorted({db_id % LOCK_STRIPES for db_id in db_ids}):
+            stack.enter_context(self._stripes[stripe])
+        return stack
+
+    def _nodes_items(self) -> List[Tuple[int, Node]]:
+        """Get copy of nodes by db_id, safe while nodes are added."""
+        with self._id_lock:
+            return list(self.nodes.items())
+
+    def _reserve_ids(self, count: int) -> int:
+        """Reserve `count` new db_ids, return the first one."""
+        with self._id_lock:
+            first_id = self._node_index
+            self._node_index += count
+        return first_id
+
+    def create_new_node(
+        self,
+        value: str,
+        is_deleted: bool,
+        db_id: Optional[int] = None,
+    ) -> Node:
+        """Create new node and add it to index.
+
+        New db_id is reserved if not given.
+        """
+        if db_id is None:
+            db_id = self._reserve_ids(1)
         new_node = self.node_cls(value, db_id, is_deleted)
-        self.nodes[db_id] = new_node
+        with self._id_lock:
+            self.nodes[db_id] = new_node
         return new_node
+
+
+def add_default_nodes(db):
+    """Fill empty db with default hierarchy.
+
+    See DB.default.
+    """
+    root = db.add_root('root')
+
+    node_1_1 = db.add_to_parent(root, 'node_1_1')
+    db.add_to_parent(root, 'node_1_2')
+
+    node_2_1 = db.add_to_parent(node_1_1, 'node_2_1')
+    db.add_to_parent(node_1_1, 'node_2_2')
+
+    node_3_1 = db.add_to_parent(node_2_1, 'node_3_1')
+    db.add_to_parent(node_2_1, 'node_3_2')
+
+    db.add_to_parent(node_3_1, 'node_4_1')
+    db.add_to_parent(node_3_1, 'node_4_2')
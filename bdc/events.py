@@ -0,0 +1,56 @@
+"""Node change events."""
+
+from dataclasses import dataclass
+from typing import (
+    Callable,
+    List,
+)
+
+from bdc.node import Node
+
+# New node is added to its parent or as root
+ADDED = 'added'
+# Node value is changed
+RENAMED = 'renamed'
+# Node and its subtree are deleted
+DELETED = 'deleted'
+# Root node is moved to its new loaded parent
+REPARENTED = 'reparented'
+# Leaf node is removed from cache by eviction policy
+EVICTED = 'evicted'
+
+
+@dataclass
+class NodeEvent:
+    """Node change event."""
+
+    kind: str
+    node: Node
+
+
+Listener = Callable[[NodeEvent], None]
+
+
+class EventEmitter:
+    """Mixin sending node change events to listeners.
+
+    Events are created only if there are listeners.
+    """
+
+    listeners: List[Listener]
+
+    def add_listener(self, listener: Listener):
+        """Add listener."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Listener):
+        """Remove listener."""
+        self.listeners.remove(listener)
+
+    def emit(self, kind: str, node: Node):
+        """Send event to listeners."""
+        if not self.listeners:
+            return
+        event = NodeEvent(kind=kind, node=node)
+        for listener in self.listeners:
+            listener(event)
@@ -0,0 +1,124 @@
+"""Cache eviction policies."""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Dict,
+    Iterator,
+)
+
+
+@dataclass
+class CacheStats:
+    """Cache counters."""
+
+    # Requested nodes already in cache
+    hits: int = 0
+    # Requested nodes loaded from db
+    misses: int = 0
+    # Nodes removed from cache by eviction policy
+    evictions: int = 0
+    # Not requested nodes loaded by prefetch
+    prefetched: int = 0
+
+
+class EvictionPolicy:
+    """Order of cache nodes eviction.
+
+    Policy tracks cache_ids of nodes cache may evict
+    and yields eviction candidates, first candidate is evicted first.
+    Nodes stop being tracked while they can't be evicted,
+    touching or removing not tracked node does nothing.
+    Policy is not changed while candidates are iterated.
+    """
+
+    def add(self, cache_id: int):
+        """Start tracking node, tracked node is kept as is."""
+        raise NotImplementedError
+
+    def touch(self, cache_id: int):
+        """Mark node as used."""
+        raise NotImplementedError
+
+    def remove(self, cache_id: int):
+        """Stop tracking node."""
+        raise NotImplementedError
+
+    def candidates(self) -> Iterator[int]:
+        """Iterate over cache_ids in eviction order."""
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    """Least recently used nodes are evicted first."""
+
+    def __init__(self):
+        """Initialization."""
+        # cache_ids from least to most recently used
+        self.order: 'OrderedDict[int, None]' = OrderedDict()
+
+    def add(self, cache_id: int):
+        """Start tracking node as most recently used."""
+        self.order.setdefault(cache_id, None)
+
+    def touch(self, cache_id: int):
+        """Move node to most recently used."""
+        if cache_id in self.order:
+            self.order.move_to_end(cache_id)
+
+    def remove(self, cache_id: int):
+        """Stop tracking node."""
+        self.order.pop(cache_id, None)
+
+    def candidates(self) -> Iterator[int]:
+        """Iterate from least recently used."""
+        return iter(self.order)
+
+
+class LFUPolicy(EvictionPolicy):
+    """Least frequently used nodes are evicted first.
+
+    Nodes with same use count are evicted in LRU order.
+    Nodes are kept in buckets by use count,
+    so add, touch and remove are O(1).
+    """
+
+    def __init__(self):
+        """Initialization."""
+        self.counts: Dict[int, int] = {}
+        # use count -> cache_ids from least to most recently used
+        self.buckets: Dict[int, 'OrderedDict[int, None]'] = {}
+
+    def add(self, cache_id: int):
+        """Start tracking node with one use."""
+        if cache_id in self.counts:
+            return
+        self.counts[cache_id] = 1
+        self.buckets.setdefault(1, OrderedDict())[cache_id] = None
+
+    def touch(self, cache_id: int):
+        """Move node to next use count bucket."""
+        count = self.counts.get(cache_id)
+        if count is None:
+            return
+        self._remove_from_bucket(cache_id, count)
+        self.counts[cache_id] = count + 1
+        self.buckets.setdefault(count + 1, OrderedDict())[cache_id] = None
+
+    def remove(self, cache_id: int):
+        """Stop tracking node."""
+        count = self.counts.pop(cache_id, None)
+        if count is not None:
+            self._remove_from_bucket(cache_id, count)
+
+    def candidates(self) -> Iterator[int]:
+        """Iterate from least frequently used."""
+        for count in sorted(self.buckets):
+            yield from self.buckets[count]
+
+    def _remove_from_bucket(self, cache_id: int, count: int):
+        """Remove node from bucket, drop empty bucket."""
+        bucket = self.buckets[count]
+        del bucket[cache_id]  # NOQA:WPS420
+        if not bucket:
+            del self.buckets[count]  # NOQA:WPS420
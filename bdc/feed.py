@@ -0,0 +1,179 @@
+"""Feed of db node changes by db_id."""
+
+import threading
+from collections import deque
+from itertools import islice
+from typing import (
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Set,
+)
+
+from bdc.changes import (
+    DELETE,
+    RENAME,
+    NodeChange,
+)
+from bdc.db import DB
+from bdc.events import (
+    DELETED,
+    RENAMED,
+    NodeEvent,
+)
+from bdc.node import Node
+
+
+class Subscription:
+    """Changes of watched nodes queued until drained.
+
+    Changes are queued by db writer threads and drained
+    by subscriber, so subscriber applies them in its own thread.
+    """
+
+    def __init__(self, feed: 'ChangeFeed'):
+        """Initialization."""
+        self.feed = feed
+        # Watched db_ids
+        self.db_ids: Set[int] = set()
+        self._pending: Deque[NodeChange] = deque()
+
+    def watch(self, db_ids: Iterable[int]):
+        """Receive changes of nodes."""
+        self.feed.watch(self, db_ids)
+
+    def unwatch(self, db_ids: Iterable[int]):
+        """Stop receiving changes of nodes."""
+        self.feed.unwatch(self, db_ids)
+
+    def drain(self) -> List[NodeChange]:
+        """Take queued changes in db order."""
+        changes = []
+        pending = self._pending
+        while pending:
+            changes.append(pending.popleft())
+        return changes
+
+    def close(self):
+        """Stop receiving changes."""
+        self.feed.unwatch(self, list(self.db_ids))
+        self._pending.clear()
+
+    def __len__(self) -> int:
+        """Count of queued changes."""
+        return len(self._pending)
+
+
+class ChangeFeed:
+    """Renames and deletes of db nodes sent to subscriptions by db_id.
+
+    Feed listens to db node events. Rename is sent to watchers
+    of renamed node, delete is sent to watchers of every node
+    of deleted subtree. Subtree is walked only while it is smaller than
+    watched set, otherwise watched nodes are checked by db ancestry.
+    Inserts are not sent, new nodes are read by load.
+
+    Example:
+        feed = ChangeFeed(db)
+        cache.follow(feed)
+        ...
+        cache.refresh()
+
+    """
+
+    def __init__(self, db: DB):
+        """Initialization."""
+        self.db = db
+        # db_id -> subscriptions watching it
+        self._watchers: Dict[int, List[Subscription]] = {}
+        self._lock = threading.Lock()
+        db.add_listener(self._on_event)
+
+    def subscribe(self, db_ids: Iterable[int] = ()) -> Subscription:
+        """Create subscription watching nodes."""
+        subscription = Subscription(self)
+        self.watch(subscription, db_ids)
+        return subscription
+
+    def watch(self, subscription: Subscription, db_ids: Iterable[int]):
+        """Send changes of nodes to subscription."""
+        with self._lock:
+            for db_id in db_ids:
+                if db_id in subscription.db_ids:
+                    continue
+                subscription.db_ids.add(db_id)
+                self._watchers.setdefault(db_id, []).append(subscription)
+
+    def unwatch(self, subscription: Subscription, db_ids: Iterable[int]):
+        """Stop sending changes of nodes to subscription."""
+        with self._lock:
+            for db_id in db_ids:
+                if db_id not in subscription.db_ids:
+                    continue
+                subscription.db_ids.discard(db_id)
+                watchers = self._watchers[db_id]
+                watchers.remove(subscription)
+                if not watchers:
+                    del self._watchers[db_id]  # NOQA:WPS420
+
+    def close(self):
+        """Stop listening to db."""
+        self.db.remove_listener(self._on_event)
+
+    def _on_event(self, event: NodeEvent):
+        """Send db node event to watchers."""
+        if not self._watchers:
+            return
+        node = event.node
+        with self._lock:
+            if event.kind == RENAMED:
+                self._publish(NodeChange(
+                    kind=RENAME,
+                    db_id=node.db_id,
+                    value=node.value,
+                    version=node.version,
+                ))
+            elif event.kind == DELETED:
+                self._publish(NodeChange(
+                    kind=DELETE,
+                    db_id=node.db_id,
+                    value=node.value,
+                    is_deleted=True,
+                    version=node.version,
+                ))
+                for child in self._deleted_watched(node):
+                    self._publish(NodeChange(
+                        kind=DELETE,
+                        db_id=child.db_id,
+                        value=child.value,
+                        is_deleted=True,
+                        deleted_by=node.db_id,
+                    ))
+
+    def _deleted_watched(self, node: Node) -> List[Node]:
+        """Get watched descendants of deleted node.
+
+        Subtree is walked up to watched count nodes, if it is bigger,
+        watched nodes are resolved by ancestry instead.
+        """
+        watchers = self._watchers
+        subtree = node.iter_preorder()
+        walked = list(islice(subtree, len(watchers)))
+        if next(subtree, None) is None:
+            return [child for child in walked if child.db_id in watchers]
+        nodes = self.db.nodes
+        # db nodes have db_id
+        root_id: int = node.db_id  # type: ignore
+        watched = [db_id for db_id in watchers if db_id in nodes]
+        return [
+            nodes[db_id]
+            for db_id in self.db.descendants_of(watched, [root_id])
+        ]
+
+    def _publish(self, change: NodeChange):
+        """Queue change to watchers of its node."""
+        # changes of db nodes have db_id
+        db_id: int = change.db_id  # type: ignore
+        for subscription in self._watchers.get(db_id, ()):
+            subscription._pending.append(change)  # NOQA:WPS437
@@ -0,0 +1,228 @@
+"""Opt-in operation metrics of cache and db."""
+
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+# Upper bounds of latency histogram buckets, seconds
+LATENCY_BUCKETS = (
+    0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5,
+)
+# Upper bounds of size histogram buckets, nodes
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+# Metrics with this suffix are latencies
+SECONDS = '.seconds'
+PROMETHEUS_PREFIX = 'bdc_'
+
+
+class Histogram:
+    """Counts of observed values by buckets."""
+
+    def __init__(self, buckets: Sequence[float]):
+        """Initialization."""
+        self.buckets = buckets
+        # Last count is for values over all bounds
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Count value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Sink:
+    """Receiver of every observation."""
+
+    def observe(self, name: str, value: float):
+        """Receive observed value."""
+        raise NotImplementedError
+
+
+class CallbackSink(Sink):
+    """Sink calling callback with name and value."""
+
+    def __init__(self, callback: Callable[[str, float], None]):
+        """Initialization."""
+        self.callback = callback
+
+    def observe(self, name: str, value: float):
+        """Call callback."""
+        self.callback(name, value)
+
+
+class LoggingSink(Sink):
+    """Sink writing observations to logger."""
+
+    def __init__(
+        self,
+        logger: Optional[logging.Logger] = None,
+        level: int = logging.DEBUG,
+    ):
+        """Initialization."""
+        self.logger = logger or logging.getLogger('bdc.metrics')
+        self.level = level
+
+    def observe(self, name: str, value: float):
+        """Log value."""
+        self.logger.log(self.level, '%s %s', name, value)
+
+
+class Instrumentation:
+    """Metrics registry.
+
+    Histograms are kept for latencies (names ending with `.seconds`)
+    and sizes, counters and gauges for other values.
+    Every histogram observation is sent to sinks.
+    Metrics are safe to record from many threads.
+
+    Example:
+        cache.instrumentation = Instrumentation([LoggingSink()])
+        db.instrumentation = cache.instrumentation
+        ...
+        print(cache.instrumentation.prometheus_text())
+
+    """
+
+    def __init__(self, sinks: Sequence[Sink] = ()):
+        """Initialization."""
+        self.sinks = list(sinks)
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float):
+        """Add value to histogram."""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                buckets = LATENCY_BUCKETS if name.endswith(SECONDS) else SIZE_BUCKETS
+                histogram = Histogram(buckets)
+                self.histograms[name] = histogram
+            histogram.observe(value)
+        for sink in self.sinks:
+            sink.observe(name, value)
+
+    def increment(self, name: str, count: int = 1):
+        """Increment counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def set_gauge(self, name: str, value: float):
+        """Set current value."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def prometheus_text(self) -> str:
+        """Dump metrics in Prometheus text format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, counter in sorted(self.counters.items()):
+                metric = _metric_name(name)
+                lines.append('# TYPE {0} counter'.format(metric))
+                lines.append('{0} {1}'.format(metric, counter))
+            for name, gauge in sorted(self.gauges.items()):  # NOQA:WPS440
+                metric = _metric_name(name)
+                lines.append('# TYPE {0} gauge'.format(metric))
+                lines.append('{0} {1}'.format(metric, gauge))
+            for name, histogram in sorted(self.histograms.items()):  # NOQA:WPS440
+                lines.extend(_histogram_lines(_metric_name(name), histogram))
+        return ''.join('{0}\n'.format(line) for line in lines)
+
+
+def _metric_name(name: str) -> str:
+    """Convert metric name to Prometheus name."""
+    return PROMETHEUS_PREFIX + name.replace('.', '_')
+
+
+def _histogram_lines(metric: str, histogram: Histogram) -> List[str]:
+    """Dump histogram with cumulative buckets."""
+    lines = ['# TYPE {0} histogram'.format(metric)]
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append('{0}_bucket{{le="{1}"}} {2}'.format(metric, bound, cumulative))
+    lines.append('{0}_bucket{{le="+Inf"}} {1}'.format(metric, histogram.count))
+    lines.append('{0}_sum {1}'.format(metric, histogram.sum))
+    lines.append('{0}_count {1}'.format(metric, histogram.count))
+    return lines
+
+
+class Instrumented:
+    """Mixin recording metrics to optional instrumentation.
+
+    Without instrumentation metrics are not recorded
+    and cost one attribute check.
+    """
+
+    instrumentation: Optional[Instrumentation] = None
+
+    def observe(self, name: str, value: float):
+        """Add value to histogram if instrumented."""
+        if self.instrumentation is not None:
+            self.instrumentation.observe(name, value)
+
+    def set_gauge(self, name: str, value: float):
+        """Set current value if instrumented."""
+        if self.instrumentation is not None:
+            self.instrumentation.set_gauge(name, value)
+
+
+Method = TypeVar('Method', bound=Callable)
+
+
+def timed(name: str) -> Callable[[Method], Method]:
+    """Observe method latency as `name.seconds` if instrumented.
+
+    Raised exceptions are counted as `name.errors`.
+    Coroutine methods are timed until they return.
+    """
+    metric = name + SECONDS
+
+    def decorator(method):  # NOQA:WPS430
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):  # NOQA:WPS430
+            instrumentation = self.instrumentation
+            if instrumentation is None:
+                return await method(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await method(self, *args, **kwargs)
+            except Exception:
+                instrumentation.increment(name + '.errors')
+                raise
+            finally:
+                instrumentation.observe(metric, time.perf_counter() - start)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):  # NOQA:WPS430
+            instrumentation = self.instrumentation
+            if instrumentation is None:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            except Exception:
+                instrumentation.increment(name + '.errors')
+                raise
+            finally:
+                instrumentation.observe(metric, time.perf_counter() - start)
+
+        if inspect.iscoroutinefunction(method):
+            return async_wrapper
+        return wrapper
+    return decorator
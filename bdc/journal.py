@@ -0,0 +1,393 @@
+"""Write-ahead journal of db changes."""
+
+import json
+import os
+import threading
+import zlib
+from typing import (
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from bdc.changes import (
+    DELETE,
+    INSERT,
+    RENAME,
+    Changeset,
+    ChangesResult,
+)
+from bdc.db import DB
+from bdc.node import Node
+
+JOURNAL_FILE = 'journal.log'
+# Journal records older than snapshot being written
+OLD_JOURNAL_FILE = 'journal.log.old'
+SNAPSHOT_FILE = 'snapshot.json'
+
+# db_id, parent_id, value, is_deleted, version
+NodeRecord = Tuple[int, Optional[int], str, bool, int]
+
+
+def _encode(record: dict) -> bytes:
+    """Encode record as line with checksum."""
+    payload = json.dumps(record, separators=(',', ':')).encode()
+    return b'%08x %s\n' % (zlib.crc32(payload), payload)
+
+
+def _decode(line: bytes) -> Optional[dict]:
+    """Decode line, None if line is torn or corrupted."""
+    if not line.endswith(b'\n') or len(line) < 10:
+        return None
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)  # type: ignore
+    except ValueError:
+        return None
+
+
+def _read_records(path: str) -> Tuple[List[dict], int]:
+    """Read valid records of journal file and their size in bytes."""
+    records: List[dict] = []
+    valid_size = 0
+    if not os.path.exists(path):
+        return records, valid_size
+    with open(path, 'rb') as journal_file:
+        for line in journal_file:
+            record = _decode(line)
+            if record is None:
+                break
+            records.append(record)
+            valid_size += len(line)
+    return records, valid_size
+
+
+def _fsync_dir(directory: str):
+    """Make renames in directory durable."""
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """Append-only journal file.
+
+    Every record is one line with crc32 of its payload.
+    Records are written at once and synced to disk
+    every `group_size` records (group commit) or `flush_interval`
+    seconds after first not synced record, whichever is first,
+    so on crash records of last `flush_interval` seconds
+    and at most `group_size - 1` records are lost.
+    Torn or corrupted tail is dropped on open.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        group_size: int = 64,
+        flush_interval: Optional[float] = 0.05,
+    ):
+        """Open journal, drop its broken tail."""
+        self.path = path
+        self.group_size = group_size
+        self.flush_interval = flush_interval
+        self.records, valid_size = _read_records(path)
+        self.file = open(path, 'ab')  # NOQA:WPS515
+        self.file.truncate(valid_size)
+        self._not_synced = 0
+        # Guards file, sync timer runs in its own thread
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def append(self, record: dict):
+        """Write record, sync if group is full or flush interval is over."""
+        with self._lock:
+            self.file.write(_encode(record))
+            self.file.flush()
+            self._not_synced += 1
+            if self._not_synced >= self.group_size:
+                self._sync()
+            elif self._timer is None and self.flush_interval is not None:
+                self._timer = threading.Timer(self.flush_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self):
+        """Sync written records to disk."""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """Sync and close file."""
+        with self._lock:
+            self._sync()
+            self.file.close()
+
+    def _sync(self):
+        """Sync written records, lock should be held."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._not_synced and not self.file.closed:
+            os.fsync(self.file.fileno())
+            self._not_synced = 0
+
+
+class JournaledDB(DB):
+    """DB recording every change in journal.
+
+    Changes are journaled as records of primitive changes
+    (insert with db_id, rename, delete of subtree roots),
+    one record per call, after they are applied.
+    On open db is restored from snapshot and journal records
+    newer than snapshot. Every `compact_after` records journal
+    is moved aside and snapshot of whole tree is written
+    in background, journal lock is held only to copy nodes.
+    Moved journal is removed when snapshot is written,
+    and is replayed on open if compaction has crashed.
+
+    Changes are applied and journaled one by one,
+    so journal order is db changes order.
+
+    Example:
+        db = JournaledDB('data')
+        root = db.add_root('root')
+        db.close()
+
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        group_size: int = 64,
+        compact_after: Optional[int] = 10000,
+        lazy_delete: bool = False,
+        flush_interval: Optional[float] = 0.05,
+    ):
+        """Restore db from directory."""
+        super().__init__(lazy_delete=lazy_delete)
+        self.directory = directory
+        self.group_size = group_size
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self.seq = 0
+        self._journal_lock = threading.Lock()
+        # Held while snapshot is written, possibly by background thread
+        self._compaction_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_snapshot()
+        old_path = os.path.join(directory, OLD_JOURNAL_FILE)
+        old_records, _valid_size = _read_records(old_path)
+        self.journal = self._open_journal()
+        self._since_snapshot = 0
+        for record in old_records + self.journal.records:
+            if record['seq'] > self.seq:
+                self._replay(record['changes'])
+                self.seq = record['seq']
+                self._since_snapshot += 1
+        if os.path.exists(old_path):
+            # Compaction has crashed, moved journal is still needed
+            self._write_snapshot(self._copy_state())
+
+    def add_root(self, value: str) -> Node:
+        """Add root."""
+        with self._journal_lock:
+            root = super().add_root(value)
+            self._log([[INSERT, root.db_id, None, value, root.is_deleted]])
+        return root
+
+    def add_to_parent(
+        self,
+        parent: Union[Node, int],
+        value: str,
+        is_deleted: bool = False,
+    ) -> Node:
+        """Add node to parent."""
+        with self._journal_lock:
+            new_node = super().add_to_parent(parent, value, is_deleted)
+            parent_id = new_node.parent.db_id  # type: ignore
+            self._log([[INSERT, new_node.db_id, parent_id, value, is_deleted]])
+        return new_node
+
+    def update_node(self, db_id: int, value: str, is_deleted: bool) -> Optional[List[Node]]:
+        """Update node."""
+        with self._journal_lock:
+            deleted = super().update_node(db_id, value, is_deleted)
+            changes: List[list] = [[RENAME, db_id, value]]
+            if is_deleted:
+                changes.append([DELETE, [db_id]])
+            self._log(changes)
+        return deleted
+
+    def apply_changes(self, changeset: Changeset) -> ChangesResult:
+        """Apply batch of changes as one journal record."""
+        with self._journal_lock:
+            changes_result = super().apply_changes(changeset)
+            changes: List[list] = [
+                [RENAME, db_id, value]
+                for db_id, value in changeset.renames.items()
+            ]
+            for insert in changeset.inserts:
+                if insert.parent_ref is None:
+                    parent_id = insert.parent_id
+                else:
+                    parent_id = changes_result.inserted[insert.parent_ref]
+                changes.append([
+                    INSERT,
+                    changes_result.inserted[insert.ref],
+                    parent_id,
+                    insert.value,
+                    insert.is_deleted,
+                ])
+            if changeset.deletes:
+                changes.append([DELETE, changeset.deletes])
+            self._log(changes)
+        return changes_result
+
+    def sync(self):
+        """Sync journal to disk."""
+        with self._journal_lock:
+            self.journal.sync()
+
+    def compact(self):
+        """Write snapshot and empty journal, wait until it is written."""
+        with self._compaction_lock:
+            with self._journal_lock:
+                state = self._start_compaction()
+            self._write_snapshot(state)
+
+    def close(self):
+        """Wait for compaction, sync and close journal."""
+        with self._compaction_lock:
+            with self._journal_lock:
+                self.journal.close()
+
+    def _open_journal(self) -> Journal:
+        """Open journal file of db."""
+        return Journal(
+            os.path.join(self.directory, JOURNAL_FILE),
+            self.group_size,
+            self.flush_interval,
+        )
+
+    def _log(self, changes: List[list]):
+        """Journal applied changes, compact if it is time."""
+        self.seq += 1
+        self.journal.append({'seq': self.seq, 'changes': changes})
+        self._since_snapshot += 1
+        if self.compact_after is None or self._since_snapshot < self.compact_after:
+            return
+        # Retried by next record while previous snapshot is written
+        if self._compaction_lock.acquire(blocking=False):
+            state = self._start_compaction()
+            threading.Thread(
+                target=self._compact_in_background,
+                args=(state,),
+                daemon=True,
+            ).start()
+
+    def _compact_in_background(self, state: Tuple[int, int, List[NodeRecord]]):
+        """Write snapshot, release compaction lock."""
+        try:
+            self._write_snapshot(state)
+        finally:
+            self._compaction_lock.release()
+
+    def _start_compaction(self) -> Tuple[int, int, List[NodeRecord]]:
+        """Move journal aside and copy db state.
+
+        Journal lock should be held, so state matches moved journal.
+        """
+        self.journal.close()
+        os.replace(
+            os.path.join(self.directory, JOURNAL_FILE),
+            os.path.join(self.directory, OLD_JOURNAL_FILE),
+        )
+        _fsync_dir(self.directory)
+        self.journal = self._open_journal()
+        self._since_snapshot = 0
+        return self._copy_state()
+
+    def _copy_state(self) -> Tuple[int, int, List[NodeRecord]]:
+        """Copy seq, next db_id and nodes, parents go before children."""
+        nodes: List[NodeRecord] = []
+        for db_id, node in self._nodes_items():
+            parent = node.parent
+            nodes.append((
+                db_id,
+                None if parent is None else parent.db_id,
+                node.value,
+                node.is_deleted,
+                node.version,
+            ))
+        return self.seq, self._node_index, nodes
+
+    def _write_snapshot(self, state: Tuple[int, int, List[NodeRecord]]):
+        """Write snapshot and remove moved journal.
+
+        Snapshot is written to temporary file and renamed,
+        journal records older than snapshot are skipped on open by seq.
+        """
+        seq, next_id, nodes = state
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp_path = '{path}.tmp'.format(path=path)
+        with open(tmp_path, 'wb') as snapshot_file:
+            snapshot_file.write(_encode({'seq': seq, 'next_id': next_id}))
+            for node_record in nodes:
+                snapshot_file.write(_encode({'node': list(node_record)}))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.directory)
+        old_path = os.path.join(self.directory, OLD_JOURNAL_FILE)
+        if os.path.exists(old_path):
+            os.remove(old_path)
+
+    def _load_snapshot(self):
+        """Restore nodes from snapshot file if it exists.
+
+        Children of deleted nodes are restored as deleted,
+        so tombstones are materialized.
+        """
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as snapshot_file:
+            records = [_decode(line) for line in snapshot_file]
+        if not records or None in records:
+            raise ValueError('Snapshot {path} is broken'.format(path=path))
+        header = records[0]
+        for record in records[1:]:
+            db_id, parent_id, value, is_deleted, version = record['node']
+            node = self.node_cls(value, db_id, is_deleted, version)
+            self.nodes[db_id] = node
+            if parent_id is not None:
+                self.nodes[parent_id].append_child(node)
+        self.seq = header['seq']
+        self._node_index = header['next_id']
+
+    def _replay(self, changes: List[list]):
+        """Apply journaled primitive changes."""
+        for change in changes:
+            kind = change[0]
+            if kind == INSERT:
+                _kind, db_id, parent_id, value, is_deleted = change
+                new_node = self.create_new_node(value, is_deleted, db_id=db_id)
+                self._node_index = max(self._node_index, db_id + 1)
+                if parent_id is not None:
+                    self._append_child(self.nodes[parent_id], new_node)
+            elif kind == RENAME:
+                self._rename(self.nodes[change[1]], change[2])
+            elif kind == DELETE:
+                self._count_deleted(change[1])
+                if self.lazy_delete:
+                    self._add_tombstones(change[1])
+                else:
+                    self._delete_subtrees(change[1])
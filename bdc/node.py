@@ -1,9 +1,18 @@
 """Node implementation."""
 
+import weakref
+from collections import deque
 from dataclasses import dataclass
 from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
     List,
     Optional,
+    Set,
+    TypeVar,
 )
 
 
@@ -14,52 +23,178 @@ class NodeParams:
     db_id: Optional[int]
     value: str
     is_deleted: bool
+    parent_id: Optional[int] = None
+    version: int = 0
+
+
+# Traversal predicate, true for nodes skipped with their subtrees
+Prune = Callable[['Node'], bool]
 
 
 class Node:
     """Node.
 
     Every node have parent except root node.
+    Parent is referenced weakly, so tree has no reference cycles
+    and is freed as soon as its nodes are not used.
+    Version is incremented by db on every rename and delete
+    of the node.
     """
 
+    __slots__ = (
+        'value',
+        'is_deleted',
+        'db_id',
+        'version',
+        'children',
+        '_parent',
+        '__weakref__',
+    )
+
     def __init__(
         self,
         value: str,
         db_id: Optional[int] = None,
         is_deleted: bool = False,
+        version: int = 0,
     ):
         """Init a new node."""
         self.value = value
         self.is_deleted = is_deleted
         self.db_id = db_id
+        self.version = version
         self.children: List['Node'] = []
-        self.parent: Optional['Node'] = None
+        self._parent: Optional['weakref.ReferenceType[Node]'] = None
+
+    @property
+    def parent(self) -> Optional['Node']:
+        """Get parent."""
+        if self._parent is None:
+            return None
+        return self._parent()
 
     def append_child(self, child: 'Node'):
         """Add node to child list."""
         child.set_parent(self)  # NOQA:WPS437
         self.children.append(child)
 
+    def remove_child(self, child: 'Node'):
+        """Remove node from child list."""
+        self.children.remove(child)
+        child._parent = None  # NOQA:WPS437
+
     @property
-    def all_children(self):
+    def all_children(self) -> Iterator['Node']:
         """Get all children recursively."""
-        children = [child for child in self.children]
-        while children:
-            child = children.pop()
-            children.extend(child.children)  # NOQA:WPS437
-            yield child
+        return self.iter_preorder()
+
+    def iter_preorder(
+        self,
+        max_depth: Optional[int] = None,
+        prune: Optional[Prune] = None,
+    ) -> Iterator['Node']:
+        """Iterate over descendants, parents before children.
+
+        Children are depth 1, descendants deeper than `max_depth`
+        are not visited. Nodes for which `prune` is true
+        are skipped with their subtrees.
+        One stack of not visited nodes is kept.
+        """
+        if max_depth is not None:
+            yield from self._iter_preorder_limited(max_depth, prune)
+            return
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if prune is not None and prune(node):
+                continue
+            yield node
+            stack.extend(reversed(node.children))
 
-    def delete(self) -> List['Node']:
+    def iter_postorder(
+        self,
+        max_depth: Optional[int] = None,
+        prune: Optional[Prune] = None,
+    ) -> Iterator['Node']:
+        """Iterate over descendants, children before parents.
+
+        `max_depth` and `prune` are the same as in iter_preorder.
+        """
+        if max_depth == 0:
+            return
+        # nodes on current path and iterators of their children
+        path: List['Node'] = [self]
+        stack = [iter(self.children)]
+        while stack:
+            for child in stack[-1]:
+                if prune is not None and prune(child):
+                    continue
+                if child.children and len(stack) != max_depth:
+                    path.append(child)
+                    stack.append(iter(child.children))
+                    break
+                yield child
+            else:
+                stack.pop()
+                node = path.pop()
+                if stack:
+                    yield node
+
+    def iter_breadth_first(
+        self,
+        max_depth: Optional[int] = None,
+        prune: Optional[Prune] = None,
+    ) -> Iterator['Node']:
+        """Iterate over descendants level by level.
+
+        `max_depth` and `prune` are the same as in iter_preorder.
+        Nodes of one level are kept.
+        """
+        parents = deque([self])
+        depth = 0
+        while parents and depth != max_depth:
+            depth += 1
+            for _ in range(len(parents)):
+                for child in parents.popleft().children:
+                    if prune is not None and prune(child):
+                        continue
+                    yield child
+                    parents.append(child)
+
+    def _iter_preorder_limited(
+        self,
+        max_depth: int,
+        prune: Optional[Prune],
+    ) -> Iterator['Node']:
+        """Iterate over descendants down to max_depth in pre-order.
+
+        Iterators of children lists on current path are kept.
+        """
+        if max_depth <= 0:
+            return
+        stack = [iter(self.children)]
+        while stack:
+            for child in stack[-1]:
+                if prune is not None and prune(child):
+                    continue
+                yield child
+                if child.children and len(stack) != max_depth:
+                    stack.append(iter(child.children))
+                    break
+            else:
+                stack.pop()
+
+    def delete(self) -> int:
         """Delete node.
 
-        Return deleted children
+        Return count of deleted children.
         """
-        deleted_nodes = []
         self.is_deleted = True
-        for child in self.all_children:
+        deleted = 0
+        for child in self.iter_preorder():
             child.is_deleted = True  # NOQA:WPS437
-            deleted_nodes.append(child)
-        return deleted_nodes
+            deleted += 1
+        return deleted
 
     def set_parent(self, parent: 'Node'):
         """Set parent.
@@ -68,27 +203,85 @@ class Node:
         """
         if self.parent is not None:
             raise ValueError('This node already have parent')
-        self.parent = parent
+        self._parent = weakref.ref(parent)
         # If parent already deleted child should be deleted too
-        if parent.is_deleted:
+        if parent.is_deleted and not self.is_deleted:
             self.is_deleted = True
 
 
+SlotValue = TypeVar('SlotValue')
+
+
+class _ReportedSlot(Generic[SlotValue]):
+    """Node slot of cached node reporting its changes.
+
+    Value is kept in Node slot, so cached node has no extra fields.
+    """
+
+    def __init__(self, name: str):
+        """Initialization."""
+        # slot member descriptor of Node
+        self._slot = vars(Node)[name]
+
+    def __get__(self, node: 'CNode', owner: type) -> SlotValue:
+        """Get slot value."""
+        slot_value: SlotValue = self._slot.__get__(node, owner)
+        return slot_value
+
+    def __set__(self, node: 'CNode', slot_value: SlotValue):
+        """Set slot value and report change."""
+        self._slot.__set__(node, slot_value)
+        if node.changes is not None:
+            node.changes.add(node.cache_id)
+
+
 class CNode(Node):
     """Cached node.
 
     Default node with cache_id.
+    Version is db node version the node was loaded
+    or last saved with.
+    Changes of value and is_deleted are reported
+    by adding cache_id to `changes` set.
     """
 
+    __slots__ = ('cache_id', 'changes')
+
     def __init__(
         self,
         cache_id: int,
         node_params: NodeParams,
+        changes: Optional[Set[int]] = None,
     ):
         """Init a new node."""
+        # Changes while initialization are not reported
+        self.changes: Optional[Set[int]] = None
         super().__init__(
             value=node_params.value,
             db_id=node_params.db_id,
             is_deleted=node_params.is_deleted,
+            version=node_params.version,
         )
         self.cache_id = cache_id
+        self.changes = changes
+
+    value = _ReportedSlot[str]('value')
+    is_deleted = _ReportedSlot[bool]('is_deleted')
+
+
+def group_by_parent(nodes: Iterable[Node]) -> Dict[Optional[Node], List[Node]]:
+    """Group nodes and their ancestors by parent in one pass.
+
+    Children keep input order, missing ancestors are added
+    when first seen. Roots are grouped under None.
+    """
+    children: Dict[Optional[Node], List[Node]] = {}
+    seen: Set[Node] = set()
+    for node in nodes:
+        current: Optional[Node] = node
+        while current is not None and current not in seen:
+            seen.add(current)
+            parent = current.parent
+            children.setdefault(parent, []).append(current)
+            current = parent
+    return children
@@ -0,0 +1,206 @@
+"""Binary tree snapshot and memory mapped db.
+
+Snapshot file layout, integers are native 8 byte:
+    header: magic, byte order mark, id space size, nodes count,
+        children count, string blob size
+    parents: parent db_id by db_id, NONE_ID for root,
+        MISSING_ID for db_ids without node
+    versions: version by db_id
+    deleted: bitmap by db_id, padded to 8 bytes
+    child offsets: children of db_id are child ids
+        from child_offsets[db_id] to child_offsets[db_id + 1]
+    child ids
+    value offsets: utf-8 value of db_id is blob bytes
+        from value_offsets[db_id] to value_offsets[db_id + 1]
+    string blob
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from typing import (
+    Dict,
+    Iterator,
+    List,
+)
+
+from bdc.columnar_db import (
+    MISSING_ID,
+    NONE_ID,
+    ColumnarDB,
+    ColumnsReader,
+    NodesView,
+)
+from bdc.node import NodeParams
+
+MAGIC = b'BDCSNAP1'
+# Read as other number on machine with other byte order
+BYTE_ORDER_MARK = 0x0102030405060708
+HEADER = struct.Struct('=8s5Q')
+WORD = 8
+
+
+def _padded(size: int) -> int:
+    """Round size up to whole words."""
+    return (size + WORD - 1) // WORD * WORD
+
+
+def dump(db, path: str):
+    """Write snapshot of db tree to file.
+
+    Any db is read with its public read methods, level by level
+    from roots. File is replaced atomically, so it is safe to dump
+    over snapshot mapped by MappedDB.
+    """
+    nodes_params: List[NodeParams] = []
+    children: Dict[int, List[int]] = {}
+    level = db.get_root_ids()
+    while level:
+        nodes_params.extend(db.get_nodes_params(level))
+        next_level = []
+        for db_id in level:
+            child_ids = db.get_children_ids(db_id)
+            children[db_id] = child_ids
+            next_level.extend(child_ids)
+        level = next_level
+
+    size = max(children, default=-1) + 1
+    parents = array('q', [MISSING_ID]) * size
+    versions = array('q', [0]) * size
+    deleted = bytearray(_padded((size + 7) // 8))
+    values: List[bytes] = [b''] * size
+    for node_params in nodes_params:
+        # read nodes have db_id
+        db_id: int = node_params.db_id  # type: ignore
+        parent_id = node_params.parent_id
+        parents[db_id] = NONE_ID if parent_id is None else parent_id
+        versions[db_id] = node_params.version
+        if node_params.is_deleted:
+            deleted[db_id >> 3] |= 1 << (db_id & 7)
+        values[db_id] = node_params.value.encode()
+
+    child_offsets = array('q', [0])
+    child_ids = array('q')
+    value_offsets = array('q', [0])
+    for db_id in range(size):
+        child_ids.extend(children.get(db_id, ()))
+        child_offsets.append(len(child_ids))
+        value_offsets.append(value_offsets[-1] + len(values[db_id]))
+    blob = b''.join(values)
+
+    tmp_path = '{path}.tmp'.format(path=path)
+    with open(tmp_path, 'wb') as snapshot_file:
+        snapshot_file.write(HEADER.pack(
+            MAGIC,
+            BYTE_ORDER_MARK,
+            size,
+            len(nodes_params),
+            len(child_ids),
+            len(blob),
+        ))
+        for section in (parents, versions, deleted, child_offsets, child_ids, value_offsets):
+            snapshot_file.write(section)
+        snapshot_file.write(blob)
+    os.replace(tmp_path, path)
+
+
+class MappedDB(ColumnsReader):
+    """Read only db of memory mapped snapshot.
+
+    File is mapped, not read, so db is opened in constant time
+    and pages are read by os when nodes are accessed.
+    Read methods and node views are shared with ColumnarDB,
+    `to_columnar` copies snapshot to writable db.
+
+    Example:
+        dump(DB.default(), 'tree.snapshot')
+        db = MappedDB('tree.snapshot')
+        cache = Cache()
+        cache.load(5, db)
+        writable_db = db.to_columnar()
+        db.close()
+
+    """
+
+    parents: memoryview
+    versions: memoryview
+
+    def __init__(self, path: str):
+        """Map snapshot file."""
+        with open(path, 'rb') as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: List[memoryview] = []
+        magic, mark, size, nodes_count, children_count, blob_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or mark != BYTE_ORDER_MARK:
+            self._map.close()
+            raise ValueError('{path} is not a snapshot of this platform'.format(path=path))
+        self.missing_count = size - nodes_count
+        self._offset = HEADER.size
+        self.parents = self._section(size * WORD, 'q')
+        self.versions = self._section(size * WORD, 'q')
+        self.deleted = self._section(_padded((size + 7) // 8), 'B')
+        self.child_offsets = self._section((size + 1) * WORD, 'q')
+        self.child_ids = self._section(children_count * WORD, 'q')
+        self.value_offsets = self._section((size + 1) * WORD, 'q')
+        self.blob = self._section(blob_size, 'B')
+        self.nodes = NodesView(self)
+
+    def close(self):
+        """Unmap file."""
+        for view in reversed(self._views):
+            view.release()
+        self._map.close()
+
+    def to_columnar(self) -> ColumnarDB:
+        """Copy snapshot to writable columnar db.
+
+        Parents and versions are copied as whole arrays,
+        children lists are linked from child ids.
+        """
+        db = ColumnarDB()
+        size = len(self.parents)
+        db.parents.frombytes(self.parents.tobytes())
+        db.versions.frombytes(self.versions.tobytes())
+        db.deleted = bytearray(self._deleted(db_id) for db_id in range(size))
+        db.first_children = array('q', [NONE_ID]) * size
+        db.last_children = array('q', [NONE_ID]) * size
+        db.next_siblings = array('q', [NONE_ID]) * size
+        for db_id in range(size):
+            start = self.child_offsets[db_id]
+            end = self.child_offsets[db_id + 1]
+            if start == end:
+                continue
+            db.first_children[db_id] = self.child_ids[start]
+            db.last_children[db_id] = self.child_ids[end - 1]
+            for index in range(start, end - 1):
+                db.next_siblings[self.child_ids[index]] = self.child_ids[index + 1]
+        db.value_ids.extend(db._intern(self._value(db_id)) for db_id in range(size))  # NOQA:WPS437
+        db.missing_count = self.missing_count
+        return db
+
+    def _section(self, size: int, fmt: str) -> memoryview:
+        """Map next file section as array of `fmt` items."""
+        view = memoryview(self._map)[self._offset:self._offset + size]
+        self._offset += size
+        self._views.append(view)
+        # fmt is struct item code, mypy checks literal codes only
+        typed_view: memoryview = view.cast(fmt)  # type: ignore
+        self._views.append(typed_view)
+        return typed_view
+
+    def _deleted(self, db_id: int) -> bool:
+        """Get deleted bit."""
+        return bool(self.deleted[db_id >> 3] & (1 << (db_id & 7)))
+
+    def _value(self, db_id: int) -> str:
+        """Decode node value."""
+        start = self.value_offsets[db_id]
+        end = self.value_offsets[db_id + 1]
+        return str(self.blob[start:end], 'utf-8')
+
+    def _iter_children(self, db_id: int) -> Iterator[int]:
+        """Iterate over child ids of node."""
+        start = self.child_offsets[db_id]
+        end = self.child_offsets[db_id + 1]
+        return iter(self.child_ids[start:end])
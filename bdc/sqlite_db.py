@@ -0,0 +1,468 @@
+"""DB of nodes stored in sqlite database."""
+
+import sqlite3
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+
+from bdc.changes import (
+    Changeset,
+    ChangesResult,
+    check_versions,
+    validate_changeset,
+)
+from bdc.db import add_default_nodes
+from bdc.instrumentation import (
+    Instrumented,
+    timed,
+)
+from bdc.node import (
+    Node,
+    NodeParams,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    db_id INTEGER PRIMARY KEY,
+    parent_id INTEGER REFERENCES nodes (db_id),
+    value TEXT NOT NULL,
+    is_deleted INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS nodes_parent_id ON nodes (parent_id);
+CREATE TEMP TABLE IF NOT EXISTS delete_roots (db_id INTEGER PRIMARY KEY);
+"""
+
+SELECT_SUBTREES = """
+WITH RECURSIVE subtree(db_id) AS (
+    SELECT db_id FROM delete_roots
+    UNION
+    SELECT nodes.db_id FROM nodes JOIN subtree ON nodes.parent_id = subtree.db_id
+)
+SELECT db_id FROM subtree
+"""
+
+# Ancestors from parent up, second parameter limits levels (-1 no limit)
+SELECT_ANCESTORS = """
+WITH RECURSIVE ancestors(db_id, level) AS (
+    SELECT parent_id, 1 FROM nodes WHERE db_id = ?
+    UNION ALL
+    SELECT nodes.parent_id, ancestors.level + 1
+    FROM nodes JOIN ancestors ON nodes.db_id = ancestors.db_id
+    WHERE ancestors.level != ?
+)
+SELECT db_id FROM ancestors WHERE db_id IS NOT NULL ORDER BY level
+"""
+
+# Ancestors of batch of nodes from parent up by node,
+# rows with NULL ancestor mark found nodes without ancestors
+SELECT_NODES_ANCESTORS = """
+WITH RECURSIVE ancestors(node_id, db_id, level) AS (
+    SELECT db_id, parent_id, 1 FROM nodes WHERE db_id IN ({marks})
+    UNION ALL
+    SELECT ancestors.node_id, nodes.parent_id, ancestors.level + 1
+    FROM nodes JOIN ancestors ON nodes.db_id = ancestors.db_id
+    WHERE ancestors.level != ?
+)
+SELECT node_id, db_id FROM ancestors ORDER BY node_id, level
+"""
+
+# First children of batch of nodes by node, second parameter limits
+# count per node (-1 no limit), rows with NULL child mark found leaves
+SELECT_NODES_CHILDREN = """
+SELECT parent.db_id, child.db_id FROM nodes AS parent
+LEFT JOIN (
+    SELECT parent_id, db_id, row_number() OVER (
+        PARTITION BY parent_id ORDER BY db_id
+    ) AS position
+    FROM nodes WHERE parent_id IN ({marks})
+) AS child ON child.parent_id = parent.db_id AND (? < 0 OR child.position <= ?)
+WHERE parent.db_id IN ({marks})
+ORDER BY parent.db_id, child.db_id
+"""
+
+# Databases created before node versions
+ADD_VERSION = 'ALTER TABLE nodes ADD COLUMN version INTEGER NOT NULL DEFAULT 0'
+
+# sqlite default limit of host parameters in one statement
+MAX_VARIABLES = 999
+
+
+def _by_db_id(db_ids: List[int], found: Dict[int, List[int]]) -> Dict[int, List[int]]:
+    """Get found db_ids lists in requested order, KeyError for missing node."""
+    by_db_id = {}
+    for db_id in db_ids:
+        found_ids = found.get(db_id)
+        if found_ids is None:
+            raise KeyError(db_id)
+        by_db_id[db_id] = found_ids
+    return by_db_id
+
+
+class SQLiteDB(Instrumented):
+    """DB of nodes stored in sqlite database.
+
+    Nodes are kept in adjacency table indexed on parent_id,
+    so opening db does not read the tree and
+    the tree does not have to fit in memory.
+    Every write runs in one sqlite transaction, so failed
+    apply_changes is rolled back by sqlite and committed changes
+    survive process crash. Deleted subtrees are found
+    with one recursive query, no node events are sent.
+    Returned nodes are detached copies without parent and children.
+
+    Example:
+        db = SQLiteDB('tree.sqlite')
+        root = db.add_root('root')
+        node1 = db.add_to_parent(root, 'node1')
+
+    """
+
+    node_cls = Node
+
+    def __init__(self, path: str = ':memory:'):
+        """DB initialization."""
+        # db may be called from executor threads, callers serialize
+        # calls, e.g. AsyncDB with offload holds its lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        columns = {
+            row[1]
+            for row in self.connection.execute('PRAGMA table_info(nodes)')
+        }
+        if 'version' not in columns:
+            with self.connection:
+                self.connection.execute(ADD_VERSION)
+
+    @classmethod
+    def default(cls, path: str = ':memory:'):
+        """Create default db with hierarchy = 4.
+
+        See DB.default.
+        """
+        db = cls(path)
+        add_default_nodes(db)
+        return db
+
+    def close(self):
+        """Close database connection."""
+        self.connection.close()
+
+    def add_root(self, value: str) -> Node:
+        """Add root."""
+        with self.connection:
+            row = self.connection.execute(
+                'SELECT 1 FROM nodes LIMIT 1',
+            ).fetchone()
+            if row is not None:
+                raise RuntimeError('DB already have root node')
+            return self._insert(None, value, is_deleted=False)
+
+    @timed('db.add_to_parent')
+    def add_to_parent(
+        self,
+        parent: Union[Node, int],
+        value: str,
+        is_deleted: bool = False,
+    ) -> Node:
+        """Add node to parent."""
+        if isinstance(parent, Node):
+            parent_index = parent.db_id
+        else:
+            parent_index = parent
+
+        with self.connection:
+            if parent_index is None or not self._exists(parent_index):
+                raise ValueError(
+                    '{parent_index} not found'.format(parent_index=parent_index),
+                )
+            return self._insert(parent_index, value, is_deleted)
+
+    def get(self, db_id: int) -> Optional[Node]:
+        """Get node copy by db_id."""
+        row = self.connection.execute(
+            'SELECT value, is_deleted FROM nodes WHERE db_id = ?',
+            (db_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return self.node_cls(row[0], db_id, bool(row[1]))
+
+    def get_node_params(self, db_id: int) -> NodeParams:
+        """Get node simple copy."""
+        return self.get_nodes_params([db_id])[0]
+
+    def get_nodes_params(self, db_ids: Iterable[int]) -> List[NodeParams]:
+        """Get simple copies of batch of nodes.
+
+        Nodes are read with one query per MAX_VARIABLES ids.
+        """
+        db_ids = list(db_ids)
+        rows = {}
+        for start in range(0, len(db_ids), MAX_VARIABLES):
+            chunk = db_ids[start:start + MAX_VARIABLES]
+            query = (
+                'SELECT db_id, value, is_deleted, parent_id, version '
+                'FROM nodes '
+                'WHERE db_id IN ({marks})'
+            ).format(marks=', '.join('?' * len(chunk)))
+            for row in self.connection.execute(query, chunk):
+                rows[row[0]] = row
+        return [
+            NodeParams(
+                db_id=db_id,
+                value=rows[db_id][1],
+                is_deleted=bool(rows[db_id][2]),
+                parent_id=rows[db_id][3],
+                version=rows[db_id][4],
+            )
+            for db_id in db_ids
+        ]
+
+    def get_parent_id(self, db_id: int) -> Optional[int]:
+        """Get node parent_id."""
+        row = self.connection.execute(
+            'SELECT parent_id FROM nodes WHERE db_id = ?',
+            (db_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(db_id)
+        parent_id: Optional[int] = row[0]
+        return parent_id  # NOQA: WPS331
+
+    def get_version(self, db_id: int) -> int:
+        """Get node version."""
+        row = self.connection.execute(
+            'SELECT version FROM nodes WHERE db_id = ?',
+            (db_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(db_id)
+        version: int = row[0]
+        return version  # NOQA: WPS331
+
+    def get_root_ids(self) -> List[int]:
+        """Get root db_ids."""
+        rows = self.connection.execute(
+            'SELECT db_id FROM nodes WHERE parent_id IS NULL ORDER BY db_id',
+        )
+        return [row[0] for row in rows]
+
+    def get_children_ids(self, db_id: int, limit: Optional[int] = None) -> List[int]:
+        """Get node children db_ids, first `limit` if set."""
+        rows = self.connection.execute(
+            'SELECT db_id FROM nodes WHERE parent_id = ? ORDER BY db_id LIMIT ?',
+            (db_id, -1 if limit is None else limit),
+        )
+        return [row[0] for row in rows]
+
+    def get_ancestor_ids(self, db_id: int, levels: Optional[int] = None) -> List[int]:
+        """Get ancestors db_ids from parent up, `levels` at most if set.
+
+        Ancestors are selected with one recursive query.
+        """
+        if levels == 0:
+            return []
+        rows = self.connection.execute(
+            SELECT_ANCESTORS,
+            (db_id, -1 if levels is None else levels),
+        )
+        ancestor_ids = [row[0] for row in rows]
+        if not ancestor_ids and not self._exists(db_id):
+            raise KeyError(db_id)
+        return ancestor_ids
+
+    def get_nodes_children_ids(
+        self,
+        db_ids: Iterable[int],
+        limit: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """Get children db_ids of batch of nodes by node db_id.
+
+        Children are read with one query per MAX_VARIABLES / 2 ids.
+        """
+        db_ids = list(db_ids)
+        limit = -1 if limit is None else limit
+        children: Dict[int, List[int]] = {}
+        chunk_size = MAX_VARIABLES // 2 - 1
+        for start in range(0, len(db_ids), chunk_size):
+            chunk = db_ids[start:start + chunk_size]
+            rows = self.connection.execute(
+                SELECT_NODES_CHILDREN.format(marks=', '.join('?' * len(chunk))),
+                (*chunk, limit, limit, *chunk),
+            )
+            for parent_id, child_id in rows:
+                child_ids = children.setdefault(parent_id, [])
+                if child_id is not None:
+                    child_ids.append(child_id)
+        return _by_db_id(db_ids, children)
+
+    def get_nodes_ancestor_ids(
+        self,
+        db_ids: Iterable[int],
+        levels: Optional[int] = None,
+    ) -> Dict[int, List[int]]:
+        """Get ancestors db_ids of batch of nodes by node db_id.
+
+        Ancestors are read with one recursive query per MAX_VARIABLES ids.
+        """
+        db_ids = list(db_ids)
+        ancestors: Dict[int, List[int]] = {}
+        for start in range(0, len(db_ids), MAX_VARIABLES - 1):
+            chunk = db_ids[start:start + MAX_VARIABLES - 1]
+            rows = self.connection.execute(
+                SELECT_NODES_ANCESTORS.format(marks=', '.join('?' * len(chunk))),
+                (*chunk, -1 if levels is None else max(levels, 1)),
+            )
+            for node_id, ancestor_id in rows:
+                ancestor_ids = ancestors.setdefault(node_id, [])
+                if ancestor_id is not None and levels != 0:
+                    ancestor_ids.append(ancestor_id)
+        return _by_db_id(db_ids, ancestors)
+
+    def is_deleted(self, db_id: int) -> bool:
+        """Check node deleted state."""
+        node = self.get(db_id)
+        if node is None:
+            raise KeyError(db_id)
+        return node.is_deleted
+
+    def is_child(self, child_id: int, parent_id: int) -> bool:
+        """Check connection between child and parent."""
+        return self.get_parent_id(child_id) == parent_id
+
+    @timed('db.update_node')
+    def update_node(self, db_id: int, value: str, is_deleted: bool) -> Optional[List[Node]]:
+        """Update node.
+
+        If node deleted, all children marked as deleted.
+        If deleting node func return deleted children.
+        """
+        changeset = Changeset(renames={db_id: value})
+        # Undeleted operation not exist
+        if is_deleted:
+            changeset.deletes.append(db_id)
+        deleted = self.apply_changes(changeset).deleted
+        if not is_deleted:
+            return None
+        return [
+            self.node_cls(node_params.value, node_params.db_id, is_deleted=True)
+            for node_params in self.get_nodes_params(deleted)
+            if node_params.db_id != db_id
+        ]
+
+    @timed('db.apply_changes')
+    def apply_changes(self, changeset: Changeset) -> ChangesResult:
+        """Apply batch of changes in one transaction.
+
+        Either all changes are applied or ValueError is raised
+        and transaction is rolled back.
+        ConflictError is raised if versioned nodes are changed.
+        Write lock is taken before versions are checked,
+        so other connections can not change checked nodes.
+        Deleted subtrees are selected with one recursive query.
+        """
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            validate_changeset(changeset, self._exists)
+            check_versions(changeset, self.get_version, self.is_deleted)
+
+            self.connection.executemany(
+                'UPDATE nodes SET value = ?, version = version + 1 '
+                'WHERE db_id = ? AND value != ?',
+                [
+                    (value, db_id, value)
+                    for db_id, value in changeset.renames.items()
+                ],
+            )
+
+            inserted: Dict[int, int] = {}
+            for insert in changeset.inserts:
+                if insert.parent_ref is None:
+                    parent_id = insert.parent_id
+                else:
+                    parent_id = inserted[insert.parent_ref]
+                new_node = self._insert(
+                    parent_id,
+                    insert.value,
+                    insert.is_deleted,
+                )
+                new_id: int = new_node.db_id  # type: ignore
+                inserted[insert.ref] = new_id
+
+            deleted = self._delete_subtrees(changeset.deletes)
+            versions = {
+                db_id: node_params.version
+                for db_id, node_params in zip(
+                    changeset.versions,
+                    self.get_nodes_params(changeset.versions),
+                )
+            }
+        return ChangesResult(
+            inserted=inserted,
+            deleted=deleted,
+            versions=versions,
+        )
+
+    def _exists(self, db_id: int) -> bool:
+        """Check that node exists."""
+        row = self.connection.execute(
+            'SELECT 1 FROM nodes WHERE db_id = ?',
+            (db_id,),
+        ).fetchone()
+        return row is not None
+
+    def _insert(
+        self,
+        parent_id: Optional[int],
+        value: str,
+        is_deleted: bool,
+    ) -> Node:
+        """Insert node row.
+
+        db_ids are given in insertion order from 0 like in DB.
+        """
+        if parent_id is not None and not is_deleted:
+            # If parent already deleted child should be deleted too
+            row = self.connection.execute(
+                'SELECT is_deleted FROM nodes WHERE db_id = ?',
+                (parent_id,),
+            ).fetchone()
+            is_deleted = bool(row[0])
+        row = self.connection.execute(
+            'SELECT COALESCE(MAX(db_id) + 1, 0) FROM nodes',
+        ).fetchone()
+        db_id: int = row[0]
+        self.connection.execute(
+            'INSERT INTO nodes (db_id, parent_id, value, is_deleted) '
+            'VALUES (?, ?, ?, ?)',
+            (db_id, parent_id, value, is_deleted),
+        )
+        return self.node_cls(value, db_id, is_deleted)
+
+    def _delete_subtrees(self, db_ids: Iterable[int]) -> List[int]:
+        """Mark subtrees as deleted.
+
+        Return db_ids of all deleted nodes.
+        """
+        self.connection.execute('DELETE FROM delete_roots')
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO delete_roots (db_id) VALUES (?)',
+            [(db_id,) for db_id in db_ids],
+        )
+        self.connection.execute(
+            'UPDATE nodes SET version = version + 1 '
+            'WHERE is_deleted = 0 AND db_id IN (SELECT db_id FROM delete_roots)',
+        )
+        deleted = [row[0] for row in self.connection.execute(SELECT_SUBTREES)]
+        self.connection.executemany(
+            'UPDATE nodes SET is_deleted = 1 WHERE db_id = ?',
+            [(db_id,) for db_id in deleted],
+        )
+        if deleted:
+            self.observe('db.delete.cascade', len(deleted))
+        return deleted
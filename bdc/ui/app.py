@@ -1,21 +1,34 @@
+import threading
 
 from PyQt5 import QtWidgets
+from PyQt5.QtCore import QThreadPool
 
+from bdc.db import DB
 from bdc.ui import design
 from bdc.ui.qcache import QCache
-from bdc.ui.qdb import QDB
+from bdc.ui.qlazydb import QLazyDB
+from bdc.ui.worker import Task
 
 
 class App(QtWidgets.QMainWindow, design.Ui_MainWindow):
-    """Main ui application."""
+    """Main ui application.
+
+    Cache load and apply run in thread pool, cache and db
+    are changed only while lock is held.
+    """
 
     def __init__(self):
         """Initialization."""
         super().__init__()
         self.setupUi(self)
 
+        self.lock = threading.RLock()
+        self.thread_pool = QThreadPool.globalInstance()
+        self.task = None
+
         self.setup_db_view()
         self.setup_cache_view()
+        self.setup_progress()
 
         self.load_to_cache_button.clicked.connect(self.load_to_cache)
         self.reset_cache_button.clicked.connect(self.reset)
@@ -25,11 +38,12 @@ class App(QtWidgets.QMainWindow, design.Ui_MainWindow):
         self.apply_cache_button.clicked.connect(self.apply_cache)
 
     def setup_db_view(self):
-        """Setuping db view."""
-        self.db_model = QDB()
-        self.db_model.update()
+        """Setuping db view.
+
+        Db model fetches children when branch is expanded.
+        """
+        self.db_model = QLazyDB(DB.default(), self.lock)
         self.db_view.setModel(self.db_model)
-        self.db_view.expandAll()
 
         # by default db is not editable
         self.db_view.setEditTriggers(
@@ -38,36 +52,125 @@ class App(QtWidgets.QMainWindow, design.Ui_MainWindow):
 
     def setup_cache_view(self):
         """Setuping cached view."""
-        self.cache_model = QCache()
+        self.cache_model = QCache(self.lock)
         self.cache_model.update()
         self.cache_view.setModel(self.cache_model)
 
+    def setup_progress(self):
+        """Setuping task progress bar and cancel button."""
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.cancel_button = QtWidgets.QPushButton('Cancel')
+        self.cancel_button.clicked.connect(self.cancel_task)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().addPermanentWidget(self.cancel_button)
+        self.set_busy(is_busy=False)
+
+    def set_busy(self, is_busy: bool):
+        """Lock editing while task is running."""
+        for widget in (
+            self.db_view,
+            self.cache_view,
+            self.load_to_cache_button,
+            self.reset_cache_button,
+            self.remove_node_button,
+            self.edit_node_button,
+            self.add_node_button,
+            self.apply_cache_button,
+        ):
+            widget.setEnabled(not is_busy)
+        self.progress_bar.setVisible(is_busy)
+        self.cancel_button.setVisible(is_busy)
+        self.cancel_button.setEnabled(is_busy)
+        if is_busy:
+            # busy indicator until first progress report
+            self.progress_bar.setRange(0, 0)
+
+    def run_task(self, operation, on_finished=None, commit=None):
+        """Run cache or db operation in thread pool.
+
+        Cancel is disabled while commit step runs.
+        """
+        task = Task(
+            operation,
+            self.lock,
+            [self.cache_model.listener, self.db_model.listener],
+            commit,
+        )
+        task.signals.progress.connect(self.show_progress)
+        task.signals.committing.connect(self.task_committing)
+        task.signals.finished.connect(self.task_done)
+        if on_finished is not None:
+            task.signals.finished.connect(on_finished)
+        task.signals.cancelled.connect(self.task_done)
+        task.signals.failed.connect(self.task_failed)
+        self.task = task
+        self.set_busy(is_busy=True)
+        self.thread_pool.start(task)
+
+    def show_progress(self, done: int, total: int):
+        """Show task progress."""
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def cancel_task(self):
+        """Cancel running task."""
+        if self.task is not None:
+            self.task.cancel()
+
+    def task_committing(self):
+        """Disable cancel of not cancellable step."""
+        self.cancel_button.setEnabled(False)
+        self.progress_bar.setRange(0, 0)
+
+    def task_done(self, *args):
+        """Unlock editing after task."""
+        self.task = None
+        self.set_busy(is_busy=False)
+
+    def task_failed(self, exc: Exception):
+        """Show task error."""
+        self.task_done()
+        QtWidgets.QMessageBox.critical(self, 'Error', str(exc))
+
     def reset(self):
         """Refresh cache and model views."""
         self.setup_cache_view()
         self.setup_db_view()
 
     def remove_node(self):
-        """Remove node."""
+        """Remove node.
+
+        Models are updated by cache node events.
+        """
         selected = self.cache_view.selectedIndexes()
         if not selected:
             return
         selected = selected[0]
         qnode = self.cache_model.itemFromIndex(selected)
-        self.cache_model.cache.delete(qnode.node.cache_id)
-        self.cache_model.refresh()
-        self.cache_view.expandAll()
+        with self.lock:
+            self.cache_model.cache.delete(qnode.node.cache_id)
 
     def load_to_cache(self):
-        """Load to cache."""
+        """Load to cache in thread pool."""
         selected = self.db_view.selectedIndexes()
         if not selected:
             return
         selected = selected[0]
-        qnode = self.db_model.itemFromIndex(selected)
-        self.cache_model.cache.load(qnode.node.db_id, self.db_model.db)
-        self.cache_model.refresh()
-        self.cache_view.expandAll()
+        db_id = self.db_model.db_id(selected)
+        cache = self.cache_model.cache
+        db = self.db_model.db
+
+        def expand_loaded(result):  # NOQA:WPS430
+            self.expand_node(
+                self.cache_view,
+                self.cache_model,
+                cache.db_nodes[db_id],
+            )
+
+        self.run_task(
+            lambda progress: cache.load(db_id, db, progress),
+            on_finished=expand_loaded,
+        )
 
     def edit_node(self):
         """Edit node."""
@@ -85,14 +188,27 @@ class App(QtWidgets.QMainWindow, design.Ui_MainWindow):
             return
         selected = selected[0]
         qnode = self.cache_model.itemFromIndex(selected)
-        self.cache_model.cache.add_node(qnode.node.cache_id)
-        self.cache_model.refresh()
-        self.cache_view.expandAll()
+        with self.lock:
+            new_node = self.cache_model.cache.add_node(qnode.node.cache_id)
+        self.expand_node(self.cache_view, self.cache_model, new_node)
 
     def apply_cache(self):
-        """Apply cache to db."""
-        self.cache_model.cache.save(self.db_model.db)
-        self.db_model.refresh()
-        self.db_view.expandAll()
-        self.cache_model.refresh()
-        self.cache_view.expandAll()
+        """Apply cache to db in thread pool.
+
+        Changeset is built in cancellable step,
+        it is applied to db in commit step.
+        Models are updated by cache and db node events.
+        """
+        cache = self.cache_model.cache
+        db = self.db_model.db
+        self.run_task(
+            cache.changeset,
+            commit=lambda changeset: cache.save_changeset(db, changeset),
+        )
+
+    def expand_node(self, view, model, node):
+        """Expand node and its ancestors in view."""
+        while node is not None:
+            qnode = model.qnodes[model.node_key(node)]
+            view.expand(qnode.index())
+            node = node.parent
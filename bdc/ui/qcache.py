@@ -1,19 +1,39 @@
 
+import threading
+
 from PyQt5.QtCore import QModelIndex
 from PyQt5.QtGui import QStandardItemModel
 
 from bdc.cache import Cache
-from bdc.ui.qnode import NodeToQNodeMixin
+from bdc.node import Node
+from bdc.ui.qnode import (
+    NodeToQNodeMixin,
+    QNode,
+)
+from bdc.ui.worker import QueuedListener
 
 
 class QCache(QStandardItemModel, NodeToQNodeMixin):
-    """QT Cache model view."""
+    """QT Cache model view.
+
+    Cache is changed by tasks in other threads,
+    so edits are written while lock is held.
+    """
 
-    def __init__(self):
+    def __init__(self, lock: threading.RLock):
         """Initialization."""
         self.cache = Cache()
+        self.lock = lock
+        self.qnodes = {}
         super().__init__()
         self.dataChanged.connect(self.data_changed)
+        self.listener = QueuedListener(self.apply_event)
+        self.cache.add_listener(self.listener)
+
+    def node_key(self, node: Node) -> int:
+        """Get qnode index key of node."""
+        cache_id: int = node.cache_id  # type: ignore
+        return cache_id  # NOQA: WPS331
 
     def data_changed(
         self,
@@ -22,8 +42,12 @@ class QCache(QStandardItemModel, NodeToQNodeMixin):
         roles,
     ):
         """Change node data after editing."""
-        qnode = self.itemFromIndex(top_left)
-        qnode.node.value = qnode.text()
+        # model items are QNodes made by node_to_qnode
+        qnode: QNode = self.itemFromIndex(top_left)  # type: ignore
+        with self.lock:
+            # model updates from node events change nothing
+            if qnode.node.value != qnode.text():
+                qnode.node.value = qnode.text()
 
     def update(self):
         """Update qt items from items."""
@@ -32,4 +56,5 @@ class QCache(QStandardItemModel, NodeToQNodeMixin):
     def refresh(self):
         """Refresh model."""
         self.clear()
+        self.qnodes.clear()
         self.update()
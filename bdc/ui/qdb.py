@@ -1,7 +1,9 @@
 from PyQt5.QtGui import QStandardItemModel
 
 from bdc.db import DB
+from bdc.node import Node
 from bdc.ui.qnode import NodeToQNodeMixin
+from bdc.ui.worker import QueuedListener
 
 
 class QDB(QStandardItemModel, NodeToQNodeMixin):
@@ -11,6 +13,14 @@ class QDB(QStandardItemModel, NodeToQNodeMixin):
         """Initialization."""
         super().__init__()
         self.db = DB.default()
+        self.qnodes = {}
+        self.listener = QueuedListener(self.apply_event)
+        self.db.add_listener(self.listener)
+
+    def node_key(self, node: Node) -> int:
+        """Get qnode index key of node."""
+        db_id: int = node.db_id  # type: ignore
+        return db_id  # NOQA: WPS331
 
     def update(self):
         """Update qt items from items."""
@@ -19,4 +29,5 @@ class QDB(QStandardItemModel, NodeToQNodeMixin):
     def refresh(self):
         """Refresh model."""
         self.clear()
+        self.qnodes.clear()
         self.update()
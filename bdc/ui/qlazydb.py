@@ -0,0 +1,206 @@
+import threading
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+from PyQt5.QtCore import (
+    QAbstractItemModel,
+    QModelIndex,
+    Qt,
+)
+
+from bdc.db import DB
+from bdc.events import (
+    ADDED,
+    DELETED,
+    RENAMED,
+    NodeEvent,
+)
+from bdc.node import NodeParams
+from bdc.ui.worker import QueuedListener
+
+
+class QLazyDB(QAbstractItemModel):
+    """QT DB model reading db directly.
+
+    Children of a branch are listed when the view asks about it
+    and fetched by FETCH_BATCH rows when the branch is expanded,
+    so no item tree is created and cost depends on visible rows.
+    Model index internal id is node db_id.
+    Db is changed by tasks in other threads, so it is read
+    only while lock is free, last read params are shown otherwise.
+    """
+
+    FETCH_BATCH = 256
+
+    def __init__(self, db: DB, lock: threading.RLock):
+        """Initialization."""
+        super().__init__()
+        self.db = db
+        self.lock = lock
+        # Fetched children db_ids by parent db_id, None for top level
+        self._children: Dict[Optional[int], List[int]] = {}
+        # Not fetched yet children db_ids by parent db_id
+        self._pending: Dict[Optional[int], List[int]] = {}
+        # Row of fetched node in its parent
+        self._rows: Dict[int, int] = {}
+        # Last read params of shown nodes
+        self._params: Dict[int, NodeParams] = {}
+        self.listener = QueuedListener(self.apply_event)
+        self.db.add_listener(self.listener)
+
+    def db_id(self, index: QModelIndex) -> Optional[int]:
+        """Get db_id of index node."""
+        if not index.isValid():
+            return None
+        db_id: int = index.internalId()
+        return db_id  # NOQA: WPS331
+
+    def index(  # NOQA:WPS110
+        self,
+        row: int,
+        column: int,
+        parent: QModelIndex = QModelIndex(),  # NOQA:B008
+    ) -> QModelIndex:
+        """Create index of parent child."""
+        children = self._list_children(self.db_id(parent))
+        if column != 0 or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    # model parent(index) overloads parent() of QObject
+    def parent(self, index: QModelIndex) -> QModelIndex:  # type: ignore  # NOQA:WPS110
+        """Create index of node parent."""
+        db_id = self.db_id(index)
+        if db_id is None:
+            return QModelIndex()
+        parent_id = self.db.get_parent_id(db_id)
+        if parent_id is None:
+            return QModelIndex()
+        return self.createIndex(self._rows[parent_id], 0, parent_id)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # NOQA:N802,B008
+        """Get count of fetched children."""
+        return len(self._list_children(self.db_id(parent)))
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:  # NOQA:N802,B008
+        """Get count of columns."""
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:  # NOQA:N802,B008
+        """Check that node has fetched or not fetched children."""
+        db_id = self.db_id(parent)
+        return bool(self._list_children(db_id) or self._pending[db_id])
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:  # NOQA:N802
+        """Check that node has not fetched children."""
+        db_id = self.db_id(parent)
+        self._list_children(db_id)
+        return bool(self._pending[db_id])
+
+    def fetchMore(self, parent: QModelIndex):  # NOQA:N802
+        """Fetch next batch of children."""
+        db_id = self.db_id(parent)
+        children = self._list_children(db_id)
+        pending = self._pending[db_id]
+        batch = pending[:self.FETCH_BATCH]
+        if not batch:
+            return
+        del pending[:self.FETCH_BATCH]  # NOQA:WPS420
+        first = len(children)
+        self.beginInsertRows(parent, first, first + len(batch) - 1)
+        for row, child_id in enumerate(batch, first):
+            self._rows[child_id] = row
+        children.extend(batch)
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):  # NOQA:WPS110
+        """Get node value."""
+        db_id = self.db_id(index)
+        if db_id is None or role not in {Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole}:
+            return None
+        node_params = self._node_params(db_id)
+        return None if node_params is None else node_params.value
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        """Deleted nodes are disabled, db is not editable."""
+        db_id = self.db_id(index)
+        if db_id is None:
+            return Qt.ItemFlags(Qt.ItemFlag.NoItemFlags)
+        node_params = self._node_params(db_id)
+        if node_params is None or node_params.is_deleted:
+            return Qt.ItemFlags(Qt.ItemFlag.NoItemFlags)
+        return Qt.ItemFlags(Qt.ItemFlag.ItemIsEnabled) | Qt.ItemFlag.ItemIsSelectable
+
+    def apply_event(self, event: NodeEvent):
+        """Update fetched rows of changed node."""
+        # db events are sent for saved nodes only
+        db_id: int = event.node.db_id  # type: ignore
+        if event.kind == ADDED:
+            self._add_row(db_id)
+        elif event.kind == RENAMED and db_id in self._rows:
+            index = self.createIndex(self._rows[db_id], 0, db_id)
+            self.dataChanged.emit(index, index)
+        elif event.kind == DELETED and db_id in self._rows:
+            self._deleted_rows_changed(db_id)
+
+    def _list_children(self, db_id: Optional[int]) -> List[int]:
+        """Get fetched children, list children db_ids on first call."""
+        children = self._children.get(db_id)
+        if children is None:
+            if db_id is None:
+                self._pending[db_id] = self.db.get_root_ids()
+            else:
+                self._pending[db_id] = self.db.get_children_ids(db_id)
+            children = []
+            self._children[db_id] = children
+        return children
+
+    def _node_params(self, db_id: int) -> Optional[NodeParams]:
+        """Read node params, get last read ones while lock is held."""
+        if self.lock.acquire(blocking=False):
+            try:
+                self._params[db_id] = self.db.get_node_params(db_id)
+            finally:
+                self.lock.release()
+        return self._params.get(db_id)
+
+    def _add_row(self, db_id: int):
+        """Show new node if its parent is listed.
+
+        Queued event may come after children are listed
+        with new node, then it is shown already.
+        """
+        if db_id in self._rows:
+            return
+        with self.lock:
+            parent_id = self.db.get_parent_id(db_id)
+        children = self._children.get(parent_id)
+        if children is None:
+            return
+        pending = self._pending[parent_id]
+        if db_id in pending:
+            return
+        if pending:
+            pending.append(db_id)
+            return
+        if parent_id is None:
+            parent = QModelIndex()
+        else:
+            parent = self.createIndex(self._rows[parent_id], 0, parent_id)
+        row = len(children)
+        self.beginInsertRows(parent, row, row)
+        self._rows[db_id] = row
+        children.append(db_id)
+        self.endInsertRows()
+
+    def _deleted_rows_changed(self, db_id: int):
+        """Repaint fetched rows of deleted subtree."""
+        to_update = [db_id]
+        while to_update:
+            node_id = to_update.pop()
+            index = self.createIndex(self._rows[node_id], 0, node_id)
+            self.dataChanged.emit(index, index)
+            to_update.extend(self._children.get(node_id, ()))
@@ -1,11 +1,25 @@
 from typing import (
     Dict,
     Iterable,
+    List,
+    Optional,
+    Tuple,
 )
 
 from PyQt5.QtGui import QStandardItem
 
-from bdc.node import Node
+from bdc.events import (
+    ADDED,
+    DELETED,
+    EVICTED,
+    RENAMED,
+    REPARENTED,
+    NodeEvent,
+)
+from bdc.node import (
+    Node,
+    group_by_parent,
+)
 
 
 class QNode(QStandardItem):
@@ -19,36 +33,114 @@ class QNode(QStandardItem):
         super().__init__(node.value)
         self.node = node
         if node.is_deleted:
-            self.setEditable(False)  # NOQA:WPS425
-            self.setEnabled(False)  # NOQA:WPS425
+            self.set_deleted()
+
+    def set_deleted(self):
+        """Show node as deleted."""
+        self.setEditable(False)  # NOQA:WPS425
+        self.setEnabled(False)  # NOQA:WPS425
 
 
 class NodeToQNodeMixin:
-    """Mixin for creating QNodes from node list."""
+    """Mixin for creating QNodes from node list.
+
+    Created qnodes are indexed by node_key,
+    so node events update only changed rows.
+    """
+
+    qnodes: Dict[int, QNode]
+
+    def node_key(self, node: Node) -> int:
+        """Get qnode index key of node."""
+        raise NotImplementedError
 
     def node_to_qnode(self, node_list: Iterable[Node]):
-        """Create qnodes from node list."""
-        loaded_nodes: Dict[Node, QNode] = {}
-        to_load = list(node_list)
-        while to_load:
-            node = to_load.pop()
-            if node in loaded_nodes:
-                continue
-            parent = node.parent
-            if parent is not None and parent not in loaded_nodes:
-                to_load.append(node)
-                to_load.append(parent)
+        """Create qnodes from node list.
+
+        Nodes are grouped by parent once, then qnodes are built
+        from roots down with one appendRows call per parent.
+        """
+        children = group_by_parent(node_list)
+        to_build: List[Tuple[Optional[Node], QStandardItem]] = [
+            (None, self.invisibleRootItem()),
+        ]
+        while to_build:
+            parent, qparent = to_build.pop()
+            nodes = children.get(parent)
+            if not nodes:
                 continue
+            qnodes = [QNode(node) for node in nodes]
+            qparent.appendRows(qnodes)
+            for node, qnode in zip(nodes, qnodes):
+                self.qnodes[self.node_key(node)] = qnode
+                to_build.append((node, qnode))
 
-            if parent is None:
-                qnode = QNode(node)
-                self.appendRow(qnode)
-            else:
-                qparent = loaded_nodes[parent]
-                qnode = QNode(node)
-                qparent.appendRow(qnode)
-            loaded_nodes[node] = qnode
+    def apply_event(self, event: NodeEvent):
+        """Update qnodes of changed node."""
+        node = event.node
+        if event.kind == ADDED:
+            self._add_qnode(node)
+        elif event.kind == RENAMED:
+            self.qnodes[self.node_key(node)].setText(node.value)
+        elif event.kind == DELETED:
+            self._delete_qnodes(node)
+        elif event.kind == REPARENTED:
+            self._reparent_qnode(node)
+        elif event.kind == EVICTED:
+            self._remove_qnode(node)
+
+    def _add_qnode(self, node: Node):
+        """Create qnode of new node."""
+        qnode = QNode(node)
+        parent = node.parent
+        if parent is None:
+            self.appendRow(qnode)
+        else:
+            self.qnodes[self.node_key(parent)].appendRow(qnode)
+        self.qnodes[self.node_key(node)] = qnode
+
+    def _delete_qnodes(self, node: Node):
+        """Show node subtree as deleted."""
+        self.qnodes[self.node_key(node)].set_deleted()
+        for child in node.iter_preorder():
+            qnode = self.qnodes.get(self.node_key(child))
+            if qnode is not None:
+                qnode.set_deleted()
+
+    def _remove_qnode(self, node: Node):
+        """Remove qnode of evicted leaf."""
+        qnode = self.qnodes.pop(self.node_key(node))
+        qparent = qnode.parent()
+        if qparent is None:
+            self.takeRow(qnode.row())
+        else:
+            qparent.takeRow(qnode.row())
+
+    def _reparent_qnode(self, node: Node):
+        """Move root qnode to its parent qnode.
+
+        Subtree adopted by deleted parent is shown as deleted.
+        """
+        # reparented node always has parent
+        parent: Node = node.parent  # type: ignore
+        qnode = self.qnodes[self.node_key(node)]
+        qparent = qnode.parent()
+        if qparent is None:
+            row = self.takeRow(qnode.row())
+        else:
+            row = qparent.takeRow(qnode.row())
+        self.qnodes[self.node_key(parent)].appendRow(row)
+        if parent.is_deleted:
+            self._delete_qnodes(node)
 
     def appendRow(self, *args, **kwargs):  # NOQA:N802
         """Append row to root."""
         raise NotImplementedError
+
+    def invisibleRootItem(self, *args, **kwargs):  # NOQA:N802
+        """Get root item."""
+        raise NotImplementedError
+
+    def takeRow(self, *args, **kwargs):  # NOQA:N802
+        """Take row from root."""
+        raise NotImplementedError
@@ -0,0 +1,124 @@
+import threading
+from typing import (
+    Callable,
+    List,
+    Optional,
+)
+
+from PyQt5.QtCore import (
+    QObject,
+    QRunnable,
+    QThread,
+    pyqtSignal,
+)
+
+from bdc.cache import OperationCancelled
+from bdc.events import (
+    Listener,
+    NodeEvent,
+)
+
+
+class QueuedListener(QObject):
+    """Node events listener calling model in GUI thread.
+
+    Events from GUI thread are passed at once, events from
+    other threads are buffered until flush and then
+    passed to GUI thread in one batch.
+    """
+
+    delivered = pyqtSignal(list)
+
+    def __init__(self, listener: Listener):
+        """Initialization."""
+        super().__init__()
+        self.listener = listener
+        self._buffer: List[NodeEvent] = []
+        self.delivered.connect(self._deliver)
+
+    def __call__(self, event: NodeEvent):
+        """Pass or buffer event."""
+        if QThread.currentThread() == self.thread():
+            self.listener(event)
+        else:
+            self._buffer.append(event)
+
+    def flush(self):
+        """Send buffered events to GUI thread."""
+        events, self._buffer = self._buffer, []
+        if events:
+            self.delivered.emit(events)
+
+    def _deliver(self, events: List[NodeEvent]):
+        """Pass batch of events to listener."""
+        for event in events:
+            self.listener(event)
+
+
+class TaskSignals(QObject):
+    """Task signals.
+
+    QRunnable is not QObject, so signals live here.
+    """
+
+    progress = pyqtSignal(int, int)
+    committing = pyqtSignal()
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(object)
+
+
+class Task(QRunnable):
+    """Cache or db operation running in thread pool.
+
+    Operation is called with progress callback while lock is held.
+    If commit is set, it is called with operation result
+    after committing signal and its result is task result,
+    commit can't be cancelled.
+    Buffered node events are flushed before finished signal.
+    """
+
+    def __init__(
+        self,
+        operation: Callable,
+        lock: threading.RLock,
+        listeners: List[QueuedListener],
+        commit: Optional[Callable] = None,
+    ):
+        """Initialization."""
+        super().__init__()
+        self.operation = operation
+        self.commit = commit
+        self.lock = lock
+        self.listeners = listeners
+        self.signals = TaskSignals()
+        self._is_cancelled = threading.Event()
+
+    def cancel(self):
+        """Ask operation to stop on next progress report."""
+        self._is_cancelled.set()
+
+    def progress(self, done: int, total: int):
+        """Report progress or stop cancelled operation."""
+        if self._is_cancelled.is_set():
+            raise OperationCancelled()
+        self.signals.progress.emit(done, total)
+
+    def run(self):
+        """Run operation."""
+        try:
+            with self.lock:
+                try:
+                    result = self.operation(self.progress)
+                    if self.commit is not None:
+                        self.signals.committing.emit()
+                        result = self.commit(result)
+                finally:
+                    for listener in self.listeners:
+                        listener.flush()
+        except OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as exc:  # NOQA:B902
+            self.signals.failed.emit(exc)
+        else:
+            self.signals.finished.emit(result)
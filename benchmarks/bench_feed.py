@@ -0,0 +1,58 @@
+"""Time of keeping cache working set fresh after db writes.
+
+Working set of cached nodes gets a batch of renames by other writer.
+Refresh from change feed is compared with reloading working set
+into new cache.
+
+Run with `python -m benchmarks.bench_feed`.
+"""
+
+import random
+import time
+
+from benchmarks.trees import (
+    build,
+    random_tree,
+)
+from bdc.cache import Cache
+from bdc.db import DB
+from bdc.feed import ChangeFeed
+
+NODES = 100000
+WORKING_SET = 10000
+UPDATES = (10, 100, 1000)
+
+
+def timed(func):
+    """Return func result and its time in ms."""
+    start = time.perf_counter()
+    func_result = func()
+    return func_result, (time.perf_counter() - start) * 1e3
+
+
+def main():
+    """Print refresh and reload times."""
+    rnd = random.Random(0)
+    db = build(DB, random_tree(NODES))
+    working_set = rnd.sample(range(NODES), WORKING_SET)
+    cache = Cache()
+    cache.load_many(working_set, db)
+    feed = ChangeFeed(db)
+    _, follow_time = timed(lambda: cache.follow(feed))
+    print('nodes: {0}, working set: {1}, follow: {2:.1f} ms'.format(
+        NODES,
+        WORKING_SET,
+        follow_time,
+    ))
+    print('{0:>8} {1:>12} {2:>12}'.format('updates', 'refresh ms', 'reload ms'))
+    for updates in UPDATES:
+        for db_id in rnd.sample(working_set, updates):
+            db.update_node(db_id, 'updated_{0}'.format(updates), is_deleted=False)
+        refreshed, refresh_time = timed(cache.refresh)
+        assert len(refreshed) == updates
+        _, reload_time = timed(lambda: Cache().load_many(working_set, db))
+        print('{0:>8} {1:>12.3f} {2:>12.3f}'.format(updates, refresh_time, reload_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Time of small Cache.save applies to journaled db.
+
+Every save renames one node and adds a child to it.
+Journal synced after every apply is compared with group commit
+and with writing whole tree snapshot after every apply.
+
+Run with `python -m benchmarks.bench_journal`.
+"""
+
+import random
+import tempfile
+import time
+
+from bdc.cache import Cache
+from bdc.journal import JournaledDB
+
+NODES = 20000
+SAVES = 200
+GROUP_SIZES = (1, 16, 256)
+
+
+def build_db(directory: str) -> JournaledDB:
+    """Create random tree with NODES nodes."""
+    rnd = random.Random(0)
+    db = JournaledDB(directory, group_size=NODES, compact_after=None)
+    db.add_root('root')
+    for db_id in range(1, NODES):
+        db.add_to_parent(rnd.randrange(db_id), 'val')
+    db.compact()
+    return db
+
+
+def saves(db: JournaledDB, snapshot: bool) -> float:
+    """Return time (ms) per save."""
+    rnd = random.Random(1)
+    start = time.perf_counter()
+    for save_index in range(SAVES):
+        cache = Cache()
+        cache.load(rnd.randrange(NODES), db)
+        cache.rename(0, 'val_{0}'.format(save_index))
+        cache.add_node(0)
+        cache.save(db)
+        if snapshot:
+            db.compact()
+    db.sync()
+    return (time.perf_counter() - start) / SAVES * 1e3
+
+
+def main():
+    """Print save time table."""
+    print('{0:>16} {1:>10}'.format('journal', 'save, ms'))
+    for group_size in GROUP_SIZES:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = build_db(tmp_dir)
+            db.journal.group_size = group_size
+            print('{0:>16} {1:>10.3f}'.format(
+                'group {0}'.format(group_size),
+                saves(db, snapshot=False),
+            ))
+            db.close()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = build_db(tmp_dir)
+        print('{0:>16} {1:>10.3f}'.format('snapshot', saves(db, snapshot=True)))
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
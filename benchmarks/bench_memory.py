@@ -0,0 +1,56 @@
+"""Memory used by DB and ColumnarDB trees.
+
+Run with `python -m benchmarks.bench_memory [nodes]`.
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from bdc.columnar_db import ColumnarDB
+from bdc.db import DB
+
+DEFAULT_NODES = 1000000
+
+
+def build(db_cls, nodes: int):
+    """Create random tree with `nodes` nodes."""
+    rnd = random.Random(0)
+    db = db_cls()
+    db.add_root('root')
+    for db_id in range(1, nodes):
+        db.add_to_parent(
+            rnd.randrange(db_id),
+            'node_{db_id}'.format(db_id=db_id),
+        )
+    return db
+
+
+def bench(db_cls, nodes: int):
+    """Return allocated bytes and build time of tree."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    db = build(db_cls, nodes)
+    elapsed = time.perf_counter() - start
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del db  # NOQA:WPS420
+    return size, elapsed
+
+
+def main():
+    """Print memory table."""
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NODES
+    print('{0:>12} {1:>12} {2:>12} {3:>10}'.format(
+        'db', 'MiB', 'bytes/node', 'build, s',
+    ))
+    for db_cls in (DB, ColumnarDB):
+        size, elapsed = bench(db_cls, nodes)
+        print('{0:>12} {1:>12.1f} {2:>12.1f} {3:>10.2f}'.format(
+            db_cls.__name__, size / 2 ** 20, size / nodes, elapsed,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Cache.load latency against the number of orphans in cache.
+
+Run with `python -m benchmarks.bench_orphans`.
+"""
+
+import time
+
+from bdc.cache import Cache
+from bdc.db import DB
+
+ORPHAN_COUNTS = (1000, 10000, 50000)
+MEASURED_LOADS = 1000
+
+
+def build_db(orphans: int) -> DB:
+    """Create db where every leaf has its own unloaded parent.
+
+    root
+      parent_0
+        leaf_0
+      parent_1
+        leaf_1
+      ...
+    """
+    db = DB()
+    root = db.add_root('root')
+    for index in range(orphans + MEASURED_LOADS):
+        parent = db.add_to_parent(root, 'parent_{index}'.format(index=index))
+        db.add_to_parent(parent, 'leaf_{index}'.format(index=index))
+    return db
+
+
+def bench(orphans: int) -> float:
+    """Return mean load time (us) with `orphans` orphans in cache."""
+    db = build_db(orphans)
+    cache = Cache()
+    # leaves have db_ids 2, 4, 6, ...
+    for index in range(orphans + MEASURED_LOADS):
+        cache.load(index * 2 + 2, db)
+
+    # measure loading of parents which adopt a leaf each
+    start = time.perf_counter()
+    for index in range(orphans, orphans + MEASURED_LOADS):
+        cache.load(index * 2 + 1, db)
+    elapsed = time.perf_counter() - start
+    return elapsed / MEASURED_LOADS * 1e6
+
+
+def main():
+    """Print load latency table."""
+    print('{0:>10} {1:>12}'.format('orphans', 'load, us'))
+    for orphans in ORPHAN_COUNTS:
+        print('{0:>10} {1:>12.2f}'.format(orphans, bench(orphans)))
+
+
+if __name__ == '__main__':
+    main()
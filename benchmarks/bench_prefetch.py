@@ -0,0 +1,121 @@
+"""Cache.load round trips with and without prefetch.
+
+Sqlite db is read with LATENCY added to every call, like a remote db.
+Every session loads a random node, then its parent chain
+and siblings one by one.
+
+Run with `python -m benchmarks.bench_prefetch`.
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from bdc.cache import (
+    Cache,
+    Prefetch,
+)
+from bdc.sqlite_db import SQLiteDB
+
+NODES = 20000
+SESSIONS = 100
+ANCESTORS = 3
+LATENCY = 0.0005
+PREFETCHES = (
+    None,
+    Prefetch(ancestors=ANCESTORS),
+    Prefetch(ancestors=ANCESTORS, children=8),
+)
+
+
+class RemoteDB(SQLiteDB):
+    """Sqlite db with latency of every read call."""
+
+    calls = 0
+
+    def get_nodes_params(self, db_ids):
+        """Read nodes after latency."""
+        self.wait()
+        return super().get_nodes_params(db_ids)
+
+    def get_nodes_children_ids(self, db_ids, limit=None):
+        """Read children after latency."""
+        self.wait()
+        return super().get_nodes_children_ids(db_ids, limit)
+
+    def get_nodes_ancestor_ids(self, db_ids, levels=None):
+        """Read ancestors after latency."""
+        self.wait()
+        return super().get_nodes_ancestor_ids(db_ids, levels)
+
+    def wait(self):
+        """Count call and sleep."""
+        self.calls += 1
+        time.sleep(LATENCY)
+
+
+def build_db(path: str):
+    """Create random tree with NODES nodes, about 8 children per node."""
+    rnd = random.Random(0)
+    db = SQLiteDB(path)
+    db.add_root('root')
+    with db.connection:
+        db.connection.executemany(
+            'INSERT INTO nodes (db_id, parent_id, value) VALUES (?, ?, ?)',
+            [
+                (db_id, rnd.randrange(max(0, db_id // 8 - 1), db_id // 8 + 1), 'val')
+                for db_id in range(1, NODES)
+            ],
+        )
+    db.close()
+
+
+def sessions(path: str):
+    """Get loaded db_ids of every session.
+
+    Session loads node, its parent chain and siblings.
+    """
+    db = SQLiteDB(path)
+    rnd = random.Random(1)
+    loads = []
+    for _ in range(SESSIONS):
+        db_id = rnd.randrange(1, NODES)
+        ancestor_ids = db.get_ancestor_ids(db_id, ANCESTORS)
+        sibling_ids = db.get_children_ids(ancestor_ids[0])
+        loads.append([db_id] + ancestor_ids + sibling_ids)
+    db.close()
+    return loads
+
+
+def bench(path: str, prefetch):
+    """Return db calls and time (ms) per session."""
+    db = RemoteDB(path)
+    loads = sessions(path)
+    start = time.perf_counter()
+    for db_ids in loads:
+        cache = Cache(prefetch=prefetch)
+        for db_id in db_ids:
+            cache.load(db_id, db)
+    elapsed = time.perf_counter() - start
+    db.close()
+    return db.calls / SESSIONS, elapsed / SESSIONS * 1e3
+
+
+def main():
+    """Print round trips table."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'tree.sqlite')
+        build_db(path)
+        print('{0:>28} {1:>8} {2:>12}'.format('prefetch', 'calls', 'session, ms'))
+        for prefetch in PREFETCHES:
+            calls, session_time = bench(path, prefetch)
+            print('{0:>28} {1:>8.1f} {2:>12.2f}'.format(
+                str(prefetch and (prefetch.ancestors, prefetch.children)),
+                calls,
+                session_time,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Qt item building time for different tree shapes.
+
+Run with `python -m benchmarks.bench_qnode`.
+Building QNodes needs PyQt5, without it only grouping is timed.
+"""
+
+import time
+
+from benchmarks.trees import (
+    build,
+    deep,
+    wide,
+)
+from bdc.db import DB
+from bdc.node import group_by_parent
+
+NODES = 100000
+
+
+def deep_chain() -> DB:
+    """Create db where every node is child of previous node."""
+    return build(DB, deep(NODES))
+
+
+def wide_fan() -> DB:
+    """Create db where every node is child of root."""
+    return build(DB, wide(NODES))
+
+
+SHAPES = (
+    ('deep chain', deep_chain, False),
+    ('deep chain reversed', deep_chain, True),
+    ('wide fan', wide_fan, False),
+    ('wide fan reversed', wide_fan, True),
+)
+
+
+def qnode_builder():
+    """Create QNode building model or None without PyQt5."""
+    try:
+        from bdc.ui.qdb import QDB  # NOQA:WPS433
+    except ImportError:
+        return None
+    return QDB()
+
+
+def main():
+    """Print timing table."""
+    model = qnode_builder()
+    print('{0:>20} {1:>12} {2:>12}'.format('shape', 'group, s', 'build, s'))
+    for name, build_db, is_reversed in SHAPES:
+        nodes = list(build_db().nodes.values())
+        if is_reversed:
+            nodes.reverse()
+
+        start = time.perf_counter()
+        group_by_parent(nodes)
+        group_time = time.perf_counter() - start
+
+        build_time = float('nan')
+        if model is not None:
+            model.clear()
+            model.qnodes.clear()
+            start = time.perf_counter()
+            model.node_to_qnode(nodes)
+            build_time = time.perf_counter() - start
+        print('{0:>20} {1:>12.3f} {2:>12.3f}'.format(
+            name, group_time, build_time,
+        ))
+
+
+if __name__ == '__main__':
+    main()
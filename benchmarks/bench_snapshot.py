@@ -0,0 +1,67 @@
+"""Open time of snapshot compared with building DB node by node.
+
+Run with `python -m benchmarks.bench_snapshot [nodes]`.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bdc.columnar_db import ColumnarDB
+from bdc.db import DB
+from bdc.snapshot import (
+    MappedDB,
+    dump,
+)
+
+DEFAULT_NODES = 1000000
+READS = 1000
+
+
+def build(db_cls, parents):
+    """Create tree from parent ids."""
+    db = db_cls()
+    db.add_root('root')
+    for db_id, parent_id in enumerate(parents, start=1):
+        db.add_to_parent(parent_id, 'node_{db_id}'.format(db_id=db_id))
+    return db
+
+
+def timed(func):
+    """Return func result and its time in ms."""
+    start = time.perf_counter()
+    func_result = func()
+    return func_result, (time.perf_counter() - start) * 1e3
+
+
+def main():
+    """Print open times."""
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NODES
+    rnd = random.Random(0)
+    parents = [rnd.randrange(db_id) for db_id in range(1, nodes)]
+    db_ids = [rnd.randrange(nodes) for _ in range(READS)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'tree.snapshot')
+        _db, build_time = timed(lambda: build(DB, parents))
+        columnar_db = build(ColumnarDB, parents)
+        _, dump_time = timed(lambda: dump(columnar_db, path))
+        mapped_db, open_time = timed(lambda: MappedDB(path))
+        _, read_time = timed(lambda: mapped_db.get_nodes_params(db_ids))
+        mapped_db.close()
+        print('nodes: {0}, snapshot: {1:.1f} MB'.format(
+            nodes,
+            os.path.getsize(path) / 2 ** 20,
+        ))
+    print('{0:>24} {1:>10.1f} ms'.format('DB build', build_time))
+    print('{0:>24} {1:>10.1f} ms'.format('dump', dump_time))
+    print('{0:>24} {1:>10.3f} ms'.format('MappedDB open', open_time))
+    print('{0:>24} {1:>10.3f} ms'.format(
+        '{0} random reads'.format(READS),
+        read_time,
+    ))
+
+
+if __name__ == '__main__':
+    main()
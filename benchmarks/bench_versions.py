@@ -0,0 +1,91 @@
+"""Save throughput and conflict rate of concurrent caches.
+
+Every writer thread loads a random subtree, renames some of
+its nodes and saves after THINK_TIME. Rejected saves are
+counted as conflicts.
+
+Run with `python -m benchmarks.bench_versions`.
+"""
+
+import random
+import threading
+import time
+
+from bdc.cache import Cache
+from bdc.changes import ConflictError
+from bdc.db import DB
+
+NODES = 10000
+SAVES_PER_WRITER = 200
+WRITER_COUNTS = (1, 4, 16)
+RENAMES_PER_SAVE = 5
+# Time between load and save, other writers save meanwhile
+THINK_TIME = 0.001
+
+
+def build_db() -> DB:
+    """Create random tree with NODES nodes."""
+    rnd = random.Random(0)
+    db = DB()
+    db.add_root('root')
+    for db_id in range(1, NODES):
+        db.add_to_parent(rnd.randrange(max(0, db_id - 100), db_id), 'val')
+    return db
+
+
+def writer(db: DB, seed: int, counts: dict, lock: threading.Lock):
+    """Load, rename and save SAVES_PER_WRITER times."""
+    rnd = random.Random(seed)
+    saved = 0
+    conflicts = 0
+    for _ in range(SAVES_PER_WRITER):
+        cache = Cache()
+        cache.load_subtree(rnd.randrange(NODES), db, depth=3)
+        nodes = list(cache.db_nodes.values())
+        for node in rnd.sample(nodes, min(RENAMES_PER_SAVE, len(nodes))):
+            node.value = 'val_{seed}'.format(seed=seed)
+        time.sleep(THINK_TIME)
+        try:
+            cache.save(db)
+        except ConflictError:
+            conflicts += 1
+        else:
+            saved += 1
+    with lock:
+        counts['saved'] += saved
+        counts['conflicts'] += conflicts
+
+
+def bench(writers: int):
+    """Return saves per second and conflict rate."""
+    db = build_db()
+    counts = {'saved': 0, 'conflicts': 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=writer, args=(db, seed, counts, lock))
+        for seed in range(writers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    total = counts['saved'] + counts['conflicts']
+    return total / elapsed, counts['conflicts'] / total
+
+
+def main():
+    """Print throughput and conflict rate table."""
+    print('{0:>8} {1:>12} {2:>10}'.format('writers', 'saves/s', 'conflicts'))
+    for writers in WRITER_COUNTS:
+        throughput, conflict_rate = bench(writers)
+        print('{0:>8} {1:>12.0f} {2:>9.2%}'.format(
+            writers,
+            throughput,
+            conflict_rate,
+        ))
+
+
+if __name__ == '__main__':
+    main()
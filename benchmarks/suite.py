@@ -0,0 +1,226 @@
+"""Benchmark suite of db and cache hot paths.
+
+Every case is timed on every tree shape and size,
+best of `--repeat` runs is recorded. Results are written as JSON
+and compared with baseline JSON of the same format, case is
+flagged as regression if it is `--threshold` slower than baseline.
+Missing baseline is recorded from this run with a warning.
+Cases changing db are set up on newly built db every run.
+
+Run with `python -m benchmarks.suite --output results.json`,
+compare with `--baseline baseline.json`.
+Building QNodes needs PyQt5, without it node_to_qnode is skipped.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+from functools import partial
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+from benchmarks.trees import (
+    SHAPES,
+    build,
+)
+from bdc.cache import Cache
+from bdc.db import DB
+from bdc.node import group_by_parent
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+# Nodes loaded and saved by cache cases
+SAMPLE = 1000
+REPEAT = 3
+THRESHOLD = 0.2
+
+Run = Callable[[], object]
+
+
+def cache_load(db: DB, sample: List[int]) -> Run:
+    """Load sample nodes one by one to new cache."""
+    cache = Cache()
+
+    def run():  # NOQA:WPS430
+        for db_id in sample:
+            cache.load(db_id, db)
+    return run
+
+
+def cache_save(db: DB, sample: List[int]) -> Run:
+    """Save renamed sample nodes with new child each."""
+    cache = Cache()
+    cache.load_many(sample, db)
+    for cache_id in list(cache.cache_nodes):
+        cache.rename(cache_id, 'renamed')
+        cache.add_node(cache_id)
+    return lambda: cache.save(db)
+
+
+def grouping(db: DB, sample: List[int]) -> Run:
+    """Group all nodes by parent."""
+    nodes = list(db.nodes.values())
+    return lambda: group_by_parent(nodes)
+
+
+def node_to_qnode(db: DB, sample: List[int]) -> Optional[Run]:
+    """Build qnodes of all nodes."""
+    try:
+        from bdc.ui.qdb import QDB  # NOQA:WPS433
+    except ImportError:
+        return None
+    model = QDB()
+    nodes = list(db.nodes.values())
+    return lambda: model.node_to_qnode(nodes)
+
+
+def node_delete(db: DB, sample: List[int]) -> Run:
+    """Delete root of not deleted tree."""
+    return db.nodes[0].delete
+
+
+CASES: Dict[str, Callable[[DB, List[int]], Optional[Run]]] = {
+    'cache.load': cache_load,
+    'cache.save': cache_save,
+    'group_by_parent': grouping,
+    'node_to_qnode': node_to_qnode,
+    'node.delete': node_delete,
+}
+# Cases changing db, other cases share db of tree
+MUTATING = frozenset(('cache.save', 'node.delete'))
+
+
+def with_new_db(case, tree, sample: List[int]) -> Optional[Run]:
+    """Set case up on newly built db of tree."""
+    return case(build(DB, tree), sample)
+
+
+def timed(setup: Callable[[], Optional[Run]], repeat: int) -> Optional[float]:
+    """Best time of run in seconds, None if case is skipped."""
+    best = None
+    for _ in range(repeat):
+        run = setup()
+        if run is None:
+            return None
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_suite(sizes, shapes, cases, repeat: int) -> Dict[str, float]:
+    """Time cases, key is `case/shape/size`."""
+    results = {}
+    for shape in shapes:
+        for size in sizes:
+            tree = SHAPES[shape](size)
+            db = build(DB, tree)
+            rnd = random.Random(size)
+            sample = [rnd.randrange(size) for _ in range(min(SAMPLE, size))]
+            for case in cases:
+                if case in MUTATING:
+                    setup = partial(with_new_db, CASES[case], tree, sample)
+                else:
+                    setup = partial(CASES[case], db, sample)
+                case_time = timed(setup, repeat)
+                key = '{case}/{shape}/{size}'.format(case=case, shape=shape, size=size)
+                if case_time is None:
+                    print('{0:<36} skipped'.format(key))
+                    continue
+                results[key] = case_time
+                print('{0:<36} {1:>12.3f} ms'.format(key, case_time * 1e3))
+            sys.stdout.flush()
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Print comparison with baseline, return regressed keys."""
+    regressions = []
+    print('{0:<36} {1:>12} {2:>12} {3:>8}'.format('case', 'ms', 'baseline', 'ratio'))
+    for key, case_time in results.items():
+        if key not in baseline:
+            continue
+        ratio = case_time / baseline[key]
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = 'REGRESSION'
+        print('{0:<36} {1:>12.3f} {2:>12.3f} {3:>8.2f} {4}'.format(
+            key,
+            case_time * 1e3,
+            baseline[key] * 1e3,
+            ratio,
+            flag,
+        ))
+    return regressions
+
+
+def parse_args(argv):
+    """Parse command line."""
+    parser = argparse.ArgumentParser(description='Time db and cache hot paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--shapes', nargs='+', choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--output', help='write results JSON')
+    parser.add_argument('--baseline', help='compare with results JSON')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def write_results(path: str, results: Dict[str, float], repeat: int):
+    """Write results JSON with run metadata."""
+    with open(path, 'w') as output_file:
+        json.dump(
+            {
+                'meta': {
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'repeat': repeat,
+                },
+                'results': results,
+            },
+            output_file,
+            indent=2,
+        )
+
+
+def main(argv=None) -> int:
+    """Run suite, return 1 if regression against baseline is found."""
+    args = parse_args(argv)
+    results = run_suite(args.sizes, args.shapes, args.cases, args.repeat)
+    if args.output:
+        write_results(args.output, results, args.repeat)
+    if not args.baseline:
+        return 0
+    if not os.path.exists(args.baseline):
+        print(
+            'Warning: no baseline {path}, recorded this run as baseline'.format(
+                path=args.baseline,
+            ),
+            file=sys.stderr,
+        )
+        write_results(args.baseline, results, args.repeat)
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    if compare(results, baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
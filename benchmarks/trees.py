@@ -0,0 +1,54 @@
+"""Synthetic tree generators for benchmarks.
+
+Tree is generated as parent ids of nodes 1..n-1, node 0 is root,
+parent id is always less than node id, so trees can be built
+in db_id order by any db.
+"""
+
+import random
+from typing import (
+    Callable,
+    Dict,
+    List,
+)
+
+# Children of every balanced tree node
+BRANCHING = 8
+
+
+def wide(nodes: int) -> List[int]:
+    """Every node is child of root."""
+    return [0] * (nodes - 1)
+
+
+def deep(nodes: int) -> List[int]:
+    """Every node is child of previous node."""
+    return list(range(nodes - 1))
+
+
+def balanced(nodes: int) -> List[int]:
+    """Complete tree with BRANCHING children per node."""
+    return [(db_id - 1) // BRANCHING for db_id in range(1, nodes)]
+
+
+def random_tree(nodes: int, seed: int = 0) -> List[int]:
+    """Parent of every node is random previous node."""
+    rnd = random.Random(seed)
+    return [rnd.randrange(db_id) for db_id in range(1, nodes)]
+
+
+SHAPES: Dict[str, Callable[[int], List[int]]] = {
+    'wide': wide,
+    'deep': deep,
+    'balanced': balanced,
+    'random': random_tree,
+}
+
+
+def build(db_cls, parents: List[int]):
+    """Create db of tree with given parent ids."""
+    db = db_cls()
+    db.add_root('root')
+    for db_id, parent_id in enumerate(parents, start=1):
+        db.add_to_parent(parent_id, 'node_{db_id}'.format(db_id=db_id))
+    return db
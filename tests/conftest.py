@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+# Qt models are tested without display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """Qt application of model and worker tests."""
+    from PyQt5.QtWidgets import QApplication  # NOQA:WPS433
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication([])
+    return app
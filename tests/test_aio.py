@@ -0,0 +1,214 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bdc.aio import (
+    AsyncCache,
+    AsyncDB,
+)
+from bdc.cache import (
+    Cache,
+    Prefetch,
+)
+from bdc.db import (
+    DB,
+    add_default_nodes,
+)
+from bdc.sqlite_db import SQLiteDB
+
+
+class SlowDB(DB):
+    """DB with awaitable reads counting running calls."""
+
+    def __init__(self):
+        """Initialization."""
+        super().__init__()
+        self.running = 0
+        self.max_running = 0
+        self.calls = []
+
+    async def get_nodes_params(self, db_ids):
+        """Get node params after other coroutines run."""
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.calls.append(list(db_ids))
+        await asyncio.sleep(0)
+        self.running -= 1
+        return super().get_nodes_params(db_ids)
+
+
+class TestAsyncDB:
+    """Async db testing."""
+
+    def test_get_node_params(self):
+        """Test get node params."""
+        db = AsyncDB(DB.default())
+        params = asyncio.run(db.get_node_params(5))
+        assert params.value == 'node_3_1'
+        assert params.parent_id == 3
+
+    def test_offload(self):
+        """Test calls run in executor."""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            db = AsyncDB(DB.default(), offload=True, executor=executor)
+            params = asyncio.run(db.get_nodes_params([5, 0]))
+        assert [node.db_id for node in params] == [5, 0]
+
+    def test_offload_sqlite(self, tmp_path):
+        """Test sqlite db is loaded and saved from executor threads."""
+        sqlite_db = SQLiteDB.default(str(tmp_path / 'tree.sqlite'))
+        cache = AsyncCache()
+
+        async def edit(db):  # NOQA:WPS430
+            await cache.load_many([3, 5], db)
+            cache.cache.rename(cache.cache.db_nodes[5].cache_id, 'renamed')
+            cache.cache.add_node(cache.cache.db_nodes[3].cache_id)
+            await cache.save(db)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            asyncio.run(edit(AsyncDB(sqlite_db, offload=True, executor=executor)))
+        assert sqlite_db.get(5).value == 'renamed'
+        assert sqlite_db.get_children_ids(3) == [5, 6, 9]
+        assert not cache.cache.dirty
+        sqlite_db.close()
+
+    def test_batches(self):
+        """Test big batch is split."""
+        slow_db = SlowDB.default()
+        db = AsyncDB(slow_db)
+        db.BATCH_SIZE = 4
+        params = asyncio.run(db.get_nodes_params(range(9)))
+        assert [node.db_id for node in params] == list(range(9))
+        assert [len(call) for call in slow_db.calls] == [4, 4, 1]
+
+    def test_bounded_concurrency(self):
+        """Test running calls are limited."""
+        slow_db = SlowDB.default()
+        db = AsyncDB(slow_db, max_concurrency=2)
+
+        async def load_all():  # NOQA:WPS430
+            await asyncio.gather(*(
+                db.get_nodes_params([db_id])
+                for db_id in range(9)
+            ))
+
+        asyncio.run(load_all())
+        assert slow_db.max_running == 2
+        assert len(slow_db.calls) == 9
+
+
+class TestAsyncCache:
+    """Async cache testing."""
+
+    @staticmethod
+    @pytest.fixture
+    def db():
+        """Async db fixture."""
+        return AsyncDB(SlowDB.default())
+
+    def test_load(self, db):
+        """Test load from db."""
+        cache = AsyncCache()
+
+        async def load():  # NOQA:WPS430
+            await cache.load(3, db)
+            return await cache.load_many([5, 3, 7], db)
+
+        new_nodes = asyncio.run(load())
+        assert [node.db_id for node in new_nodes] == [5, 7]
+        assert cache.cache.db_nodes[7].parent.db_id == 5
+        assert cache.cache.dirty == set()
+
+    def test_load_prefetch(self, db):
+        """Test load reads ancestors and children of cache prefetch."""
+        cache = AsyncCache(Cache(prefetch=Prefetch(ancestors=2, children=2)))
+        new_nodes = asyncio.run(cache.load_many([7], db))
+        assert [node.db_id for node in new_nodes] == [7, 5, 3, 8]
+        assert cache.cache.stats.prefetched == 3
+        assert db.db.calls == [[7], [5, 3, 8]]
+
+    def test_save(self, db):
+        """Test save to db."""
+        cache = AsyncCache()
+
+        async def edit():  # NOQA:WPS430
+            await cache.load_many([3, 7], db)
+            cache.cache.db_nodes[7].value = 'new_value'
+            cache.cache.add_node(cache.cache.db_nodes[7].cache_id)
+            cache.cache.delete(cache.cache.db_nodes[3].cache_id)
+            await cache.save(db)
+
+        asyncio.run(edit())
+        assert db.db.get(7).value == 'new_value'
+        assert db.db.get_parent_id(9) == 7
+        assert db.db.is_deleted(8) is True
+        assert cache.cache.dirty == set()
+
+    def test_save_delete_orphans(self, db):
+        """Test orphans of deleted db node are deleted in cache."""
+        cache = AsyncCache()
+
+        async def edit():  # NOQA:WPS430
+            await cache.load_many([3, 7], db)
+            cache.cache.delete(cache.cache.db_nodes[3].cache_id)
+            await cache.save(db)
+
+        asyncio.run(edit())
+        # node_4_1 is not connected to node_2_1 in cache
+        assert cache.cache.db_nodes[7].is_deleted is True
+        assert cache.cache.dirty == set()
+
+    def test_save_delete_lazy_orphans(self):
+        """Test orphans under lazy deletes are checked with one call."""
+        lazy_db = DB(lazy_delete=True)
+        add_default_nodes(lazy_db)
+        db = AsyncDB(lazy_db)
+        cache = AsyncCache()
+
+        async def edit():  # NOQA:WPS430
+            await cache.load_many([3, 7, 4], db)
+            cache.cache.delete(cache.cache.db_nodes[3].cache_id)
+            await cache.save(db)
+
+        asyncio.run(edit())
+        assert cache.cache.db_nodes[7].is_deleted is True
+        assert cache.cache.db_nodes[4].is_deleted is False
+
+    def test_save_keeps_later_edits(self, db):
+        """Test nodes edited while saving stay dirty."""
+        cache = AsyncCache()
+
+        async def edit():  # NOQA:WPS430
+            await cache.load_many([3, 7], db)
+            cache.cache.db_nodes[3].value = 'saved'
+            new_node = cache.cache.add_node(cache.cache.db_nodes[7].cache_id)
+
+            async def edit_later():  # NOQA:WPS430
+                await asyncio.sleep(0)
+                new_node.value = 'later'
+                cache.cache.db_nodes[7].value = 'later'
+
+            await asyncio.gather(cache.save(db), edit_later())
+            assert cache.cache.dirty == {new_node.cache_id, 1}
+            await cache.save(db)
+            return new_node
+
+        new_node = asyncio.run(edit())
+        assert db.db.get(3).value == 'saved'
+        assert db.db.get(7).value == 'later'
+        assert db.db.get(new_node.db_id).value == 'later'
+        assert cache.cache.dirty == set()
+
+    def test_concurrent_caches(self, db):
+        """Test many caches share one db."""
+        caches = [AsyncCache() for _ in range(5)]
+
+        async def load_all():  # NOQA:WPS430
+            await asyncio.gather(*(
+                cache.load_many(range(9), db)
+                for cache in caches
+            ))
+
+        asyncio.run(load_all())
+        assert all(len(cache.cache.db_nodes) == 9 for cache in caches)
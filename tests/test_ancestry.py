@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+from bdc import ancestry
+from bdc.ancestry import AncestryIndex
+from bdc.db import DB
+
+
+class TestAncestryIndex:
+    """Ancestry index testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    def test_build(self):
+        """Test index of existing tree."""
+        db = DB.default()
+        index = AncestryIndex(db.get_children_ids, [0])
+        assert index.is_descendant(7, 0) is True
+        assert index.is_descendant(7, 3) is True
+        assert index.is_descendant(7, 6) is False
+        assert index.is_descendant(3, 7) is False
+        assert index.is_descendant(3, 3) is False
+        assert index.depth(0) == 0
+        assert index.depth(8) == 4
+
+    def test_add(self):
+        """Test new leaves are labeled without rebuild."""
+        db = DB(ancestry_index=True)
+        root = db.add_root('root')
+        child = db.add_to_parent(root, 'child')
+        assert db.is_descendant(child.db_id, root.db_id) is True
+        rebuilds = db.ancestry.rebuilds
+        grandchild = db.add_to_parent(child, 'grandchild')
+        sibling = db.add_to_parent(root, 'sibling')
+        assert db.is_descendant(grandchild.db_id, root.db_id) is True
+        assert db.is_descendant(grandchild.db_id, sibling.db_id) is False
+        assert db.depth(grandchild.db_id) == 2
+        assert db.ancestry.rebuilds == rebuilds
+
+    def test_deep_chain(self):
+        """Test chain grown at its leaf is relabeled locally."""
+        nodes = 3000
+        db = DB(ancestry_index=True)
+        db.add_root('root')
+        for db_id in range(1, nodes):
+            db.add_to_parent(db_id - 1, 'val')
+        assert db.ancestry.rebuilds == 1
+        assert db.ancestry.relabeled < nodes * 30
+        assert db.is_descendant(nodes - 1, 0) is True
+        assert db.is_descendant(0, nodes - 1) is False
+        assert db.depth(nodes - 1) == nodes - 1
+
+    @pytest.mark.parametrize('shape', ['deep', 'wide', 'random'])
+    def test_small_label_space(self, shape, monkeypatch):
+        """Test intervals stay nested while label space grows."""
+        monkeypatch.setattr(ancestry, 'MIN_LEVEL', 4)
+        rnd = random.Random(0)
+        children = {0: []}
+        index = AncestryIndex(children.__getitem__, [0])
+        for db_id in range(1, 300):
+            if shape == 'deep':
+                parent_id = db_id - 1
+            elif shape == 'wide':
+                parent_id = 0
+            else:
+                parent_id = rnd.randrange(db_id)
+            children[db_id] = []
+            children[parent_id].append(db_id)
+            index.add(db_id, parent_id)
+        assert index.level > 4
+        assert index.relabeled > 0
+        for parent_id, children_ids in children.items():
+            for child_id in children_ids:
+                assert index.low[parent_id] < index.low[child_id]
+                assert index.high[child_id] < index.high[parent_id]
+
+    @pytest.mark.parametrize('ancestry_index', [True, False])
+    def test_descendants_of(self, ancestry_index):
+        """Test batch descendant check with nested ancestors."""
+        db = DB.default()
+        if ancestry_index:
+            db.build_ancestry_index()
+        assert db.descendants_of([7, 8, 6, 4, 3, 2], [5, 3]) == [7, 8, 6]
+        assert db.descendants_of([7, 2], [4]) == []
+
+    @pytest.mark.parametrize('shape', ['deep', 'wide', 'random'])
+    def test_same_as_walk(self, shape):
+        """Test index answers match parent walking."""
+        rnd = random.Random(0)
+        indexed = DB(ancestry_index=True)
+        plain = DB()
+        for db in (indexed, plain):
+            db.add_root('root')
+        for db_id in range(1, 300):
+            if shape == 'deep':
+                parent_id = db_id - 1
+            elif shape == 'wide':
+                parent_id = 0
+            else:
+                parent_id = rnd.randrange(db_id)
+            indexed.add_to_parent(parent_id, 'val')
+            plain.add_to_parent(parent_id, 'val')
+
+        for _ in range(500):
+            db_id = rnd.randrange(300)
+            ancestor_id = rnd.randrange(300)
+            assert indexed.is_descendant(db_id, ancestor_id) == (
+                plain.is_descendant(db_id, ancestor_id)
+            )
+            assert indexed.depth(db_id) == plain.depth(db_id)
+
+    def test_subtree_ids(self):
+        """Test subtree ids."""
+        db = DB.default()
+        assert list(db.subtree_ids(3)) == [3, 5, 7, 8, 6]
+        assert list(db.subtree_ids(8)) == [8]
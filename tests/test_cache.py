@@ -1,7 +1,48 @@
+import gc
+import weakref
+
 import pytest
 
-from bdc.cache import Cache
-from bdc.db import DB
+from bdc.cache import (
+    Cache,
+    OperationCancelled,
+    Prefetch,
+)
+from bdc.changes import (
+    CONFLICT,
+    DELETE,
+    INSERT,
+    RENAME,
+    ConflictError,
+    NodeChange,
+)
+from bdc.db import (
+    DB,
+    add_default_nodes,
+)
+from bdc.events import (
+    ADDED,
+    DELETED,
+    EVICTED,
+    RENAMED,
+    REPARENTED,
+)
+from bdc.eviction import LFUPolicy
+from bdc.feed import ChangeFeed
+
+
+class RecordingDB(DB):
+    """DB recording applied changesets."""
+
+    def __init__(self):
+        """Initialization."""
+        super().__init__()
+        self.changesets = []
+
+    def apply_changes(self, changeset):
+        """Record changeset."""
+        self.changesets.append(changeset)
+        return super().apply_changes(changeset)
 
 
 class TestCache:
@@ -72,6 +113,114 @@ class TestCache:
         assert h_node.children == [m_node]
         assert m_node.parent == h_node
 
+    def test_load_orphans_by_parent(self):
+        """Test load from db.
+
+        case: orphans are indexed by parent and adopted on parent load.
+        """
+        db = DB.default()
+        cache = Cache()
+        cache.load(7, db)
+        cache.load(8, db)
+        cache.load(6, db)
+        assert cache.orphans == {7, 8, 6}
+        assert cache.orphans_by_parent == {5: [7, 8], 3: [6]}
+
+        cache.load(5, db)
+        m_node = cache.db_nodes[5]
+        assert cache.orphans == {6, 5}
+        assert cache.orphans_by_parent == {3: [6, 5]}
+        assert m_node.children == [cache.db_nodes[7], cache.db_nodes[8]]
+
+        cache.load(3, db)
+        assert cache.orphans == {3}
+        assert cache.orphans_by_parent == {1: [3]}
+        assert cache.db_nodes[3].children == [cache.db_nodes[6], m_node]
+
+    def test_load_many(self):
+        """Test batch load from db.
+
+        case: children before parents, duplicates and loaded nodes.
+        """
+        db = DB.default()
+        cache = Cache()
+        cache.load(1, db)
+        loaded = cache.load_many([7, 5, 3, 7, 1], db)
+        assert [node.db_id for node in loaded] == [7, 5, 3]
+        assert [node.cache_id for node in loaded] == [1, 2, 3]
+        assert cache.db_nodes[7].parent is cache.db_nodes[5]
+        assert cache.db_nodes[5].parent is cache.db_nodes[3]
+        assert cache.db_nodes[3].parent is cache.db_nodes[1]
+        assert cache.orphans == {1}
+        assert cache.orphans_by_parent == {0: [1]}
+
+    def test_load_many_deleted_parent(self):
+        """Test batch load from db.
+
+        case: loaded parent deleted in cache, deleted state propagated.
+        """
+        db = DB.default()
+        cache = Cache()
+        cache.load(3, db)
+        cache.load(7, db)
+        cache.delete(0)
+        loaded = cache.load_many([8, 5, 6], db)
+        assert all(node.is_deleted for node in loaded)
+        assert cache.db_nodes[7].is_deleted is True
+        assert db.nodes[5].is_deleted is False
+
+    def test_load_subtree(self):
+        """Test load subtree from db."""
+        db = DB.default()
+        cache = Cache()
+        loaded = cache.load_subtree(3, db)
+        assert {node.db_id for node in loaded} == {3, 5, 6, 7, 8}
+        assert cache.orphans == {3}
+        assert set(cache.db_nodes[5].all_children) == {
+            cache.db_nodes[7],
+            cache.db_nodes[8],
+        }
+
+    def test_load_subtree_depth(self):
+        """Test load subtree from db.
+
+        case: limited depth.
+        """
+        db = DB.default()
+        cache = Cache()
+        loaded = cache.load_subtree(1, db, depth=1)
+        assert [node.db_id for node in loaded] == [1, 3, 4]
+        loaded = cache.load_subtree(1, db, depth=0)
+        assert not loaded
+
+    def test_load_subtree_levels(self, monkeypatch):
+        """Test children of every subtree level are read with one call."""
+        db = DB.default()
+        calls = []
+        get_nodes_children_ids = db.get_nodes_children_ids
+
+        def counted(db_ids, limit=None):  # NOQA:WPS430
+            calls.append(list(db_ids))
+            return get_nodes_children_ids(db_ids, limit)
+
+        monkeypatch.setattr(db, 'get_nodes_children_ids', counted)
+        Cache().load_subtree(1, db)
+        assert calls == [[1], [3, 4], [5, 6], [7, 8]]
+
+    def test_free_without_gc(self):
+        """Test dropped cache is freed without cyclic gc."""
+        db = DB.default()
+        gc.disable()
+        try:
+            cache = Cache()
+            cache.load_subtree(0, db)
+            cache.add_node(5)
+            node_ref = weakref.ref(cache.cache_nodes[5])
+            del cache  # NOQA:WPS420
+            assert node_ref() is None
+        finally:
+            gc.enable()
+
     def test_save(self):
         """Test save to db."""
         db = DB.default()
@@ -137,6 +286,122 @@ class TestCache:
         assert set(node_2_1.children) == {node_modified, node_3_2}
         assert node_2_1.parent == node_1_1
 
+    def test_dirty(self, cache):
+        """Test dirty tracking."""
+        assert not cache.dirty
+        cache.cache_nodes[4].value = 'new_value'
+        cache.add_node(4)
+        cache.delete(5)
+        assert cache.dirty == {4, 9, 5, 7, 8}
+
+    @pytest.mark.parametrize('lazy_delete', [False, True])
+    def test_save_deleted_orphans(self, lazy_delete, monkeypatch):
+        """Test orphans under saved deletes are deleted.
+
+        case: eager deletes list orphans, they are not checked in db.
+        """
+        db = DB(lazy_delete=lazy_delete)
+        add_default_nodes(db)
+        checks = []
+        descendants_of = db.descendants_of
+        monkeypatch.setattr(
+            db,
+            'descendants_of',
+            lambda *args: checks.append(args) or descendants_of(*args),
+        )
+        cache = Cache()
+        cache.load_many([3, 7, 4], db)
+        cache.delete(cache.db_nodes[3].cache_id)
+        cache.save(db)
+        assert cache.db_nodes[7].is_deleted is True
+        assert cache.db_nodes[4].is_deleted is False
+        assert len(checks) == int(lazy_delete)
+
+    def test_save_only_dirty(self):
+        """Test save to db.
+
+        case: only changed nodes are written.
+        """
+        db = RecordingDB.default()
+        cache = Cache()
+        cache.load_many(list(db.nodes), db)
+        cache.cache_nodes[2].value = 'new_value'
+        cache.add_node(2)
+        cache.save(db)
+        changeset = db.changesets[0]
+        assert changeset.renames == {2: 'new_value'}
+        assert [insert.parent_id for insert in changeset.inserts] == [2]
+        assert not changeset.deletes
+        assert db.nodes[2].value == 'new_value'
+        assert db.nodes[9].parent is db.nodes[2]
+        assert not cache.dirty
+
+        cache.save(db)
+        changeset = db.changesets[1]
+        assert not changeset.renames
+        assert not changeset.inserts
+
+    def test_load_deleted_not_dirty(self):
+        """Test load deleted subtree.
+
+        case: nodes deleted in db are not dirty.
+        """
+        db = DB.default()
+        db.update_node(3, 'node_2_1', is_deleted=True)
+        cache = Cache()
+        cache.load_subtree(1, db)
+        assert cache.db_nodes[7].is_deleted is True
+        assert not cache.dirty
+
+    def test_save_progress(self, cache):
+        """Test save progress reported."""
+        calls = []
+        cache.cache_nodes[4].value = 'new_value'
+        cache.save(DB.default(), progress=lambda *args: calls.append(args))
+        assert calls == [(0, 1)]
+
+    def test_save_cancelled(self):
+        """Test save cancelled by progress, cache and db untouched."""
+        db = DB.default()
+        cache = Cache()
+        cache.load(5, db)
+        cache.add_node(0)
+        cache.delete(0)
+
+        def cancel(done, total):  # NOQA:WPS430
+            raise OperationCancelled()
+
+        with pytest.raises(OperationCancelled):
+            cache.save(db, progress=cancel)
+        assert len(db.nodes) == 9
+        assert db.nodes[5].is_deleted is False
+        assert cache.dirty == {0, 1}
+
+    def test_load_subtree_cancelled(self):
+        """Test load subtree cancelled by progress, cache untouched."""
+        cache = Cache()
+
+        def cancel(done, total):  # NOQA:WPS430
+            raise OperationCancelled()
+
+        with pytest.raises(OperationCancelled):
+            cache.load_subtree(0, DB.default(), progress=cancel)
+        assert not cache.cache_nodes
+
+    def test_load_cancelled(self):
+        """Test load cancelled by progress after read, cache untouched."""
+        cache = Cache()
+        calls = []
+
+        def cancel(done, total):  # NOQA:WPS430
+            calls.append((done, total))
+            raise OperationCancelled()
+
+        with pytest.raises(OperationCancelled):
+            cache.load(1, DB.default(), progress=cancel)
+        assert calls == [(1, 1)]
+        assert not cache.cache_nodes
+
     def test_save_update_deleted_children(self):
         """Test save to db.
 
@@ -240,3 +505,556 @@ class TestCacheDBInteraction:
         assert db.nodes[8].is_deleted is True
         assert db.nodes[6].is_deleted is True
         assert db.nodes[4].is_deleted is True
+
+    def test_concurrent_caches(self):
+        """Test caches saving same nodes.
+
+        Second save of changed node is rejected,
+        other nodes are saved independently.
+        """
+        db = DB.default()
+        first = Cache()
+        second = Cache()
+        first.load_subtree(3, db)
+        second.load_subtree(3, db)
+        first.db_nodes[5].value = 'first'
+        second.db_nodes[6].value = 'second'
+        first.save(db)
+        second.save(db)
+        assert db.nodes[5].value == 'first'
+        assert db.nodes[6].value == 'second'
+        # saved cache keeps working with new versions
+        first.db_nodes[5].value = 'first_again'
+        first.save(db)
+
+        second.db_nodes[5].value = 'second'
+        with pytest.raises(ConflictError):
+            second.save(db)
+        assert db.nodes[5].value == 'first_again'
+        assert second.dirty == {second.db_nodes[5].cache_id}
+
+    def test_concurrent_delete(self):
+        """Test node deleted by other cache is in conflict."""
+        db = DB.default()
+        first = Cache()
+        second = Cache()
+        first.load(3, db)
+        second.load(7, db)
+        first.delete(first.db_nodes[3].cache_id)
+        first.save(db)
+        second.db_nodes[7].value = 'second'
+        with pytest.raises(ConflictError):
+            second.save(db)
+        assert db.nodes[7].value == 'node_4_1'
+
+
+class TestCacheEvents:
+    """Cache node events testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def events():
+        """Collected events fixture."""
+        return []
+
+    @staticmethod
+    @pytest.fixture
+    def cache(events):
+        """Cache with listener fixture."""
+        new_cache = Cache()
+        new_cache.add_listener(
+            lambda event: events.append((event.kind, event.node.db_id)),
+        )
+        return new_cache
+
+    def test_load(self, cache, events):
+        """Test parents added before children and orphans reparented."""
+        db = DB.default()
+        cache.load(7, db)
+        cache.load_many([5, 8, 3], db)
+        assert events == [
+            (ADDED, 7),
+            (ADDED, 3),
+            (ADDED, 5),
+            (REPARENTED, 7),
+            (ADDED, 8),
+        ]
+
+    def test_edit(self, cache, events):
+        """Test add, rename and delete events."""
+        db = DB.default()
+        cache.load(5, db)
+        events.clear()
+        new_node = cache.add_node(0)
+        cache.rename(0, 'new_value')
+        cache.delete(0)
+        assert events == [(ADDED, None), (RENAMED, 5), (DELETED, 5)]
+        assert new_node.is_deleted is True
+
+    def test_save(self, cache, events):
+        """Test cache subtree deleted after save."""
+        db = DB.default()
+        cache.load(3, db)
+        cache.load(7, db)
+        events.clear()
+        cache.cache_nodes[0].delete()
+        cache.save(db)
+        assert events == [(DELETED, 7)]
+
+
+class TestCacheEviction:
+    """Cache eviction testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def db():
+        """Default db fixture."""
+        return DB.default()
+
+    def test_evict_lru_leaves(self, db):
+        """Test least recently used leaves are evicted."""
+        cache = Cache(capacity=3)
+        cache.load_many([3, 5, 6], db)
+        cache.load(6, db)
+        cache.load(4, db)
+        # node_3_1 is least recently used leaf
+        assert set(cache.db_nodes) == {3, 6, 4}
+        assert cache.db_nodes[3].children == [cache.db_nodes[6]]
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 4
+        assert cache.stats.evictions == 1
+
+    def test_evict_lfu(self, db):
+        """Test least frequently used leaves are evicted."""
+        cache = Cache(capacity=2, policy=LFUPolicy())
+        cache.load_many([7, 8], db)
+        cache.load(7, db)
+        cache.load(2, db)
+        assert set(cache.db_nodes) == {7, 2}
+
+    def test_evict_parent(self, db):
+        """Test parents are evicted after their children."""
+        cache = Cache(capacity=1)
+        cache.load_subtree(3, db)
+        cache.load(2, db)
+        assert set(cache.db_nodes) == {2}
+        assert cache.stats.evictions == 5
+        assert cache.orphans_by_parent == {0: [2]}
+        assert cache.orphans == {2}
+
+    def test_pinned(self, db):
+        """Test dirty and new nodes are not evicted until saved."""
+        cache = Cache(capacity=2)
+        cache.load_many([7, 8], db)
+        cache.rename(cache.db_nodes[7].cache_id, 'new_value')
+        new_node = cache.add_node(cache.db_nodes[8].cache_id)
+        cache.load(2, db)
+        assert set(cache.db_nodes) == {7, 8, 2}
+        assert new_node.cache_id in cache.cache_nodes
+
+        cache.save(db)
+        assert len(cache.cache_nodes) == 2
+        assert db.nodes[7].value == 'new_value'
+        assert db.nodes[9].parent is db.nodes[8]
+
+    def test_policy_tracks_clean_leaves(self, db):
+        """Test only clean leaves are eviction candidates."""
+        cache = Cache(capacity=10)
+        cache.load_subtree(3, db)
+
+        def cache_ids(*db_ids):  # NOQA:WPS430
+            return [cache.db_nodes[db_id].cache_id for db_id in db_ids]
+
+        assert list(cache.policy.candidates()) == cache_ids(6, 7, 8)
+        cache.rename(cache.db_nodes[7].cache_id, 'new_value')
+        cache.add_node(cache.db_nodes[8].cache_id)
+        assert list(cache.policy.candidates()) == cache_ids(6, 7)
+        cache.capacity = 3
+        cache.evict()
+        assert set(cache.db_nodes) == {3, 5, 7, 8}
+        assert not list(cache.policy.candidates())
+
+        cache.save(db)
+        assert set(cache.db_nodes) == {3, 5, 8}
+        assert list(cache.policy.candidates()) == cache_ids(8)
+
+    def test_evicted_orphan(self, db):
+        """Test evicted orphan is not adopted and can be loaded again."""
+        cache = Cache(capacity=1)
+        cache.load(7, db)
+        assert cache.orphans_by_parent == {5: [7]}
+        cache.load(8, db)
+        assert cache.orphans_by_parent == {5: [8]}
+        cache.capacity = 3
+        cache.load(5, db)
+        assert cache.db_nodes[5].children == [cache.db_nodes[8]]
+        cache.load(7, db)
+        assert cache.db_nodes[7].parent is cache.db_nodes[5]
+        assert cache.orphans == {5}
+        assert cache.orphans_by_parent == {3: [5]}
+
+    def test_evicted_event(self, db):
+        """Test evicted node is sent to listeners."""
+        cache = Cache(capacity=1)
+        events = []
+        cache.add_listener(
+            lambda event: events.append((event.kind, event.node.db_id)),
+        )
+        cache.load(7, db)
+        cache.load(8, db)
+        assert events == [(ADDED, 7), (ADDED, 8), (EVICTED, 7)]
+
+    def test_not_bounded(self, db):
+        """Test cache without capacity keeps all nodes."""
+        cache = Cache()
+        cache.load_subtree(0, db)
+        cache.load(3, db)
+        assert len(cache.cache_nodes) == 9
+        assert cache.stats.evictions == 0
+        assert cache.stats.hits == 1
+
+
+class CountingDB(DB):
+    """DB counting read calls."""
+
+    def __init__(self):
+        """Initialization."""
+        super().__init__()
+        self.calls = 0
+
+    def get_nodes_params(self, db_ids):
+        """Count call."""
+        self.calls += 1
+        return super().get_nodes_params(db_ids)
+
+    def get_nodes_ancestor_ids(self, db_ids, levels=None):
+        """Count call."""
+        self.calls += 1
+        return super().get_nodes_ancestor_ids(db_ids, levels)
+
+    def get_nodes_children_ids(self, db_ids, limit=None):
+        """Count call."""
+        self.calls += 1
+        return super().get_nodes_children_ids(db_ids, limit)
+
+
+class TestCachePrefetch:
+    """Cache prefetch testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    def test_ancestors(self):
+        """Test ancestors are loaded up to loaded one."""
+        db = CountingDB.default()
+        cache = Cache(prefetch=Prefetch(ancestors=2))
+        cache.load(1, db)
+        assert set(cache.db_nodes) == {0, 1}
+        new_nodes = cache.load_many([7, 8], db)
+        assert [node.db_id for node in new_nodes] == [7, 8, 5, 3]
+        assert cache.db_nodes[7].parent.parent.parent is cache.db_nodes[1]
+        assert cache.orphans == {0}
+        assert cache.stats.prefetched == 3
+        # ancestors of 8 are not read again
+        calls = db.calls
+        cache.load(4, db)
+        assert db.calls == calls + 1
+
+    def test_children(self):
+        """Test first children are loaded."""
+        db = CountingDB.default()
+        cache = Cache(prefetch=Prefetch(children=1))
+        cache.load_many([1, 3], db)
+        assert set(cache.db_nodes) == {1, 3, 5}
+        assert cache.db_nodes[3].children == [cache.db_nodes[5]]
+
+    def test_siblings(self):
+        """Test children of not loaded parent are loaded."""
+        db = DB.default()
+        cache = Cache(prefetch=Prefetch(ancestors=1, children=2))
+        cache.load(7, db)
+        assert set(cache.db_nodes) == {5, 7, 8}
+
+    def test_saves_round_trips(self):
+        """Test next loads of parent chain are hits."""
+        db = CountingDB.default()
+        cache = Cache(prefetch=Prefetch(ancestors=4, children=2))
+        cache.load(5, db)
+        calls = db.calls
+        for db_id in (3, 1, 0, 7, 8):
+            cache.load(db_id, db)
+        assert db.calls == calls
+        assert cache.stats.hits == 5
+        assert cache.stats.misses == 1
+
+    def test_batched_reads(self):
+        """Test prefetch reads ancestors and children with one call each."""
+        db = CountingDB.default()
+        cache = Cache(prefetch=Prefetch(ancestors=2, children=2))
+        cache.load_many([7, 6, 4], db)
+        assert set(cache.db_nodes) == {0, 1, 3, 4, 5, 6, 7, 8}
+        assert db.calls == 4
+
+    def test_subtree_not_prefetched(self):
+        """Test subtree load reads subtree only."""
+        db = DB.default()
+        cache = Cache(prefetch=Prefetch(ancestors=4))
+        cache.load_subtree(3, db)
+        assert set(cache.db_nodes) == {3, 5, 6, 7, 8}
+
+
+class TestCacheDiff:
+    """Cache diff testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    def test_rename_and_insert(self):
+        """Test renames and inserts with resolved parents."""
+        db = DB.default()
+        cache = Cache()
+        cache.load(5, db)
+        cache.load(6, db)
+        cache.rename(0, 'renamed')
+        cache.rename(1, 'node_3_2')
+        new_node = cache.add_node(0)
+        new_child = cache.add_node(new_node.cache_id)
+        assert list(cache.diff(db)) == [
+            NodeChange(
+                kind=RENAME,
+                db_id=5,
+                cache_id=0,
+                value='renamed',
+                old_value='node_3_1',
+            ),
+            NodeChange(kind=INSERT, cache_id=2, value='New Node', parent_id=5),
+            NodeChange(
+                kind=INSERT,
+                cache_id=new_child.cache_id,
+                value='New Node',
+                parent_ref=2,
+            ),
+        ]
+
+    def test_delete_cascade(self):
+        """Test deletes of not deleted db descendants are streamed."""
+        db = DB.default()
+        db.update_node(8, 'node_4_2', is_deleted=True)
+        cache = Cache()
+        cache.load(3, db)
+        cache.load(7, db)
+        cache.delete(0)
+        changes = list(cache.diff(db))
+        assert [(change.kind, change.db_id) for change in changes] == [
+            (DELETE, 3),
+            (DELETE, 5),
+            (DELETE, 6),
+            (DELETE, 7),
+        ]
+        assert [change.deleted_by for change in changes] == [None, 3, 3, 3]
+        assert changes[3].cache_id == 1
+        assert changes[1].cache_id is None
+        assert db.is_deleted(3) is False
+
+        cache.save(db)
+        assert all(db.is_deleted(change.db_id) for change in changes)
+
+    def test_conflict(self):
+        """Test nodes changed in db are reported."""
+        db = DB.default()
+        cache = Cache()
+        cache.load(5, db)
+        cache.rename(0, 'renamed')
+        db.update_node(5, 'other', is_deleted=False)
+        assert list(cache.diff(db)) == [
+            NodeChange(
+                kind=CONFLICT,
+                db_id=5,
+                cache_id=0,
+                value='renamed',
+                old_value='other',
+            ),
+        ]
+        with pytest.raises(ConflictError):
+            cache.save(db)
+
+    def test_conflict_only(self):
+        """Test other changes are not reported with conflict."""
+        db = DB.default()
+        cache = Cache()
+        cache.load(3, db)
+        cache.load(5, db)
+        cache.rename(0, 'renamed')
+        cache.add_node(0)
+        cache.delete(1)
+        db.update_node(5, 'other', is_deleted=False)
+        changes = list(cache.diff(db))
+        assert [(change.kind, change.db_id) for change in changes] == [
+            (CONFLICT, 5),
+        ]
+
+    def test_reads_dirty_nodes_only(self):
+        """Test clean nodes are not read."""
+        db = CountingDB.default()
+        cache = Cache()
+        cache.load_subtree(0, db)
+        cache.rename(cache.db_nodes[4].cache_id, 'renamed')
+        calls = db.calls
+        assert len(list(cache.diff(db))) == 1
+        assert db.calls == calls + 1
+
+
+class TestCacheFollow:
+    """Cache following db change feed testing."""
+
+    @staticmethod
+    @pytest.fixture
+    def db():
+        """Default db fixture."""
+        return DB.default()
+
+    @staticmethod
+    @pytest.fixture
+    def feed(db):
+        """Change feed fixture."""
+        return ChangeFeed(db)
+
+    def test_refresh(self, db, feed):
+        """Test clean nodes get db changes without being dirty."""
+        cache = Cache()
+        cache.load_subtree(3, db)
+        cache.follow(feed)
+        events = []
+        cache.add_listener(events.append)
+        db.update_node(5, 'renamed', is_deleted=False)
+        db.update_node(3, 'node_2_1', is_deleted=True)
+        refreshed = cache.refresh()
+        assert [node.db_id for node in refreshed] == [5, 3, 7, 8, 6]
+        assert [event.kind for event in events] == [RENAMED] + [DELETED] * 5
+        node = cache.db_nodes[5]
+        assert node.value == 'renamed'
+        assert node.version == 1
+        assert all(node.is_deleted for node in cache.cache_nodes.values())
+        assert not cache.dirty
+        assert cache.refresh() == []
+
+    def test_dirty_node_kept(self, db, feed):
+        """Test local edits are not overwritten."""
+        cache = Cache()
+        cache.load(5, db)
+        cache.follow(feed)
+        cache.rename(0, 'local')
+        db.update_node(5, 'other', is_deleted=False)
+        assert cache.refresh() == []
+        assert cache.db_nodes[5].value == 'local'
+        with pytest.raises(ConflictError):
+            cache.save(db)
+
+    def test_own_save(self, db, feed):
+        """Test saved changes come back as no-ops."""
+        cache = Cache()
+        cache.follow(feed)
+        cache.load(5, db)
+        cache.rename(0, 'renamed')
+        new_node = cache.add_node(0)
+        cache.save(db)
+        assert cache.refresh() == []
+        db.update_node(new_node.db_id, 'other', is_deleted=False)
+        assert cache.refresh() == [new_node]
+        assert new_node.value == 'other'
+
+    def test_reloaded_node(self, db, feed):
+        """Test changes older than loaded node are skipped."""
+        cache = Cache(capacity=1)
+        cache.follow(feed)
+        cache.load(5, db)
+        db.update_node(5, 'first', is_deleted=False)
+        cache.load(6, db)
+        assert 5 not in cache.db_nodes
+        assert cache.subscription.db_ids == {6}
+        db.update_node(5, 'second', is_deleted=False)
+        cache.load(5, db)
+        assert cache.refresh() == []
+        assert cache.db_nodes[5].value == 'second'
+
+    def test_change_after_read(self, db, feed):
+        """Test change made after nodes are read is received."""
+        cache = Cache()
+        cache.follow(feed)
+
+        def rename(done, total):  # NOQA:WPS430
+            db.update_node(5, 'renamed', is_deleted=False)
+
+        cache.load(5, db, progress=rename)
+        assert cache.db_nodes[5].value == 'node_3_1'
+        assert cache.refresh() == [cache.db_nodes[5]]
+        assert cache.db_nodes[5].value == 'renamed'
+
+    def test_load_cancelled_unwatched(self, db, feed):
+        """Test nodes of cancelled load are not watched."""
+        cache = Cache(prefetch=Prefetch(ancestors=1))
+        cache.follow(feed)
+        cache.load(3, db)
+
+        def cancel(done, total):  # NOQA:WPS430
+            raise OperationCancelled()
+
+        with pytest.raises(OperationCancelled):
+            cache.load(5, db, progress=cancel)
+        assert cache.subscription.db_ids == {3, 1}
+
+    def test_unfollow(self, db, feed):
+        """Test changes are not received after unfollow."""
+        cache = Cache()
+        cache.load(5, db)
+        cache.follow(feed)
+        cache.unfollow()
+        db.update_node(5, 'renamed', is_deleted=False)
+        assert cache.refresh() == []
+        assert cache.db_nodes[5].value == 'node_3_1'
@@ -0,0 +1,82 @@
+import pytest
+
+from bdc.changes import (
+    Changeset,
+    ConflictError,
+    NodeInsert,
+    check_versions,
+    validate_changeset,
+)
+
+
+class TestValidateChangeset:
+    """Changeset validation testing."""
+
+    @staticmethod
+    def exists(db_id):
+        """Only db_ids 0 and 1 exist."""
+        return db_id in {0, 1}
+
+    def test_valid(self):
+        """Test valid changeset."""
+        changeset = Changeset(
+            inserts=[
+                NodeInsert(ref=0, value='val', parent_id=1),
+                NodeInsert(ref=1, value='val', parent_ref=0),
+            ],
+            renames={0: 'val'},
+            deletes=[1],
+        )
+        validate_changeset(changeset, self.exists)
+
+    @pytest.mark.parametrize('changeset', [
+        Changeset(renames={2: 'val'}),
+        Changeset(deletes=[2]),
+        Changeset(inserts=[NodeInsert(ref=0, value='val', parent_id=2)]),
+        Changeset(inserts=[NodeInsert(ref=0, value='val', parent_ref=1)]),
+        Changeset(inserts=[NodeInsert(ref=0, value='val')]),
+        Changeset(inserts=[
+            NodeInsert(ref=0, value='val', parent_id=1, parent_ref=1),
+        ]),
+        Changeset(inserts=[
+            NodeInsert(ref=0, value='val', parent_id=1),
+            NodeInsert(ref=0, value='val', parent_id=1),
+        ]),
+    ])
+    def test_invalid(self, changeset):
+        """Test invalid changesets."""
+        with pytest.raises(ValueError):
+            validate_changeset(changeset, self.exists)
+
+
+class TestCheckVersions:
+    """Changeset versions check testing."""
+
+    @staticmethod
+    def get_version(db_id):
+        """Node version is its db_id."""
+        return db_id
+
+    @staticmethod
+    def is_deleted(db_id):
+        """Only db_id 3 is deleted."""
+        return db_id == 3
+
+    def test_valid(self):
+        """Test not changed nodes."""
+        changeset = Changeset(
+            renames={1: 'val', 2: 'val', 3: 'val'},
+            deletes=[3],
+            versions={1: 1, 3: 3},
+        )
+        check_versions(changeset, self.get_version, self.is_deleted)
+
+    def test_conflicts(self):
+        """Test changed and deleted nodes are reported together."""
+        changeset = Changeset(
+            renames={1: 'val', 2: 'val', 3: 'val'},
+            versions={1: 1, 2: 0, 3: 3},
+        )
+        with pytest.raises(ConflictError) as exc_info:
+            check_versions(changeset, self.get_version, self.is_deleted)
+        assert exc_info.value.db_ids == [2, 3]
@@ -0,0 +1,156 @@
+import pytest
+
+from bdc.cache import Cache
+from bdc.changes import (
+    Changeset,
+    ConflictError,
+    NodeInsert,
+)
+from bdc.columnar_db import ColumnarDB
+
+
+class TestColumnarDB:
+    """Columnar DB testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    def test_add_root(self):
+        """Test add root."""
+        db = ColumnarDB()
+        root = db.add_root('val1')
+        assert root.db_id == 0
+        assert db.get(0).value == 'val1'
+        with pytest.raises(RuntimeError):
+            db.add_root('val2')
+
+    def test_add_to_parent(self):
+        """Test add to parent."""
+        db = ColumnarDB.default()
+        new_node = db.add_to_parent(5, 'val1')
+        assert new_node.db_id == 9
+        assert db.get_parent_id(9) == 5
+        assert db.get_children_ids(5) == [7, 8, 9]
+        with pytest.raises(ValueError):
+            db.add_to_parent(20, 'val2')
+
+    def test_add_to_deleted_parent(self):
+        """Test add to parent.
+
+        case: deleted parent. Child should be deleted too.
+        """
+        db = ColumnarDB.default()
+        db.update_node(5, 'node_3_1', is_deleted=True)
+        assert db.add_to_parent(5, 'val1').is_deleted is True
+
+    def test_interned_values(self):
+        """Test equal values share string table entry."""
+        db = ColumnarDB()
+        root = db.add_root('val')
+        db.add_to_parent(root, 'val')
+        db.add_to_parent(root, 'other')
+        assert db.strings == ['val', 'other']
+        assert list(db.value_ids) == [0, 0, 1]
+
+    def test_nodes_view(self):
+        """Test nodes are created on access."""
+        db = ColumnarDB.default()
+        assert len(db.nodes) == 9
+        assert list(db.nodes) == list(range(9))
+        node = db.nodes[3]
+        assert node.value == 'node_2_1'
+        assert node.db_id == 3
+        assert node is not db.nodes[3]
+        with pytest.raises(KeyError):
+            db.nodes[9]  # NOQA:WPS428
+
+    def test_get_root_ids(self):
+        """Test get root ids."""
+        assert ColumnarDB.default().get_root_ids() == [0]
+        assert ColumnarDB().get_root_ids() == []
+
+    def test_get_node_params(self):
+        """Test get node params."""
+        db = ColumnarDB.default()
+        params = db.get_node_params(5)
+        assert params.value == 'node_3_1'
+        assert params.is_deleted is False
+        assert params.parent_id == 3
+        assert db.get_node_params(0).parent_id is None
+        with pytest.raises(KeyError):
+            db.get_node_params(20)
+
+    def test_is_child(self):
+        """Test is child."""
+        db = ColumnarDB.default()
+        assert db.is_child(3, 1) is True
+        assert db.is_child(3, 0) is False
+
+    def test_get_ancestor_ids(self):
+        """Test get ancestor ids and first children."""
+        db = ColumnarDB.default()
+        assert db.get_ancestor_ids(7) == [5, 3, 1, 0]
+        assert db.get_ancestor_ids(7, levels=2) == [5, 3]
+        assert db.get_children_ids(3, limit=1) == [5]
+
+    def test_update_node(self):
+        """Test update node."""
+        db = ColumnarDB.default()
+        deleted = db.update_node(3, 'val1', is_deleted=True)
+        assert {node.db_id for node in deleted} == {5, 6, 7, 8}
+        assert db.get(3).value == 'val1'
+        assert db.get(3).is_deleted is True
+        assert db.get(8).is_deleted is True
+        assert db.get(1).is_deleted is False
+
+    def test_apply_changes(self):
+        """Test apply changes."""
+        db = ColumnarDB.default()
+        result = db.apply_changes(Changeset(
+            inserts=[
+                NodeInsert(ref=0, value='new1', parent_id=2),
+                NodeInsert(ref=1, value='new2', parent_ref=0),
+            ],
+            renames={2: 'val2'},
+            deletes=[5, 3],
+        ))
+        assert result.inserted == {0: 9, 1: 10}
+        assert sorted(result.deleted) == [3, 5, 6, 7, 8]
+        assert db.get(2).value == 'val2'
+        assert db.get_parent_id(10) == 9
+
+    def test_versions(self):
+        """Test versions are changed by renames and deletes."""
+        db = ColumnarDB.default()
+        result = db.apply_changes(Changeset(
+            renames={2: 'val2', 4: 'node_2_2'},
+            deletes=[5],
+            versions={2: 0, 4: 0, 5: 0},
+        ))
+        assert result.versions == {2: 1, 4: 0, 5: 1}
+        assert db.get_node_params(7).version == 0
+        with pytest.raises(ConflictError):
+            db.apply_changes(Changeset(renames={2: 'val3'}, versions={2: 0}))
+
+    def test_cache(self):
+        """Test cache load and save."""
+        db = ColumnarDB.default()
+        cache = Cache()
+        cache.load(3, db)
+        cache.load(7, db)
+        cache.add_node(1)
+        cache.delete(0)
+        cache.save(db)
+        assert db.get_parent_id(9) == 7
+        assert all(db.deleted[db_id] for db_id in (3, 5, 6, 7, 8, 9))
+        assert cache.cache_nodes[2].db_id == 9
@@ -1,9 +1,34 @@
+import random
+import sys
+import threading
+
 import pytest
 
+from bdc.cache import Cache
+from bdc.changes import (
+    Changeset,
+    ConflictError,
+    NodeInsert,
+)
 from bdc.db import DB
+from bdc.events import (
+    ADDED,
+    DELETED,
+    RENAMED,
+)
 from bdc.node import Node
 
 
+def random_db(seed, nodes=300, lazy_delete=False):
+    """Create random tree."""
+    rnd = random.Random(seed)
+    db = DB(lazy_delete=lazy_delete)
+    db.add_root('root')
+    for db_id in range(1, nodes):
+        db.add_to_parent(rnd.randrange(db_id), 'val')
+    return db
+
+
 class TestDB:
     """DB testing."""
 
@@ -59,7 +84,7 @@ class TestDB:
         with pytest.raises(ValueError):
             db.add_to_parent(3, 'val2')
         unknown_node = Node('val2')
-        unknown_node._db_id = 3
+        unknown_node.db_id = 3
         with pytest.raises(ValueError):
             db.add_to_parent(unknown_node, 'val2')
 
@@ -80,6 +105,39 @@ class TestDB:
         assert params.db_id == 1
         assert params.value == 'val2'
         assert params.is_deleted is True
+        assert params.parent_id == 0
+
+    def test_get_nodes_params(self):
+        """Test get batch of node params."""
+        db = DB.default()
+        params = db.get_nodes_params([5, 0])
+        assert [node.db_id for node in params] == [5, 0]
+        assert [node.parent_id for node in params] == [3, None]
+
+    def test_get_root_ids(self):
+        """Test get root ids."""
+        assert DB.default().get_root_ids() == [0]
+        assert DB().get_root_ids() == []
+
+    def test_get_children_ids(self):
+        """Test get children ids."""
+        db = DB.default()
+        assert db.get_children_ids(3) == [5, 6]
+        assert db.get_children_ids(3, limit=1) == [5]
+        assert db.get_children_ids(8) == []
+
+    def test_get_ancestor_ids(self):
+        """Test get ancestor ids."""
+        db = DB.default()
+        assert db.get_ancestor_ids(7) == [5, 3, 1, 0]
+        assert db.get_ancestor_ids(7, levels=2) == [5, 3]
+        assert db.get_ancestor_ids(0) == []
+
+    def test_get_nodes_ids(self):
+        """Test get children and ancestor ids of batch of nodes."""
+        db = DB.default()
+        assert db.get_nodes_children_ids([3, 8], limit=1) == {3: [5], 8: []}
+        assert db.get_nodes_ancestor_ids([7, 0], levels=2) == {7: [5, 3], 0: []}
 
     def test_get_parent_id(self):
         """Test get parent id."""
@@ -121,6 +179,113 @@ class TestDB:
         assert child.is_deleted is True
         assert child2.is_deleted is True
 
+    def test_apply_changes(self):
+        """Test apply changes."""
+        db = DB.default()
+        changeset = Changeset(
+            inserts=[
+                NodeInsert(ref=0, value='new1', parent_id=2),
+                NodeInsert(ref=1, value='new2', parent_ref=0),
+            ],
+            renames={2: 'val2', 5: 'val5'},
+            deletes=[3, 5],
+        )
+        result = db.apply_changes(changeset)
+        assert result.inserted == {0: 9, 1: 10}
+        assert sorted(result.deleted) == [3, 5, 6, 7, 8]
+        assert db.nodes[2].value == 'val2'
+        assert db.nodes[5].value == 'val5'
+        assert db.nodes[9].parent is db.nodes[2]
+        assert db.nodes[10].parent is db.nodes[9]
+        assert db.nodes[10].is_deleted is False
+        assert all(db.nodes[db_id].is_deleted for db_id in result.deleted)
+        assert db.nodes[1].is_deleted is False
+
+    def test_apply_changes_fail_validation(self):
+        """Test apply changes.
+
+        case: wrong change, db untouched.
+        """
+        db = DB.default()
+        changeset = Changeset(
+            inserts=[NodeInsert(ref=0, value='new1', parent_id=20)],
+            renames={2: 'val2'},
+            deletes=[3],
+        )
+        with pytest.raises(ValueError):
+            db.apply_changes(changeset)
+        assert len(db.nodes) == 9
+        assert db.nodes[2].value == 'node_1_2'
+        assert db.nodes[3].is_deleted is False
+
+    def test_versions(self):
+        """Test versions are changed by renames and deletes."""
+        db = DB.default()
+        db.update_node(3, 'node_2_1', is_deleted=False)
+        assert db.get_version(3) == 0
+        db.update_node(3, 'val', is_deleted=False)
+        assert db.get_version(3) == 1
+        result = db.apply_changes(Changeset(
+            renames={4: 'val'},
+            deletes=[3, 5],
+            versions={4: 0, 5: 0},
+        ))
+        assert result.versions == {4: 1, 5: 1}
+        assert db.get_version(3) == 2
+        # cascade deletes do not change versions
+        assert db.get_version(7) == 0
+        assert db.get_node_params(5).version == 1
+
+    def test_apply_changes_conflict(self):
+        """Test apply changes.
+
+        case: node changed since read, db untouched.
+        """
+        db = DB.default()
+        db.update_node(2, 'val', is_deleted=False)
+        db.update_node(3, 'node_2_1', is_deleted=True)
+        changeset = Changeset(
+            renames={2: 'val2', 5: 'val5', 4: 'val4'},
+            versions={2: 0, 5: 0, 4: 0},
+        )
+        with pytest.raises(ConflictError) as exc_info:
+            db.apply_changes(changeset)
+        assert exc_info.value.db_ids == [2, 5]
+        assert db.nodes[4].value == 'node_2_2'
+
+    def test_apply_changes_conflict_ids(self):
+        """Test rejected changeset reserves no db_ids."""
+        db = DB.default()
+        with pytest.raises(ConflictError):
+            db.apply_changes(Changeset(
+                inserts=[NodeInsert(ref=0, value='new', parent_id=1)],
+                versions={1: 5},
+            ))
+        assert db.add_to_parent(1, 'new').db_id == 9
+
+    def test_events(self):
+        """Test db node events."""
+        db = DB.default()
+        events = []
+        db.add_listener(
+            lambda event: events.append((event.kind, event.node.db_id)),
+        )
+        db.add_to_parent(2, 'val')
+        db.update_node(3, 'val', is_deleted=True)
+        db.apply_changes(Changeset(
+            inserts=[NodeInsert(ref=0, value='val', parent_id=4)],
+            renames={4: 'node_2_2', 1: 'val'},
+            deletes=[2],
+        ))
+        assert events == [
+            (ADDED, 9),
+            (RENAMED, 3),
+            (DELETED, 3),
+            (RENAMED, 1),
+            (ADDED, 10),
+            (DELETED, 2),
+        ]
+
     def test_create_new_node(self):
         """Test create new node."""
         db = DB()
@@ -130,3 +295,159 @@ class TestDB:
         assert new_node.parent is None
         assert db.nodes == {0: new_node}
         assert db._node_index == 1
+
+
+class TestLazyDelete:
+    """DB lazy delete testing."""
+
+    def test_update_node(self):
+        """Test update node records tombstone only."""
+        db = DB.default()
+        db.lazy_delete = True
+        deleted = db.update_node(3, 'val', is_deleted=True)
+        assert deleted == []
+        assert db.tombstones == {3}
+        assert db.nodes[7].is_deleted is False
+        assert db.is_deleted(7) is True
+        assert db.get_node_params(7).is_deleted is True
+        assert db.is_deleted(4) is False
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_same_as_eager(self, seed):
+        """Test lazy and eager deletes give same deleted nodes."""
+        eager = random_db(seed)
+        lazy = random_db(seed, lazy_delete=True)
+        rnd = random.Random(seed)
+        for _ in range(10):
+            to_delete = rnd.sample(range(1, 300), 3)
+            changeset = Changeset(
+                inserts=[NodeInsert(ref=0, value='new', parent_id=to_delete[0])],
+                deletes=to_delete,
+            )
+            eager.apply_changes(changeset)
+            lazy.apply_changes(changeset)
+            for db_id in eager.nodes:
+                assert eager.is_deleted(db_id) == lazy.is_deleted(db_id)
+
+        assert lazy.materialize_deleted(budget=10) is False
+        assert lazy.materialize_deleted() is True
+        assert not lazy.tombstones
+        for db_id, node in eager.nodes.items():
+            assert lazy.nodes[db_id].is_deleted == node.is_deleted
+
+    def test_materialize_in_background(self):
+        """Test background materialization."""
+        db = random_db(0, lazy_delete=True)
+        db.update_node(1, 'val', is_deleted=True)
+        thread = db.materialize_in_background(budget=5)
+        thread.join()
+        assert not db.tombstones
+        assert all(node.is_deleted for node in db.nodes[1].all_children)
+
+    def test_cache_save(self):
+        """Test cache subnodes deleted through db ancestors."""
+        db = DB.default()
+        db.lazy_delete = True
+        cache = Cache()
+        cache.load(1, db)
+        cache.load(5, db)
+        cache.add_node(1)
+        cache.delete(0)
+        cache.save(db)
+        assert db.tombstones == {1}
+        assert all(node.is_deleted for node in cache.cache_nodes.values())
+        assert cache.db_nodes[5].is_deleted is True
+        assert db.is_deleted(8) is True
+        assert db.is_deleted(2) is False
+
+
+class TestConcurrency:
+    """DB changes from many threads testing."""
+
+    THREADS = 8
+    ADDS = 1000
+
+    @staticmethod
+    @pytest.fixture(autouse=True)
+    def switch_often():
+        """Switch threads often to mix their changes."""
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        yield
+        sys.setswitchinterval(interval)
+
+    def run_threads(self, target):
+        """Run target(seed) in THREADS threads.
+
+        Exceptions in threads are collected and reraised.
+        """
+        errors = []
+
+        def run(seed):  # NOQA:WPS430
+            try:
+                target(seed)
+            except Exception as exc:  # NOQA:B902
+                errors.append(exc)
+
+        threads = [
+            threading.Thread(target=run, args=(seed,))
+            for seed in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def test_add_and_update(self):
+        """Test concurrent adds give unique ids and consistent tree."""
+        db = random_db(0, nodes=50)
+
+        def work(seed):  # NOQA:WPS430
+            rnd = random.Random(seed)
+            for index in range(self.ADDS):
+                parent_id = rnd.randrange(50)
+                if index % 3:
+                    db.add_to_parent(parent_id, 'val')
+                else:
+                    db.update_node(parent_id, str(index), is_deleted=False)
+
+        self.run_threads(work)
+        adds = len([index for index in range(self.ADDS) if index % 3])
+        expected = 50 + self.THREADS * adds
+        assert len(db.nodes) == expected
+        assert sorted(db.subtree_ids(0)) == list(range(expected))
+        for db_id, node in db.nodes.items():
+            assert node.db_id == db_id
+            for child in node.children:
+                assert child.parent is node
+
+    def test_add_and_delete(self):
+        """Test nodes added under deleted subtree are deleted."""
+        db = random_db(0, nodes=50)
+
+        def work(seed):  # NOQA:WPS430
+            rnd = random.Random(seed)
+            # only nodes known to be added are used as parents
+            known = list(range(50))
+            for index in range(self.ADDS):
+                parent_id = rnd.choice(known)
+                if seed == 0 and index % 50 == 0:
+                    db.update_node(parent_id, 'val', is_deleted=True)
+                elif index % 2:
+                    known.append(db.add_to_parent(parent_id, 'val').db_id)
+                else:
+                    changes_result = db.apply_changes(Changeset(
+                        inserts=[
+                            NodeInsert(ref=0, value='val', parent_id=parent_id),
+                            NodeInsert(ref=1, value='val', parent_ref=0),
+                        ],
+                    ))
+                    known.extend(changes_result.inserted.values())
+
+        self.run_threads(work)
+        assert sorted(db.subtree_ids(0)) == sorted(db.nodes)
+        for node in db.nodes.values():
+            if node.is_deleted:
+                assert all(child.is_deleted for child in node.children)
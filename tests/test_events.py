@@ -0,0 +1,31 @@
+from bdc.events import (
+    ADDED,
+    EventEmitter,
+    NodeEvent,
+)
+from bdc.node import Node
+
+
+class Emitter(EventEmitter):
+    """Simple emitter."""
+
+    def __init__(self):
+        """Initialization."""
+        self.listeners = []
+
+
+class TestEventEmitter:
+    """Event emitter testing."""
+
+    def test_emit(self):
+        """Test listeners get events."""
+        emitter = Emitter()
+        events = []
+        emitter.add_listener(events.append)
+        node = Node('val')
+        emitter.emit(ADDED, node)
+        assert events == [NodeEvent(kind=ADDED, node=node)]
+
+        emitter.remove_listener(events.append)
+        emitter.emit(ADDED, node)
+        assert len(events) == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from bdc.eviction import (
+    LFUPolicy,
+    LRUPolicy,
+)
+
+
+class TestPolicies:
+    """Eviction policies testing."""
+
+    def test_lru(self):
+        """Test least recently used go first."""
+        policy = LRUPolicy()
+        for cache_id in range(4):
+            policy.add(cache_id)
+        policy.touch(0)
+        policy.touch(2)
+        policy.remove(1)
+        assert list(policy.candidates()) == [3, 0, 2]
+
+    def test_lfu(self):
+        """Test least frequently used go first, ties in LRU order."""
+        policy = LFUPolicy()
+        for cache_id in range(4):
+            policy.add(cache_id)
+        policy.touch(0)
+        policy.touch(0)
+        policy.touch(2)
+        policy.touch(1)
+        policy.remove(3)
+        assert list(policy.candidates()) == [2, 1, 0]
+        assert policy.buckets.keys() == {2, 3}
+
+    @pytest.mark.parametrize('policy_cls', [LRUPolicy, LFUPolicy])
+    def test_remove_all(self, policy_cls):
+        """Test removed nodes are forgotten."""
+        policy = policy_cls()
+        policy.add(0)
+        policy.touch(0)
+        policy.remove(0)
+        assert list(policy.candidates()) == []
+
+    @pytest.mark.parametrize('policy_cls', [LRUPolicy, LFUPolicy])
+    def test_not_tracked(self, policy_cls):
+        """Test not tracked nodes are ignored, tracked are added once."""
+        policy = policy_cls()
+        policy.add(0)
+        policy.add(1)
+        policy.touch(2)
+        policy.remove(3)
+        policy.add(0)
+        assert list(policy.candidates()) == [0, 1]
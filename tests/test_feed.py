@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from bdc.changes import (
+    DELETE,
+    RENAME,
+    NodeChange,
+)
+from bdc.db import DB
+from bdc.feed import ChangeFeed
+
+
+class TestChangeFeed:
+    """Change feed testing."""
+
+    @staticmethod
+    @pytest.fixture
+    def db():
+        """Default db fixture."""
+        return DB.default()
+
+    def test_rename(self, db):
+        """Test renames of watched nodes are queued."""
+        feed = ChangeFeed(db)
+        subscription = feed.subscribe([5])
+        db.update_node(5, 'renamed', is_deleted=False)
+        db.update_node(6, 'other', is_deleted=False)
+        assert subscription.drain() == [
+            NodeChange(kind=RENAME, db_id=5, value='renamed', version=1),
+        ]
+        assert not subscription
+
+    def test_delete_subtree(self, db):
+        """Test watched descendants get delete of subtree root."""
+        feed = ChangeFeed(db)
+        subscription = feed.subscribe([7, 8, 2])
+        db.update_node(3, 'node_2_1', is_deleted=True)
+        changes = subscription.drain()
+        assert [change.db_id for change in changes] == [7, 8]
+        assert all(change.kind == DELETE for change in changes)
+        assert [change.deleted_by for change in changes] == [3, 3]
+
+    def test_lazy_delete(self):
+        """Test deletes are sent before tombstones are materialized."""
+        db = DB(lazy_delete=True)
+        db.add_root('root')
+        db.add_to_parent(0, 'child')
+        feed = ChangeFeed(db)
+        subscription = feed.subscribe([1])
+        db.update_node(0, 'root', is_deleted=True)
+        assert [change.db_id for change in subscription.drain()] == [1]
+
+    def test_delete_big_subtree(self, monkeypatch):
+        """Test watchers in big deleted subtree are resolved by ancestry."""
+        db = DB(ancestry_index=True)
+        db.add_root('root')
+        for child in range(100):
+            db.add_to_parent(0, str(child))
+        feed = ChangeFeed(db)
+        subscription = feed.subscribe([50, 70])
+        calls = []
+        descendants_of = db.descendants_of
+
+        def counting(db_ids, ancestor_ids):  # NOQA:WPS430
+            calls.append(ancestor_ids)
+            return descendants_of(db_ids, ancestor_ids)
+
+        monkeypatch.setattr(db, 'descendants_of', counting)
+        db.update_node(3, '2', is_deleted=True)
+        assert calls == []
+        db.update_node(0, 'root', is_deleted=True)
+        assert [change.db_id for change in subscription.drain()] == [50, 70]
+        assert calls == [[0]]
+
+    def test_unwatch(self, db):
+        """Test changes of unwatched nodes are not queued."""
+        feed = ChangeFeed(db)
+        subscription = feed.subscribe([5, 6])
+        other = feed.subscribe([5])
+        subscription.unwatch([5])
+        subscription.close()
+        db.update_node(5, 'renamed', is_deleted=False)
+        db.update_node(6, 'renamed', is_deleted=False)
+        assert not subscription.drain()
+        assert len(other) == 1
+
+        feed.close()
+        db.update_node(5, 'again', is_deleted=False)
+        assert len(other) == 1
+
+    def test_writer_threads(self, db):
+        """Test changes of writer threads are queued in node order."""
+        feed = ChangeFeed(db)
+        subscription = feed.subscribe([5, 6])
+
+        def rename(db_id):  # NOQA:WPS430
+            for index in range(100):
+                db.update_node(db_id, str(index), is_deleted=False)
+
+        threads = [
+            threading.Thread(target=rename, args=(db_id,))
+            for db_id in (5, 6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:  # NOQA:WPS440
+            thread.join()
+        changes = subscription.drain()
+        assert len(changes) == 200
+        for db_id in (5, 6):
+            versions = [change.version for change in changes if change.db_id == db_id]
+            assert versions == list(range(1, 101))
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+
+import pytest
+
+from bdc.aio import (
+    AsyncCache,
+    AsyncDB,
+)
+from bdc.cache import Cache
+from bdc.changes import (
+    Changeset,
+    ConflictError,
+)
+from bdc.columnar_db import ColumnarDB
+from bdc.db import DB
+from bdc.instrumentation import (
+    CallbackSink,
+    Histogram,
+    Instrumentation,
+    LoggingSink,
+)
+from bdc.sqlite_db import SQLiteDB
+
+
+class TestInstrumentation:
+    """Instrumentation testing."""
+
+    @staticmethod
+    @pytest.fixture
+    def instrumentation():
+        """Instrumentation fixture."""
+        return Instrumentation()
+
+    def test_histogram(self):
+        """Test values are counted by buckets."""
+        histogram = Histogram((1, 10))
+        for value in (0, 1, 5, 20):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.sum == 26
+
+    def test_sinks(self, caplog):
+        """Test observations are sent to sinks."""
+        observed = []
+        instrumentation = Instrumentation([
+            CallbackSink(lambda name, value: observed.append((name, value))),
+            LoggingSink(level=logging.INFO),
+        ])
+        with caplog.at_level(logging.INFO, logger='bdc.metrics'):
+            instrumentation.observe('cache.save.nodes', 3)
+        assert observed == [('cache.save.nodes', 3)]
+        assert caplog.messages == ['cache.save.nodes 3']
+
+    def test_prometheus_text(self, instrumentation):
+        """Test metrics dump."""
+        instrumentation.observe('cache.save.nodes', 3)
+        instrumentation.observe('cache.save.nodes', 30)
+        instrumentation.increment('cache.save.errors')
+        instrumentation.set_gauge('cache.orphans', 2)
+        text = instrumentation.prometheus_text()
+        assert text.startswith(
+            '# TYPE bdc_cache_save_errors counter\n'
+            'bdc_cache_save_errors 1\n'
+            '# TYPE bdc_cache_orphans gauge\n'
+            'bdc_cache_orphans 2\n'
+            '# TYPE bdc_cache_save_nodes histogram\n'
+            'bdc_cache_save_nodes_bucket{le="1"} 0\n'
+            'bdc_cache_save_nodes_bucket{le="10"} 1\n'
+            'bdc_cache_save_nodes_bucket{le="100"} 2\n',
+        )
+        assert text.endswith(
+            'bdc_cache_save_nodes_bucket{le="+Inf"} 2\n'
+            'bdc_cache_save_nodes_sum 33.0\n'
+            'bdc_cache_save_nodes_count 2\n',
+        )
+
+    def test_disabled(self):
+        """Test nothing is recorded without instrumentation."""
+        db = DB.default()
+        cache = Cache()
+        cache.load(5, db)
+        cache.save(db)
+        assert db.instrumentation is None
+        assert cache.instrumentation is None
+
+    def test_cache(self, instrumentation):
+        """Test cache operations are recorded."""
+        db = DB.default()
+        cache = Cache()
+        cache.instrumentation = instrumentation
+        cache.load(5, db)
+        cache.load(7, db)
+        cache.add_node(1)
+        cache.delete(0)
+        cache.save(db)
+        histograms = instrumentation.histograms
+        assert histograms['cache.load.seconds'].count == 2
+        assert histograms['cache.load.nodes'].sum == 2
+        assert histograms['cache.add_node.seconds'].count == 1
+        assert histograms['cache.delete.seconds'].count == 1
+        assert histograms['cache.delete.cascade'].sum == 3
+        assert histograms['cache.save.seconds'].count == 1
+        assert histograms['cache.save.nodes'].sum == 3
+        assert instrumentation.gauges == {'cache.orphans': 1}
+        assert 'db.apply_changes.seconds' not in histograms
+
+    def test_load_subtree(self, instrumentation):
+        """Test subtree load is recorded as load."""
+        db = DB.default()
+        cache = Cache()
+        cache.instrumentation = instrumentation
+        cache.load(3, db)
+        cache.load_subtree(5, db)
+        histograms = instrumentation.histograms
+        assert histograms['cache.load.seconds'].count == 2
+        assert histograms['cache.load.nodes'].sum == 4
+        assert instrumentation.gauges == {'cache.orphans': 1}
+
+    def test_async_cache(self, instrumentation):
+        """Test async cache save is recorded."""
+        db = AsyncDB(DB.default())
+        cache = AsyncCache()
+        cache.cache.instrumentation = instrumentation
+
+        async def edit():  # NOQA:WPS430
+            await cache.load_many([5, 7], db)
+            cache.cache.rename(cache.cache.db_nodes[7].cache_id, 'renamed')
+            await cache.save(db)
+
+        asyncio.run(edit())
+        histograms = instrumentation.histograms
+        assert histograms['cache.save.seconds'].count == 1
+        assert histograms['cache.save.nodes'].sum == 1
+        assert instrumentation.gauges == {'cache.orphans': 1}
+
+    def test_orphans_gauge(self, instrumentation):
+        """Test orphans gauge follows eviction."""
+        db = DB.default()
+        cache = Cache(capacity=2)
+        cache.instrumentation = instrumentation
+        cache.load_many([7, 8], db)
+        assert instrumentation.gauges == {'cache.orphans': 2}
+        cache.load(6, db)
+        assert len(cache.cache_nodes) == 2
+        assert instrumentation.gauges == {'cache.orphans': 2}
+        cache.capacity = 1
+        cache.evict()
+        assert instrumentation.gauges == {'cache.orphans': 1}
+
+    @pytest.mark.parametrize('db_cls', [DB, ColumnarDB, SQLiteDB])
+    def test_db(self, db_cls, instrumentation):
+        """Test db operations are recorded."""
+        db = db_cls.default()
+        db.instrumentation = instrumentation
+        db.add_to_parent(0, 'new')
+        db.update_node(3, 'node_2_1', is_deleted=True)
+        with pytest.raises(ConflictError):
+            db.apply_changes(Changeset(renames={1: 'val'}, versions={1: 5}))
+        histograms = instrumentation.histograms
+        assert histograms['db.add_to_parent.seconds'].count == 1
+        assert histograms['db.update_node.seconds'].count == 1
+        assert histograms['db.delete.cascade'].sum == 5
+        assert instrumentation.counters == {'db.apply_changes.errors': 1}
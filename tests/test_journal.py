@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+
+import pytest
+
+from bdc import journal
+from bdc.cache import Cache
+from bdc.changes import (
+    Changeset,
+    ConflictError,
+    NodeInsert,
+)
+from bdc.db import add_default_nodes
+from bdc.journal import (
+    JOURNAL_FILE,
+    OLD_JOURNAL_FILE,
+    SNAPSHOT_FILE,
+    JournaledDB,
+)
+
+
+def db_state(db):
+    """Get comparable db state."""
+    return (
+        [
+            (
+                params.db_id,
+                params.value,
+                params.is_deleted,
+                params.parent_id,
+                params.version,
+            )
+            for params in db.get_nodes_params(sorted(db.nodes))
+        ],
+        db._node_index,  # NOQA:WPS437
+    )
+
+
+class TestJournaledDB:
+    """Journaled db testing."""
+
+    @staticmethod
+    @pytest.fixture
+    def directory(tmp_path):
+        """Directory with default db."""
+        path = str(tmp_path / 'db')
+        db = JournaledDB(path)
+        add_default_nodes(db)
+        db.close()
+        return path
+
+    def test_reopen(self, directory):
+        """Test changes are restored on open."""
+        db = JournaledDB(directory)
+        db.update_node(3, 'renamed', is_deleted=False)
+        db.update_node(4, 'node_2_2', is_deleted=True)
+        db.add_to_parent(5, 'new')
+        cache = Cache()
+        cache.load(1, db)
+        new_node = cache.add_node(0)
+        cache.rename(new_node.cache_id, 'cached')
+        cache.rename(0, 'renamed_1')
+        cache.save(db)
+        state = db_state(db)
+        db.close()
+
+        restored = JournaledDB(directory)
+        assert db_state(restored) == state
+        assert restored.add_to_parent(0, 'next').db_id == state[1]
+        restored.close()
+
+    def test_conflict_not_journaled(self, directory):
+        """Test rejected changeset is not journaled."""
+        db = JournaledDB(directory)
+        changeset = Changeset(
+            inserts=[NodeInsert(ref=0, value='new', parent_id=1)],
+            renames={3: 'val'},
+            versions={3: 5},
+        )
+        with pytest.raises(ConflictError):
+            db.apply_changes(changeset)
+        db.close()
+
+        restored = JournaledDB(directory)
+        assert len(restored.nodes) == 9
+        assert restored.get(3).value == 'node_2_1'
+        assert restored.add_to_parent(0, 'next').db_id == 9
+        restored.close()
+
+    def test_lazy_delete(self, tmp_path):
+        """Test tombstones are restored."""
+        path = str(tmp_path / 'db')
+        db = JournaledDB(path, lazy_delete=True)
+        add_default_nodes(db)
+        db.update_node(3, 'node_2_1', is_deleted=True)
+        db.close()
+
+        restored = JournaledDB(path, lazy_delete=True)
+        assert restored.tombstones == {3}
+        assert restored.is_deleted(7) is True
+        restored.materialize_deleted()
+        assert restored.get(7).is_deleted is True
+        restored.close()
+
+    def test_torn_tail(self, directory):
+        """Test torn last record is dropped."""
+        path = os.path.join(directory, JOURNAL_FILE)
+        with open(path, 'ab') as journal_file:
+            journal_file.write(b'00000000 {"seq":10')
+
+        db = JournaledDB(directory)
+        assert len(db.nodes) == 9
+        db.add_to_parent(0, 'new')
+        db.close()
+
+        restored = JournaledDB(directory)
+        assert restored.get(9).value == 'new'
+        restored.close()
+
+    def test_corrupted_record(self, directory):
+        """Test record with wrong checksum and records after it are dropped."""
+        path = os.path.join(directory, JOURNAL_FILE)
+        with open(path, 'rb') as journal_file:
+            lines = journal_file.readlines()
+        lines[-2] = lines[-2].replace(b'node_4_1', b'node_4_X')
+        with open(path, 'wb') as journal_file:
+            journal_file.writelines(lines)
+
+        db = JournaledDB(directory)
+        assert len(db.nodes) == 7
+        assert db.add_to_parent(0, 'new').db_id == 7
+        db.close()
+
+    def test_group_commit(self, tmp_path, monkeypatch):
+        """Test journal is synced once per group."""
+        syncs = []
+        monkeypatch.setattr(journal.os, 'fsync', syncs.append)
+        db = JournaledDB(
+            str(tmp_path / 'db'),
+            group_size=4,
+            compact_after=None,
+            flush_interval=None,
+        )
+        add_default_nodes(db)
+        assert len(syncs) == 2
+        db.sync()
+        assert len(syncs) == 3
+        db.sync()
+        assert len(syncs) == 3
+        db.close()
+
+    def test_flush_interval(self, tmp_path, monkeypatch):
+        """Test not full group is synced after flush interval."""
+        syncs = []
+        monkeypatch.setattr(journal.os, 'fsync', syncs.append)
+        db = JournaledDB(
+            str(tmp_path / 'db'),
+            group_size=4,
+            compact_after=None,
+            flush_interval=0.01,
+        )
+        db.add_root('root')
+        deadline = time.monotonic() + 5
+        while not syncs and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(syncs) == 1
+        db.close()
+        assert len(syncs) == 1
+
+    def test_compact(self, tmp_path):
+        """Test journal is emptied after compaction."""
+        path = str(tmp_path / 'db')
+        db = JournaledDB(path, compact_after=4)
+        add_default_nodes(db)
+        db.update_node(3, 'node_2_1', is_deleted=True)
+        state = db_state(db)
+        db.close()
+
+        assert os.path.exists(os.path.join(path, SNAPSHOT_FILE))
+        assert not os.path.exists(os.path.join(path, OLD_JOURNAL_FILE))
+        with open(os.path.join(path, JOURNAL_FILE), 'rb') as journal_file:
+            assert len(journal_file.readlines()) < 10
+
+        restored = JournaledDB(path, compact_after=4)
+        assert db_state(restored) == state
+        restored.close()
+
+    def test_compact_in_background(self, tmp_path, monkeypatch):
+        """Test changes are journaled while snapshot is written."""
+        path = str(tmp_path / 'db')
+        db = JournaledDB(path, compact_after=4)
+        written = threading.Event()
+        write_snapshot = db._write_snapshot  # NOQA:WPS437
+
+        def blocked_write(state):  # NOQA:WPS430
+            assert written.wait(5)
+            write_snapshot(state)
+
+        monkeypatch.setattr(db, '_write_snapshot', blocked_write)
+        add_default_nodes(db)
+        db.update_node(3, 'node_2_1', is_deleted=True)
+        assert os.path.exists(os.path.join(path, OLD_JOURNAL_FILE))
+        state = db_state(db)
+        written.set()
+        db.close()
+
+        assert not os.path.exists(os.path.join(path, OLD_JOURNAL_FILE))
+        restored = JournaledDB(path, compact_after=4)
+        assert db_state(restored) == state
+        restored.close()
+
+    def test_crash_during_compaction(self, directory):
+        """Test moved journal is replayed and folded into snapshot."""
+        os.replace(
+            os.path.join(directory, JOURNAL_FILE),
+            os.path.join(directory, OLD_JOURNAL_FILE),
+        )
+        db = JournaledDB(directory)
+        assert len(db.nodes) == 9
+        db.add_to_parent(0, 'new')
+        state = db_state(db)
+        db.close()
+
+        assert not os.path.exists(os.path.join(directory, OLD_JOURNAL_FILE))
+        restored = JournaledDB(directory)
+        assert db_state(restored) == state
+        restored.close()
+
+    def test_crash_before_journal_reset(self, directory):
+        """Test journaled records older than snapshot are skipped."""
+        path = os.path.join(directory, JOURNAL_FILE)
+        with open(path, 'rb') as journal_file:
+            old_records = journal_file.read()
+        db = JournaledDB(directory)
+        db.update_node(1, 'renamed', is_deleted=False)
+        db.compact()
+        state = db_state(db)
+        db.close()
+        with open(path, 'wb') as journal_file:
+            journal_file.write(old_records)
+
+        restored = JournaledDB(directory)
+        assert db_state(restored) == state
+        restored.close()
@@ -1,6 +1,18 @@
+import gc
+import tracemalloc
+import weakref
+
 import pytest
 
-from bdc.node import Node
+from bdc.node import (
+    CNode,
+    Node,
+    NodeParams,
+    group_by_parent,
+)
+
+# Node with empty children list and its share of parent children list
+MAX_NODE_BYTES = 170
 
 
 class TestNode:
@@ -36,6 +48,15 @@ class TestNode:
         assert parent.children == [child]
         assert child.parent == parent
 
+    def test_remove_child(self, new_node):
+        """Testing remove child."""
+        parent = new_node()
+        child = new_node()
+        parent.append_child(child)
+        parent.remove_child(child)
+        assert parent.children == []
+        assert child.parent is None
+
     def test_append_child_fail_double_append(self, new_node):
         """Testing append child.
 
@@ -99,3 +120,156 @@ class TestNode:
         child.set_parent(parent)
         with pytest.raises(ValueError):
             child.set_parent(parent)
+
+    def test_slots(self, new_node):
+        """Test nodes have no instance dict."""
+        node = new_node()
+        cnode = CNode(0, NodeParams(db_id=None, value='val', is_deleted=False))
+        assert not hasattr(node, '__dict__')
+        assert not hasattr(cnode, '__dict__')
+
+    def test_free_without_gc(self, new_node):
+        """Test dropped tree is freed without cyclic gc."""
+        gc.disable()
+        try:
+            parent = new_node()
+            child = new_node()
+            parent.append_child(child)
+            child_ref = weakref.ref(child)
+            parent_ref = weakref.ref(parent)
+            del child  # NOQA:WPS420
+            del parent  # NOQA:WPS420
+            assert child_ref() is None
+            assert parent_ref() is None
+        finally:
+            gc.enable()
+
+    def test_weak_parent(self, new_node):
+        """Test parent is not kept alive by child."""
+        parent = new_node()
+        child = new_node()
+        parent.append_child(child)
+        del parent  # NOQA:WPS420
+        assert child.parent is None
+
+    def test_bytes_per_node(self):
+        """Test memory used by node."""
+        count = 10000
+        tracemalloc.start()
+        try:
+            root = Node('root')
+            start = tracemalloc.get_traced_memory()[0]
+            for _ in range(count):
+                root.append_child(Node('val'))
+            used = tracemalloc.get_traced_memory()[0] - start
+        finally:
+            tracemalloc.stop()
+        assert used / count < MAX_NODE_BYTES
+
+
+class TestTraversal:
+    """Subtree traversal testing.
+
+    Tree:
+    root
+      a
+        c
+          e
+        d
+      b
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def root():
+        """Tree root fixture."""
+        nodes = {value: Node(value) for value in 'abcde'}
+        root = Node('root')
+        root.append_child(nodes['a'])
+        root.append_child(nodes['b'])
+        nodes['a'].append_child(nodes['c'])
+        nodes['a'].append_child(nodes['d'])
+        nodes['c'].append_child(nodes['e'])
+        return root
+
+    @staticmethod
+    def values(nodes):
+        """Get node values."""
+        return ''.join(node.value for node in nodes)
+
+    def test_preorder(self, root):
+        """Test pre-order traversal."""
+        assert self.values(root.iter_preorder()) == 'acedb'
+        assert self.values(root.iter_preorder(max_depth=2)) == 'acdb'
+        assert self.values(root.iter_preorder(max_depth=0)) == ''
+        pruned = root.iter_preorder(prune=lambda node: node.value == 'c')
+        assert self.values(pruned) == 'adb'
+
+    def test_postorder(self, root):
+        """Test post-order traversal."""
+        assert self.values(root.iter_postorder()) == 'ecdab'
+        assert self.values(root.iter_postorder(max_depth=1)) == 'ab'
+        assert self.values(root.iter_postorder(max_depth=2)) == 'cdab'
+        pruned = root.iter_postorder(prune=lambda node: node.value == 'a')
+        assert self.values(pruned) == 'b'
+
+    def test_breadth_first(self, root):
+        """Test breadth-first traversal."""
+        assert self.values(root.iter_breadth_first()) == 'abcde'
+        assert self.values(root.iter_breadth_first(max_depth=2)) == 'abcd'
+        pruned = root.iter_breadth_first(prune=lambda node: node.value == 'c')
+        assert self.values(pruned) == 'abd'
+
+    def test_deep_chain(self):
+        """Test deep chain is traversed without recursion."""
+        root = Node('root')
+        parent = root
+        for _ in range(10000):
+            child = Node('val')
+            parent.append_child(child)
+            parent = child
+        assert sum(1 for _ in root.iter_preorder()) == 10000
+        assert next(root.iter_postorder()) is parent
+
+    def test_delete(self, root):
+        """Test delete returns count of deleted children."""
+        assert root.children[0].delete() == 3
+        assert root.children[1].is_deleted is False
+        assert root.delete() == 5
+        assert all(node.is_deleted for node in root.iter_preorder())
+
+
+class TestGroupByParent:
+    """Group by parent testing."""
+
+    def test_group(self):
+        """Test nodes and missing ancestors grouped by parent."""
+        root = Node('root')
+        parent = Node('parent')
+        child1 = Node('child1')
+        child2 = Node('child2')
+        other = Node('other')
+        root.append_child(parent)
+        parent.append_child(child1)
+        parent.append_child(child2)
+
+        children = group_by_parent([child2, other, child1])
+        assert children == {
+            None: [root, other],
+            root: [parent],
+            parent: [child2, child1],
+        }
+
+    def test_deep_chain(self):
+        """Test reverse ordered deep chain is grouped."""
+        nodes = [Node('root')]
+        for _ in range(1000):
+            child = Node('val')
+            nodes[-1].append_child(child)
+            nodes.append(child)
+        children = group_by_parent(reversed(nodes))
+        assert children[None] == [nodes[0]]
+        assert all(
+            children[parent] == [child]
+            for parent, child in zip(nodes, nodes[1:])
+        )
@@ -0,0 +1,163 @@
+import threading
+
+import pytest
+from PyQt5.QtCore import (
+    QModelIndex,
+    Qt,
+    QtWarningMsg,
+    qInstallMessageHandler,
+)
+from PyQt5.QtTest import QAbstractItemModelTester
+
+from bdc.db import DB
+from bdc.ui.qlazydb import QLazyDB
+
+
+class TestQLazyDB:
+    """Lazy db model testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def warnings(qapp):
+        """Qt warnings, model tester reports problems with them."""
+        messages = []
+
+        def handler(mode, context, message):  # NOQA:WPS430
+            if mode >= QtWarningMsg:
+                messages.append(message)
+
+        qInstallMessageHandler(handler)
+        yield messages
+        qInstallMessageHandler(None)
+
+    @staticmethod
+    @pytest.fixture
+    def model(warnings):
+        """Default db model, no Qt warnings are expected."""
+        yield QLazyDB(DB.default(), threading.RLock())
+        assert not warnings
+
+    @staticmethod
+    def attach_tester(model):
+        """Check model now and on every change, tester fetches all rows."""
+        return QAbstractItemModelTester(
+            model,
+            QAbstractItemModelTester.FailureReportingMode.Warning,
+        )
+
+    @staticmethod
+    def fetch_all(model, parent=QModelIndex()):  # NOQA:B008
+        """Fetch children of parent."""
+        while model.canFetchMore(parent):
+            model.fetchMore(parent)
+
+    def root(self, model):
+        """Fetch top level and get root index."""
+        self.fetch_all(model)
+        return model.index(0, 0)
+
+    def test_fetch_paging(self, warnings):
+        """Test children are fetched by batches."""
+        db = DB()
+        db.add_root('root')
+        for child in range(600):
+            db.add_to_parent(0, str(child))
+        model = QLazyDB(db, threading.RLock())
+        assert model.rowCount() == 0
+        root = self.root(model)
+        assert model.rowCount() == 1
+        assert model.hasChildren(root)
+        assert model.rowCount(root) == 0
+        counts = []
+        while model.canFetchMore(root):
+            model.fetchMore(root)
+            counts.append(model.rowCount(root))
+        assert counts == [256, 512, 600]
+        assert model.data(model.index(599, 0, root)) == '599'
+        tester = self.attach_tester(model)  # NOQA:F841
+        assert not warnings
+
+    def test_insert_event(self, model):
+        """Test new child of fetched parent is inserted as last row."""
+        tester = self.attach_tester(model)  # NOQA:F841
+        root = model.index(0, 0)
+        inserted = []
+        model.rowsInserted.connect(
+            lambda parent, first, last: inserted.append(
+                (model.db_id(parent), first, last),
+            ),
+        )
+        model.db.add_to_parent(0, 'new')
+        assert inserted == [(0, 2, 2)]
+        assert model.data(model.index(2, 0, root)) == 'new'
+
+    def test_insert_event_not_fetched(self, model):
+        """Test new child of not fully fetched parent waits for fetch."""
+        root = self.root(model)
+        inserted = []
+        model.rowsInserted.connect(
+            lambda parent, first, last: inserted.append((first, last)),
+        )
+        model.db.add_to_parent(0, 'new')
+        model.db.add_to_parent(5, 'not listed')
+        assert inserted == []
+        self.fetch_all(model, root)
+        assert inserted == [(0, 2)]
+        assert model.data(model.index(2, 0, root)) == 'new'
+
+    def test_rename_event(self, model):
+        """Test rename repaints node row."""
+        tester = self.attach_tester(model)  # NOQA:F841
+        root = model.index(0, 0)
+        changed = []
+        model.dataChanged.connect(
+            lambda first, last: changed.append(model.db_id(first)),
+        )
+        model.db.update_node(2, 'renamed', is_deleted=False)
+        assert changed == [2]
+        assert model.data(model.index(1, 0, root)) == 'renamed'
+
+    def test_delete_event(self, model):
+        """Test delete repaints fetched subtree rows, rows are kept."""
+        root = self.root(model)
+        self.fetch_all(model, root)
+        node = model.index(0, 0, root)
+        self.fetch_all(model, node)
+        changed = []
+        removed = []
+        model.dataChanged.connect(
+            lambda first, last: changed.append(model.db_id(first)),
+        )
+        model.rowsRemoved.connect(
+            lambda parent, first, last: removed.append((first, last)),
+        )
+        model.db.update_node(1, 'node_1_1', is_deleted=True)
+        assert set(changed) == {1, 3, 4}
+        assert removed == []
+        assert model.rowCount(node) == 2
+        assert model.flags(node) == Qt.NoItemFlags
+        assert model.flags(model.index(1, 0, root)) != Qt.NoItemFlags
+
+    def test_delete_event_checked(self, model):
+        """Test delete of fully fetched subtree passes model checks."""
+        tester = self.attach_tester(model)  # NOQA:F841
+        changed = []
+        model.dataChanged.connect(
+            lambda first, last: changed.append(model.db_id(first)),
+        )
+        model.db.update_node(3, 'node_2_1', is_deleted=True)
+        assert set(changed) == {3, 5, 6, 7, 8}
+        assert model.rowCount(model.index(0, 0, model.index(0, 0))) == 2
@@ -0,0 +1,168 @@
+import pytest
+
+from bdc.cache import Cache
+from bdc.columnar_db import ColumnarDB
+from bdc.db import DB
+from bdc.snapshot import (
+    MappedDB,
+    dump,
+)
+from bdc.sqlite_db import SQLiteDB
+
+
+def mapped(db, tmp_path):
+    """Dump db and map snapshot."""
+    path = str(tmp_path / 'tree.snapshot')
+    dump(db, path)
+    return MappedDB(path)
+
+
+class TestMappedDB:
+    """Memory mapped snapshot db testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def db(tmp_path):
+        """Mapped default db fixture."""
+        mapped_db = mapped(DB.default(), tmp_path)
+        yield mapped_db
+        mapped_db.close()
+
+    @pytest.mark.parametrize('db_cls', [DB, ColumnarDB, SQLiteDB])
+    def test_dump(self, db_cls, tmp_path):
+        """Test snapshot of every db has same nodes."""
+        source = db_cls.default()
+        source.update_node(3, 'renamed', is_deleted=False)
+        source.update_node(4, 'node_2_2', is_deleted=True)
+        db = mapped(source, tmp_path)
+        db_ids = list(range(9))
+        assert db.get_nodes_params(db_ids) == source.get_nodes_params(db_ids)
+        for db_id in db_ids:
+            assert db.get_children_ids(db_id) == source.get_children_ids(db_id)
+        db.close()
+
+    def test_read(self, db):
+        """Test read methods."""
+        assert db.get_root_ids() == [0]
+        assert db.get(5).value == 'node_3_1'
+        assert db.get(9) is None
+        assert db.get_parent_id(0) is None
+        assert db.get_parent_id(7) == 5
+        assert db.get_children_ids(5) == [7, 8]
+        assert db.get_children_ids(5, limit=1) == [7]
+        assert db.get_children_ids(8) == []
+        assert db.get_ancestor_ids(7) == [5, 3, 1, 0]
+        assert db.get_ancestor_ids(7, levels=2) == [5, 3]
+        assert db.is_child(7, 5) is True
+        assert db.is_deleted(7) is False
+        with pytest.raises(KeyError):
+            db.get_node_params(9)
+        with pytest.raises(KeyError):
+            db.get_children_ids(-1)
+
+    def test_nodes(self, db):
+        """Test nodes are created on access."""
+        assert len(db.nodes) == 9
+        assert list(db.nodes) == list(range(9))
+        assert db.nodes[2].value == 'node_1_2'
+        assert db.nodes[2] is not db.nodes[2]
+
+    def test_lazy_deleted(self, tmp_path):
+        """Test not materialized deleted nodes are dumped as deleted."""
+        source = DB(lazy_delete=True)
+        source.add_root('root')
+        source.add_to_parent(0, 'node')
+        source.add_to_parent(1, 'child')
+        source.update_node(1, 'node', is_deleted=True)
+        db = mapped(source, tmp_path)
+        assert [db.is_deleted(db_id) for db_id in range(3)] == [False, True, True]
+        db.close()
+
+    def test_missing_ids(self, tmp_path):
+        """Test reserved db_ids without nodes have no nodes."""
+        source = DB.default()
+        source._reserve_ids(1)  # NOQA:WPS437
+        source.add_to_parent(1, 'new')
+        db = mapped(source, tmp_path)
+        assert db.get(9) is None
+        assert db.get(10).value == 'new'
+        assert len(db.nodes) == 10
+        assert 9 not in list(db.nodes)
+        db.close()
+
+    def test_to_columnar(self, tmp_path):
+        """Test snapshot is copied to writable db."""
+        source = DB.default()
+        source.update_node(3, 'renamed', is_deleted=False)
+        source.update_node(4, 'node_2_2', is_deleted=True)
+        db = mapped(source, tmp_path)
+        columnar_db = db.to_columnar()
+        db.close()
+        db_ids = list(range(9))
+        assert columnar_db.get_nodes_params(db_ids) == source.get_nodes_params(db_ids)
+        for db_id in db_ids:
+            assert columnar_db.get_children_ids(db_id) == source.get_children_ids(db_id)
+        columnar_db.update_node(1, 'node_1_1', is_deleted=True)
+        assert columnar_db.is_deleted(7) is True
+        assert columnar_db.add_to_parent(5, 'new').db_id == 9
+        assert columnar_db.get_children_ids(5) == [7, 8, 9]
+
+    def test_to_columnar_missing_ids(self, tmp_path):
+        """Test reserved db_ids stay without nodes in writable db."""
+        source = DB.default()
+        source._reserve_ids(1)  # NOQA:WPS437
+        source.add_to_parent(1, 'new')
+        db = mapped(source, tmp_path)
+        columnar_db = db.to_columnar()
+        db.close()
+        assert columnar_db.get(9) is None
+        assert columnar_db.get(10).value == 'new'
+        assert len(columnar_db.nodes) == 10
+        assert 9 not in list(columnar_db.nodes)
+        with pytest.raises(ValueError):
+            columnar_db.add_to_parent(9, 'child')
+
+    def test_unicode(self, tmp_path):
+        """Test values are stored as utf-8."""
+        source = DB()
+        source.add_root('корень')
+        source.add_to_parent(0, '')
+        db = mapped(source, tmp_path)
+        assert db.get(0).value == 'корень'
+        assert db.get(1).value == ''
+        db.close()
+
+    def test_empty(self, tmp_path):
+        """Test snapshot of empty db."""
+        db = mapped(DB(), tmp_path)
+        assert db.get_root_ids() == []
+        assert len(db.nodes) == 0
+        db.close()
+
+    def test_not_snapshot(self, tmp_path):
+        """Test other files are not mapped."""
+        path = tmp_path / 'tree.snapshot'
+        path.write_bytes(b'\0' * 64)
+        with pytest.raises(ValueError):
+            MappedDB(str(path))
+
+    def test_cache_load(self, db):
+        """Test cache loads nodes from mapped db."""
+        cache = Cache()
+        cache.load(7, db)
+        cache.load(5, db)
+        assert cache.cache_nodes[1].children == [cache.cache_nodes[0]]
+        assert cache.cache_nodes[1].value == 'node_3_1'
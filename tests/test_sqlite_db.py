@@ -0,0 +1,239 @@
+import sqlite3
+
+import pytest
+
+from bdc.cache import Cache
+from bdc.changes import (
+    Changeset,
+    ConflictError,
+    NodeInsert,
+)
+from bdc.sqlite_db import SQLiteDB
+
+
+class TestSQLiteDB:
+    """SQLite DB testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def db():
+        """Default sqlite db fixture."""
+        default_db = SQLiteDB.default()
+        yield default_db
+        default_db.close()
+
+    def test_add_root(self):
+        """Test add root."""
+        db = SQLiteDB()
+        root = db.add_root('val1')
+        assert root.db_id == 0
+        assert db.get(0).value == 'val1'
+        with pytest.raises(RuntimeError):
+            db.add_root('val2')
+
+    def test_add_to_parent(self, db):
+        """Test add to parent."""
+        new_node = db.add_to_parent(5, 'val1')
+        assert new_node.db_id == 9
+        assert new_node.is_deleted is False
+        assert db.get_parent_id(9) == 5
+        with pytest.raises(ValueError):
+            db.add_to_parent(20, 'val2')
+
+    def test_add_to_deleted_parent(self, db):
+        """Test add to parent.
+
+        case: deleted parent. Child should be deleted too.
+        """
+        db.update_node(5, 'node_3_1', is_deleted=True)
+        new_node = db.add_to_parent(5, 'val1')
+        assert new_node.is_deleted is True
+        assert db.get_node_params(9).is_deleted is True
+
+    def test_get(self, db):
+        """Test get node."""
+        assert db.get(3).value == 'node_2_1'
+        assert db.get(20) is None
+
+    def test_get_node_params(self, db):
+        """Test get node params."""
+        params = db.get_node_params(5)
+        assert params.db_id == 5
+        assert params.value == 'node_3_1'
+        assert params.is_deleted is False
+        assert params.parent_id == 3
+        with pytest.raises(KeyError):
+            db.get_node_params(20)
+
+    def test_get_nodes_params(self, db):
+        """Test get batch of node params."""
+        params = db.get_nodes_params([5, 0, 7])
+        assert [node.db_id for node in params] == [5, 0, 7]
+        assert [node.parent_id for node in params] == [3, None, 5]
+
+    def test_get_parent_id(self, db):
+        """Test get parent id."""
+        assert db.get_parent_id(1) == 0
+        assert db.get_parent_id(0) is None
+        with pytest.raises(KeyError):
+            db.get_parent_id(20)
+
+    def test_get_root_ids(self, db):
+        """Test get root ids."""
+        assert db.get_root_ids() == [0]
+        assert SQLiteDB().get_root_ids() == []
+
+    def test_get_children_ids(self, db):
+        """Test get children ids."""
+        assert db.get_children_ids(3) == [5, 6]
+        assert db.get_children_ids(8) == []
+
+    def test_get_children_ids_limit(self, db):
+        """Test get first children ids."""
+        assert db.get_children_ids(3, limit=1) == [5]
+
+    def test_get_ancestor_ids(self, db):
+        """Test get ancestor ids."""
+        assert db.get_ancestor_ids(7) == [5, 3, 1, 0]
+        assert db.get_ancestor_ids(7, levels=2) == [5, 3]
+        assert db.get_ancestor_ids(0) == []
+        with pytest.raises(KeyError):
+            db.get_ancestor_ids(20)
+
+    def test_get_nodes_children_ids(self, db):
+        """Test get children ids of batch of nodes."""
+        assert db.get_nodes_children_ids([3, 8, 0]) == {
+            3: [5, 6],
+            8: [],
+            0: [1, 2],
+        }
+        assert db.get_nodes_children_ids([3, 0], limit=1) == {3: [5], 0: [1]}
+        with pytest.raises(KeyError):
+            db.get_nodes_children_ids([3, 20])
+
+    def test_get_nodes_ancestor_ids(self, db):
+        """Test get ancestor ids of batch of nodes."""
+        assert db.get_nodes_ancestor_ids([7, 0, 4]) == {
+            7: [5, 3, 1, 0],
+            0: [],
+            4: [1, 0],
+        }
+        assert db.get_nodes_ancestor_ids([7, 4], levels=1) == {7: [5], 4: [1]}
+        assert db.get_nodes_ancestor_ids([7], levels=0) == {7: []}
+        with pytest.raises(KeyError):
+            db.get_nodes_ancestor_ids([7, 20])
+
+    def test_is_child(self, db):
+        """Test is child."""
+        assert db.is_child(3, 1) is True
+        assert db.is_child(3, 0) is False
+
+    def test_update_node(self, db):
+        """Test update node."""
+        deleted = db.update_node(3, 'val1', is_deleted=True)
+        assert {node.db_id for node in deleted} == {5, 6, 7, 8}
+        assert db.get(3).value == 'val1'
+        assert db.get(3).is_deleted is True
+        assert db.get(8).is_deleted is True
+        assert db.get(1).is_deleted is False
+
+    def test_apply_changes(self, db):
+        """Test apply changes."""
+        result = db.apply_changes(Changeset(
+            inserts=[
+                NodeInsert(ref=0, value='new1', parent_id=2),
+                NodeInsert(ref=1, value='new2', parent_ref=0),
+            ],
+            renames={2: 'val2'},
+            deletes=[3, 5],
+        ))
+        assert result.inserted == {0: 9, 1: 10}
+        assert sorted(result.deleted) == [3, 5, 6, 7, 8]
+        assert db.get(2).value == 'val2'
+        assert db.get_parent_id(10) == 9
+
+    def test_apply_changes_rollback(self, db):
+        """Test apply changes.
+
+        case: wrong change, transaction rolled back.
+        """
+        changeset = Changeset(
+            inserts=[NodeInsert(ref=0, value='new1', parent_id=20)],
+            renames={2: 'val2'},
+        )
+        with pytest.raises(ValueError):
+            db.apply_changes(changeset)
+        assert db.get(2).value == 'node_1_2'
+        assert db.get(9) is None
+
+    def test_apply_changes_conflict(self, db):
+        """Test apply changes.
+
+        case: node changed since read, transaction rolled back.
+        """
+        result = db.apply_changes(Changeset(
+            renames={2: 'val2', 4: 'node_2_2'},
+            deletes=[5],
+            versions={2: 0, 4: 0, 5: 0},
+        ))
+        assert result.versions == {2: 1, 4: 0, 5: 1}
+        assert db.get_node_params(7).version == 0
+        changeset = Changeset(
+            renames={2: 'val3', 4: 'val4'},
+            versions={2: 0, 4: 0},
+        )
+        with pytest.raises(ConflictError):
+            db.apply_changes(changeset)
+        assert db.get(4).value == 'node_2_2'
+
+    def test_add_version_column(self, tmp_path):
+        """Test db created without versions is upgraded."""
+        path = str(tmp_path / 'tree.sqlite')
+        connection = sqlite3.connect(path)
+        with connection:
+            connection.execute(
+                'CREATE TABLE nodes (db_id INTEGER PRIMARY KEY, '
+                'parent_id INTEGER, value TEXT NOT NULL, '
+                'is_deleted INTEGER NOT NULL DEFAULT 0)',
+            )
+            connection.execute("INSERT INTO nodes VALUES (0, NULL, 'root', 0)")
+        connection.close()
+
+        db = SQLiteDB(path)
+        assert db.get_node_params(0).version == 0
+        db.close()
+
+    def test_persistent(self, tmp_path):
+        """Test tree survives reopening."""
+        path = str(tmp_path / 'tree.sqlite')
+        db = SQLiteDB.default(path)
+        cache = Cache()
+        cache.load(5, db)
+        cache.cache_nodes[0].value = 'new_value'
+        cache.add_node(0)
+        cache.delete(0)
+        cache.save(db)
+        db.close()
+
+        db = SQLiteDB(path)
+        assert db.get(5).value == 'new_value'
+        assert db.get_parent_id(9) == 5
+        assert all(
+            node.is_deleted
+            for node in db.get_nodes_params([5, 7, 8, 9])
+        )
+        assert db.get(3).is_deleted is False
+        db.close()
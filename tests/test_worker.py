@@ -0,0 +1,161 @@
+import threading
+
+import pytest
+from PyQt5.QtCore import (
+    QCoreApplication,
+    QEventLoop,
+    QThread,
+    QThreadPool,
+    QTimer,
+)
+
+from bdc.cache import Cache
+from bdc.db import DB
+from bdc.ui.worker import (
+    QueuedListener,
+    Task,
+)
+
+
+def in_gui_thread():
+    """Check that code runs in GUI thread."""
+    return QThread.currentThread() == QCoreApplication.instance().thread()
+
+
+def run_in_pool(task):
+    """Run task in thread pool, get its signals received in GUI thread."""
+    received = []
+    loop = QEventLoop()
+
+    def receiver(name):  # NOQA:WPS430
+        def receive(*args):  # NOQA:WPS430
+            received.append((name, args, in_gui_thread()))
+            if name != 'committing':
+                loop.quit()
+        return receive
+
+    task.signals.committing.connect(receiver('committing'))
+    task.signals.finished.connect(receiver('finished'))
+    task.signals.cancelled.connect(receiver('cancelled'))
+    task.signals.failed.connect(receiver('failed'))
+    QThreadPool.globalInstance().start(task)
+    QTimer.singleShot(5000, loop.quit)
+    loop.exec_()
+    return received
+
+
+class TestTask:
+    """Thread pool task testing.
+
+    DB struct:
+    id value
+    0  root
+    1    node_1_1
+    3      node_2_1
+    5        node_3_1
+    7          node_4_1
+    8          node_4_2
+    6        node_3_2
+    4      node_2_2
+    2    node_1_2
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def db(qapp):
+        """Default db fixture."""
+        return DB.default()
+
+    def test_finished(self, db):
+        """Test result is received in GUI thread."""
+        cache = Cache()
+        task = Task(
+            lambda progress: cache.load_many([1, 3], db, progress),
+            threading.RLock(),
+            [],
+        )
+        received = run_in_pool(task)
+        assert [(name, gui) for name, _args, gui in received] == [('finished', True)]
+        assert [node.db_id for node in received[0][1][0]] == [1, 3]
+
+    def test_failed(self, db):
+        """Test error is received in GUI thread."""
+        task = Task(
+            lambda progress: Cache().load(100, db, progress),
+            threading.RLock(),
+            [],
+        )
+        received = run_in_pool(task)
+        assert [(name, gui) for name, _args, gui in received] == [('failed', True)]
+        assert isinstance(received[0][1][0], KeyError)
+
+    def test_load_cancelled(self, db):
+        """Test load cancelled while it runs leaves cache untouched."""
+        cache = Cache()
+        resume = threading.Event()
+
+        def load(progress):  # NOQA:WPS430
+            progress(0, 0)
+            assert resume.wait(5)
+            return cache.load_subtree(1, db, progress=progress)
+
+        task = Task(load, threading.RLock(), [])
+        task.signals.progress.connect(lambda done, total: (task.cancel(), resume.set()))
+        received = run_in_pool(task)
+        assert [name for name, _args, _gui in received] == ['cancelled']
+        assert not cache.cache_nodes
+        assert not cache.dirty
+
+    def test_commit_not_cancelled(self, db):
+        """Test cancel after committing signal does not stop commit."""
+        cache = Cache()
+        cache.load(5, db)
+        cache.rename(0, 'renamed')
+        resume = threading.Event()
+
+        def commit(changeset):  # NOQA:WPS430
+            assert resume.wait(5)
+            cache.save_changeset(db, changeset)
+            return changeset
+
+        task = Task(cache.changeset, threading.RLock(), [], commit=commit)
+        task.signals.committing.connect(lambda: (task.cancel(), resume.set()))
+        received = run_in_pool(task)
+        assert [(name, gui) for name, _args, gui in received] == [
+            ('committing', True),
+            ('finished', True),
+        ]
+        assert db.get(5).value == 'renamed'
+        assert not cache.dirty
+
+
+class TestQueuedListener:
+    """Queued node events listener testing."""
+
+    def test_events_before_finished(self, qapp):
+        """Test events of task are delivered in GUI thread before result."""
+        db = DB.default()
+        delivered = []
+        listener = QueuedListener(
+            lambda event: delivered.append((event.node.db_id, in_gui_thread())),
+        )
+        db.add_listener(listener)
+        task = Task(
+            lambda progress: db.add_to_parent(0, 'new').db_id,
+            threading.RLock(),
+            [listener],
+        )
+        task.signals.finished.connect(
+            lambda result: delivered.append(('finished', in_gui_thread())),
+        )
+        received = run_in_pool(task)
+        assert received[0][1] == (9,)
+        assert delivered == [(9, True), ('finished', True)]
+
+    def test_gui_thread_event(self, qapp):
+        """Test event from GUI thread is passed at once."""
+        db = DB.default()
+        delivered = []
+        db.add_listener(QueuedListener(delivered.append))
+        db.add_to_parent(0, 'new')
+        assert [event.node.db_id for event in delivered] == [9]